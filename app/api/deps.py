@@ -1,23 +1,37 @@
 # app/api/deps.py
 from app.config import settings
 from app.models.user import User
-from app.crud.user import user
-from app.database import get_db
+from app.crud.principal_cache import principal_cache, token_revocations
+from app.crud.user import user_async
+from app.crud.warehouse import warehouse_async
+from app.core.totals import TotalMode
+from app import database
+from app.database import get_db, get_async_db
 from app.schemas.user import TokenPayload
 
-from fastapi import Depends, status, Security, HTTPException, Request
+from fastapi import Depends, status, Security, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
 
 from datetime import datetime, timedelta
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Optional, Union
 
 import jwt  # Это pyjwt, правильно
 from pydantic import ValidationError
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 # - - - INTERNAL API DEPENDENCIES - - - #
 
 
+# Сессия для async-эндпоинтов (заказы, инвентарь, поставки):
+# AsyncSession в DB_ASYNC_MODE, иначе обычная Session (CRUD-вызовы уходят в threadpool)
+get_session = get_async_db if settings.DB_ASYNC_MODE else get_db
+AnySession = Union[Session, AsyncSession]
+
+
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login",
     auto_error=False  # Не кидаем ошибку автоматически
@@ -37,11 +51,8 @@ async def get_token_from_header(token: str = Depends(oauth2_scheme)) -> Optional
     return token
 
 
-async def get_current_user(
-    db: Session = Depends(get_db),
-    request: Request = None,
-    token_header: str = Depends(oauth2_scheme)
-) -> User:
+def _token_payload(request: Optional[Request], token_header: Optional[str]) -> dict:
+    """Проверенный payload токена запроса (cookie, затем заголовок Authorization), без БД"""
     # 1. Пробуем токен из cookie
     token = None
     if request:
@@ -71,16 +82,67 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+
+async def authenticate(db: AnySession, payload: dict) -> User:
+    """Пользователь токена: из claims, кэша пользователей или БД сессии db"""
+    username = payload["sub"]
+    # Токен с claims (TOKEN_CLAIMS), не отозванный: пользователь из подписанных claims, без БД.
+    # Токены выдаются только активным пользователям, деактивация отзывает claims
+    # (список отзыва в памяти процесса - TOKEN_CLAIMS только с одним воркером)
+    if token_revocations.trusts(payload.get("user_id"), payload.get("iat")):
+        db_user = principal_cache.detached({
+            "id": payload["user_id"],
+            "username": username,
+            "is_superuser": payload.get("role") == "admin",
+            "warehouse_id": payload.get("warehouse_id"),
+            "is_active": True,
+        })
+    else:
+        db_user = await load_user(db, username)
 
-    db_user = user.get_by_username(db, username=User.username)
-    if not db_user:
-        raise HTTPException(status_code=401, detail="User not found")
+    database.bind_request_user(username)
     return db_user
 
 
+async def get_current_user(
+    db: AnySession = Depends(get_session),
+    request: Request = None,
+    token_header: str = Depends(oauth2_scheme)
+) -> User:
+    return await authenticate(db, _token_payload(request, token_header))
+
+
+async def load_user(db: AnySession, username: str) -> User:
+    # Сначала кэш пользователей (PRINCIPAL_CACHE_TTL), запрос к БД не блокирует event loop:
+    # run_sync на AsyncSession или threadpool
+    db_user = principal_cache.get(username)
+    if db_user is None:
+        generation = principal_cache.generation
+        db_user = await user_async.get_by_username(db, username=username)
+        if not db_user:
+            raise HTTPException(status_code=401, detail="User not found")
+        principal_cache.put(username, db_user, generation)
+    return db_user
+
+
+async def get_current_user_row(
+        db: AnySession = Depends(get_session),
+        current_user: User = Depends(get_current_user),
+) -> User:
+    """
+    Текущий пользователь со всеми колонками (created_at и т.п.):
+    пользователь из claims токена содержит только id, username, роль, склад и is_active
+    """
+    if "created_at" not in inspect(current_user).unloaded:
+        return current_user
+    return await load_user(db, current_user.username)
+
+
 
 async def get_current_user_optional(
-        db: Session = Depends(get_db),
+        db: AnySession = Depends(get_session),
         request: Request = None,
         token_header: Optional[str] = Depends(oauth2_scheme)
 ) -> Optional[User]:
@@ -93,6 +155,80 @@ async def get_current_user_optional(
         return None
 
 
+def is_superuser(current_user: User) -> bool:
+    return bool(current_user.is_superuser)
+
+
+async def can_access_warehouse(
+        db: AnySession,
+        warehouse_id: int,
+        current_user: User,
+        allow_admin: bool = True
+) -> bool:
+    """
+    Склад существует и пользователь - админ (allow_admin) или сотрудник склада.
+    PRINCIPAL_CACHE_PERMISSIONS: не-админу отвечаем по warehouse_id пользователя без загрузки склада
+    (склад сотрудника существует: users.warehouse_id - внешний ключ, склад с сотрудниками не удаляется)
+    """
+    is_admin = allow_admin and is_superuser(current_user)
+    if settings.PRINCIPAL_CACHE_PERMISSIONS and not is_admin:
+        return current_user.warehouse_id == warehouse_id
+
+    warehouse_obj = await warehouse_async.get(db, id=warehouse_id)
+    if not warehouse_obj:
+        return False
+    return is_admin or current_user.warehouse_id == warehouse_id
+
+
+@asynccontextmanager
+async def _read_session(use_primary: bool):
+    """Сессия основной БД или read replica; тип как у get_session: AsyncSession в DB_ASYNC_MODE, иначе Session"""
+    if settings.DB_ASYNC_MODE:
+        session_factory = database.AsyncSessionLocal if use_primary else database.AsyncReadSessionLocal
+        async with session_factory() as db:
+            yield db
+    else:
+        session_factory = database.SessionLocal if use_primary else database.ReadSessionLocal
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def get_read_db(
+        request: Request = None,
+        token_header: Optional[str] = Depends(oauth2_scheme),
+):
+    """
+    Сессия для read-only списков: read replica (READ_REPLICA_URL).
+    После собственной записи пользователь READ_YOUR_WRITES_SECONDS читает из основной БД.
+    Выбор - по subject токена, без БД: пользователь проверяется на этой же сессии (get_read_user),
+    сессия основной БД для аутентификации не открывается.
+    """
+    use_primary = (not settings.READ_REPLICA_URL
+                   or database.wrote_recently(_token_payload(request, token_header)["sub"]))
+    async with _read_session(use_primary) as db:
+        yield db
+
+
+async def get_read_user(
+        db: AnySession = Depends(get_read_db),
+        request: Request = None,
+        token_header: Optional[str] = Depends(oauth2_scheme),
+) -> User:
+    """get_current_user для эндпоинтов на get_read_db: на той же сессии (claims, кэш пользователей или реплика)"""
+    payload = _token_payload(request, token_header)
+    try:
+        return await authenticate(db, payload)
+    except HTTPException as e:
+        if not settings.READ_REPLICA_URL or e.detail != "User not found":
+            raise
+    # пользователь создан позже, чем его догнала реплика
+    async with _read_session(use_primary=True) as primary_db:
+        return await authenticate(primary_db, payload)
+
+
 async def get_current_active_user(
         current_user: User = Depends(get_current_user),
 ) -> User:
@@ -117,6 +253,14 @@ async def get_current_active_superuser(
     return current_user
 
 
+async def get_read_active_superuser(
+        current_user: User = Depends(get_read_user),
+) -> User:
+    """get_current_active_superuser для эндпоинтов на get_read_db"""
+    current_user = await get_current_active_user(current_user)
+    return await get_current_active_superuser(current_user)
+
+
 def create_access_token(
         data: dict,
         expires_delta: Optional[timedelta] = None
@@ -157,6 +301,16 @@ def verify_token(token: str) -> Optional[TokenPayload]:
         return None
 
 
+def get_total_mode(
+        include_total: bool = Query(True, description="false - не считать total (быстрее на больших списках)"),
+        approximate_total: bool = Query(False, description="total - оценка по статистике таблиц"),
+) -> TotalMode:
+    """Как считать total в списках с пагинацией"""
+    if not include_total:
+        return TotalMode.NONE
+    return TotalMode.APPROX if approximate_total else TotalMode.EXACT
+
+
 # - - - /END INTERNAL API DEPENDENCIES - - - #
 
 
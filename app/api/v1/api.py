@@ -1,7 +1,7 @@
 """ Merge all API-v1 endpoints """
 
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, products, users, warehouses, supplies, orders, inventory
+from app.api.v1.endpoints import auth, products, users, warehouses, supplies, orders, inventory, monitoring
 from app.api.v1.endpoints.external import orders as external_orders
 
 
@@ -14,3 +14,4 @@ api_router.include_router(supplies.router, prefix="/supplies", tags=["supplies"]
 api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 api_router.include_router(external_orders.router, prefix="/external", tags=["external"])
 api_router.include_router(inventory.router, prefix="/inventory", tags=["inventory"])
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
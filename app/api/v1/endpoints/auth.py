@@ -7,7 +7,7 @@ from fastapi.responses import JSONResponse
 from app.config import settings
 from app.crud.user import user
 from app.api import deps
-from app.core.security import create_access_token
+from app.core.security import create_access_token, principal_claims
 from app.schemas.user import UserBase
 
 from datetime import timedelta
@@ -42,7 +42,8 @@ def login_access_token(
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         subject=user_obj.username,
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        claims=principal_claims(user_obj) if settings.TOKEN_CLAIMS else None
     )
 
     # ВАЖНО: Добавляем токен и в cookie, и в ответ
@@ -73,7 +74,7 @@ def login_access_token(
 
 @router.get("/me")
 def read_users_me(
-        current_user = Depends(deps.get_current_user),
+        current_user = Depends(deps.get_current_user_row),
 ) -> Any:
     """
     Get current user
@@ -1,11 +1,12 @@
 # endpoints/inventory.py
 from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.query_stats import query_budget
+from app.core.pagination import page_count
+from app.core.totals import TotalMode
 
-from app.crud.inventory import inventory
-from app.crud.warehouse import warehouse
+from app.crud.inventory import inventory_async
 
 from app.schemas.inventory import (
     InventoryResponse, InventoryList, InventoryFilterParams,
@@ -19,29 +20,15 @@ from app.models.inventory import Inventory
 router = APIRouter()
 
 
-def check_warehouse_access(
-        db: Session,
-        warehouse_id: int,
-        current_user: User,
-        allow_admin: bool = True
-) -> bool:
-    """ to deps prob or crud send  ->"""
-    warehouse_obj = warehouse.get(db, id=warehouse_id)
-    if not warehouse_obj:
-        return False
-
-    if allow_admin and current_user.is_superuser:
-        return True
-
-    return current_user.warehouse_id == warehouse_id
-
-
 @router.get("/my", response_model=InventoryList)
-def read_my_inventory(
+@query_budget(3)
+async def read_my_inventory(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         search: Optional[str] = None,
         in_stock_only: bool = False,
         low_stock_only: bool = False,
@@ -64,40 +51,46 @@ def read_my_inventory(
         low_stock_threshold=low_stock_threshold
     )
 
-    items, total = inventory.get_multi_by_warehouse(
+    result = await inventory_async.get_multi_by_warehouse(
         db,
         warehouse_id=current_user.warehouse_id,
         skip=skip,
         limit=per_page,
-        filters=filters
+        filters=filters,
+        after=after,
+        total_mode=total_mode
     )
 
     return {
-        "total": total,
-        "page": page,
-        "pages": (total + per_page - 1) // per_page,
+        "total": result.total,
+        "page": None if after else page,
+        "pages": page_count(result.total, per_page),
         "per_page": per_page,
-        "items": items
+        "next_cursor": result.next_cursor,
+        "items": result.items
     }
 
 
 @router.get("/warehouse/{warehouse_id}", response_model=InventoryList)
-def read_warehouse_inventory(
+@query_budget(4)
+async def read_warehouse_inventory(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_read_db),
         warehouse_id: int,
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         search: Optional[str] = None,
         in_stock_only: bool = False,
         low_stock_only: bool = False,
         low_stock_threshold: int = 10,
-        current_user: User = Depends(deps.get_current_user),
+        current_user: User = Depends(deps.get_read_user),
 ) -> Any:
     """
     Get inventory of chosen warehouse
     """
-    if not check_warehouse_access(db, warehouse_id, current_user):
+    if not await deps.can_access_warehouse(db, warehouse_id, current_user):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Warehouse not found",
@@ -112,18 +105,21 @@ def read_warehouse_inventory(
         low_stock_threshold=low_stock_threshold
     )
 
-    items, total = inventory.get_multi_by_warehouse(
+    result = await inventory_async.get_multi_by_warehouse(
         db,
         warehouse_id=warehouse_id,
         skip=skip,
         limit=per_page,
-        filters=filters
+        filters=filters,
+        after=after,
+        total_mode=total_mode
     )
 
     return {
-        "total": total,
-        "page": page,
-        "pages": (total + per_page - 1) // per_page,
+        "total": result.total,
+        "page": None if after else page,
+        "pages": page_count(result.total, per_page),
         "per_page": per_page,
-        "items": items
+        "next_cursor": result.next_cursor,
+        "items": result.items
     }
@@ -0,0 +1,66 @@
+from typing import Any
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.api import deps
+from app.core import slow_queries
+from app.core.metrics import render_prometheus
+from app.database import get_pool_stats
+
+from app.models.user import User
+
+
+router = APIRouter()
+
+
+# - - - ADMIN ROUTES - - - #
+
+
+@router.get("/db-pool")
+def read_db_pool_stats(
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Connection pool state: checked out / idle / overflow, wait time, checkout timeouts
+    Available: admin
+    """
+    return get_pool_stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics(
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    All process metrics in Prometheus text format
+    Available: admin
+    """
+    return render_prometheus()
+
+
+@router.get("/slow-queries")
+def read_slow_queries(
+        limit: int = Query(20, ge=1, le=200),
+        group: bool = Query(False, description="Группировать по форме запроса"),
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Worst slow queries from the ring buffer: duration, parameters, route, EXPLAIN plan
+    Available: admin
+    """
+    return slow_queries.worst_by_shape(limit) if group else slow_queries.worst(limit)
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries(
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Clear the slow query ring buffer
+    Available: admin
+    """
+    slow_queries.clear()
+    return {"message": "Slow query buffer cleared"}
+
+
+# - - - /END ADMIN ROUTES - - - #
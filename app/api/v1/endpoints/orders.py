@@ -1,10 +1,11 @@
 from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
 from datetime import date
 from app.api import deps
-from app.crud.order import order
-from app.crud.warehouse import warehouse
+from app.core.query_stats import query_budget
+from app.core.pagination import page_count
+from app.core.totals import TotalMode
+from app.crud.order import order_async
 from app.schemas.order import (
     OrderResponse, OrderList, OrderUpdate,
     OrderFilterParams, OrderStatusUpdate
@@ -19,18 +20,21 @@ router = APIRouter()
 
 
 @router.get("/admin/all", response_model=OrderList)
-def read_all_orders_admin(
+@query_budget(5)
+async def read_all_orders_admin(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_read_db),
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
-        search: Optional[str] = Query(None, description="Поиск по номеру, клиенту, адресу"),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
+        search: Optional[str] = Query(None, description="Поиск по подстроке: номер, внешний id, адрес"),
         status_code: Optional[str] = Query(None, description="Фильтр по статусу"),
         warehouse_id: Optional[int] = Query(None, description="Фильтр по складу"),
         date_from: Optional[date] = Query(None),
         date_to: Optional[date] = Query(None),
         is_shipped: Optional[bool] = Query(None, description="Отгружен/не отгружен"),
-        current_user: User = Depends(deps.get_current_active_superuser),
+        current_user: User = Depends(deps.get_read_active_superuser),
 ) -> Any:
     """
     Получить ВСЕ заказы с пагинацией и фильтрацией (только админ).
@@ -46,20 +50,23 @@ def read_all_orders_admin(
         is_shipped=is_shipped
     )
 
-    orders, total = order.get_multi_filtered(
+    result = await order_async.get_multi_filtered(
         db,
         skip=skip,
         limit=per_page,
         filters=filters,
-        is_superuser=True
+        is_superuser=True,
+        after=after,
+        total_mode=total_mode
     )
 
     return {
-        "total": total,
-        "page": page,
-        "pages": (total + per_page - 1) // per_page,
+        "total": result.total,
+        "page": None if after else page,
+        "pages": page_count(result.total, per_page),
         "per_page": per_page,
-        "orders": orders
+        "next_cursor": result.next_cursor,
+        "orders": result.items
     }
 
 
@@ -67,12 +74,15 @@ def read_all_orders_admin(
 
 
 @router.get("/warehouse/my", response_model=OrderList)
-def read_my_warehouse_orders(
+@query_budget(5)
+async def read_my_warehouse_orders(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
-        search: Optional[str] = Query(None, description="Поиск по номеру, клиенту, адресу"),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
+        search: Optional[str] = Query(None, description="Поиск по подстроке: номер, внешний id, адрес"),
         status_code: Optional[str] = Query(None, description="Фильтр по статусу"),
         date_from: Optional[date] = Query(None),
         date_to: Optional[date] = Query(None),
@@ -98,31 +108,37 @@ def read_my_warehouse_orders(
         is_shipped=is_shipped
     )
 
-    orders, total = order.get_multi_filtered(
+    result = await order_async.get_multi_filtered(
         db,
         skip=skip,
         limit=per_page,
         filters=filters,
         warehouse_id=current_user.warehouse_id,
-        is_superuser=False
+        is_superuser=False,
+        after=after,
+        total_mode=total_mode
     )
 
     return {
-        "total": total,
-        "page": page,
-        "pages": (total + per_page - 1) // per_page,
+        "total": result.total,
+        "page": None if after else page,
+        "pages": page_count(result.total, per_page),
         "per_page": per_page,
-        "orders": orders
+        "next_cursor": result.next_cursor,
+        "orders": result.items
     }
 
 
 @router.get("/warehouse/{warehouse_id}", response_model=OrderList)
-def read_warehouse_orders(
+@query_budget(6)
+async def read_warehouse_orders(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         warehouse_id: int,
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         search: Optional[str] = None,
         status_code: Optional[str] = None,
         date_from: Optional[date] = None,
@@ -135,21 +151,13 @@ def read_warehouse_orders(
     Доступно: админам ИЛИ сотрудникам этого склада.
     """
     # Проверка доступа
-    warehouse_obj = warehouse.get(db, id=warehouse_id)
-    if not warehouse_obj:
+    if not await deps.can_access_warehouse(db, warehouse_id, current_user):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Warehouse not found",
         )
 
     is_superuser = deps.is_superuser(current_user)
-    is_employee = current_user.warehouse_id == warehouse_id
-
-    if not (is_superuser or is_employee):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Warehouse not found",
-        )
 
     skip = (page - 1) * per_page
 
@@ -161,48 +169,60 @@ def read_warehouse_orders(
         is_shipped=is_shipped
     )
 
-    orders, total = order.get_multi_filtered(
+    result = await order_async.get_multi_filtered(
         db,
         skip=skip,
         limit=per_page,
         filters=filters,
         warehouse_id=warehouse_id,
-        is_superuser=is_superuser
+        is_superuser=is_superuser,
+        after=after,
+        total_mode=total_mode
     )
 
     return {
-        "total": total,
-        "page": page,
-        "pages": (total + per_page - 1) // per_page,
+        "total": result.total,
+        "page": None if after else page,
+        "pages": page_count(result.total, per_page),
         "per_page": per_page,
-        "orders": orders
+        "next_cursor": result.next_cursor,
+        "orders": result.items
     }
 
 
 @router.get("/new", response_model=OrderList)
-def read_new_orders(
+@query_budget(4)
+async def read_new_orders(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """
     Получить новые заказы (статус 'new') для своего склада.
     """
-    return read_my_warehouse_orders(
+    return await read_my_warehouse_orders(
         db=db,
         page=page,
         per_page=per_page,
+        after=after,
+        total_mode=total_mode,
+        search=None,
         status_code="new",
+        date_from=None,
+        date_to=None,
+        is_shipped=None,
         current_user=current_user
     )
 
 
 @router.patch("/{order_id}/ship", response_model=OrderResponse)
-def ship_order(
+async def ship_order(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         order_id: int,
         tracking_number: Optional[str] = Query(None, description="Трек-номер отправления"),
         current_user: User = Depends(deps.get_current_user),
@@ -211,7 +231,7 @@ def ship_order(
     Отметить заказ как отгруженный (статус -> shipped).
     Доступно: админам ИЛИ сотрудникам склада этого заказа.
     """
-    order_obj = order.get_with_items(db, id=order_id)
+    order_obj = await order_async.get_with_items(db, id=order_id)
     if not order_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -240,15 +260,15 @@ def ship_order(
         order_obj.tracking_number = tracking_number
 
     # Меняем статус
-    order_obj = order.update_status(db, db_obj=order_obj, status_code="shipped")
+    order_obj = await order_async.update_status(db, db_obj=order_obj, status_code="shipped")
 
     return order_obj
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-def read_order(
+async def read_order(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         order_id: int,
         current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -256,7 +276,7 @@ def read_order(
     Получить детальную информацию о заказе.
     Доступно: админам ИЛИ сотрудникам склада этого заказа.
     """
-    order_obj = order.get_with_items(db, id=order_id)
+    order_obj = await order_async.get_with_items(db, id=order_id)
     if not order_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,11 +1,19 @@
-from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from collections import Counter
+from typing import Any, List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.config import settings
+from app.core.query_stats import query_budget
+from app.core.totals import TotalMode
 
-from app.crud.product import product
+from app.crud.product import product, product_async
+from app.crud.product_autocomplete import product_autocomplete
 
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductList
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, ProductBatchUpdate, ProductResponse, ProductList, ProductAutocompleteItem
+)
 
 from app.models.user import User
 from app.models.product import Product
@@ -18,6 +26,7 @@ router = APIRouter()
 
 
 @router.post("/", response_model=ProductResponse)
+@query_budget(3)
 def create_product(
         *,
         db: Session = Depends(deps.get_db),
@@ -37,6 +46,7 @@ def create_product(
 
 
 @router.put("/{product_id}", response_model=ProductResponse)
+@query_budget(4)
 def update_product(
         *,
         db: Session = Depends(deps.get_db),
@@ -77,19 +87,18 @@ def delete_product(
             detail="Product not found",
         )
 
-    if product_obj.inventory_items:
-        non_zero_inventory = [item for item in product_obj.inventory_items if item.quantity > 0]
-        if non_zero_inventory:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot delete product with existing inventory. Deactivate it instead.",
-            )
+    if product.has_stock(db, id=product_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot delete product with existing inventory. Deactivate it instead.",
+        )
 
     product.remove(db, row_id=product_id)
     return None
 
 
 @router.patch("/{product_id}/status", response_model=ProductResponse)
+@query_budget(3)
 def toggle_product_active(
         *,
         db: Session = Depends(deps.get_db),
@@ -103,32 +112,117 @@ def toggle_product_active(
             detail="Product not found",
         )
 
-    product_obj.is_active = not product_obj.is_active
-    db.add(product_obj)
-    db.commit()
-    db.refresh(product_obj)
+    product_obj = product.update(db, db_obj=product_obj, obj_in=ProductUpdate(is_active=not product_obj.is_active))
     return product_obj
 
 
-@router.get("/", response_model=ProductList)
-def get_all_products(
+@router.post("/batch", response_model=List[ProductResponse])
+@query_budget(3)
+def create_products(
+        *,
+        db: Session = Depends(deps.get_db),
+        products_in: List[ProductCreate] = Body(..., max_length=settings.BATCH_MAX_SIZE),
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """ Create several products with one INSERT [RAW JSON list] """
+    skus = Counter(product_in.sku for product_in in products_in)
+    taken = sorted({sku for sku, count in skus.items() if count > 1}
+                   | {product_obj.sku for product_obj in product.get_by_skus(db, skus=list(skus))})
+    if taken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Products with SKU {taken} already exist or repeat in the batch",
+        )
+
+    return product.create_many(db, objs_in=products_in)
+
+
+@router.patch("/batch", response_model=List[ProductResponse])
+def update_products(
+        *,
+        db: Session = Depends(deps.get_db),
+        products_in: List[ProductBatchUpdate] = Body(..., max_length=settings.BATCH_MAX_SIZE),
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """ Partial update of several products: one UPDATE per set of changed fields [RAW JSON list] """
+    updates = {product_in.id: product_in.model_dump(exclude_unset=True, exclude={"id"}) for product_in in products_in}
+    if len(updates) != len(products_in):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product ids repeat in the batch",
+        )
+
+    products = {product_obj.id: product_obj for product_obj in product.get_many(db, list(updates))}
+    missing = sorted(set(updates) - set(products))
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Products {missing} not found",
+        )
+
+    new_skus = {
+        product_id: data["sku"] for product_id, data in updates.items()
+        if data.get("sku") and data["sku"] != products[product_id].sku
+    }
+    repeated = {sku for sku, count in Counter(new_skus.values()).items() if count > 1}
+    taken = sorted(repeated | {product_obj.sku for product_obj in product.get_by_skus(db, skus=list(new_skus.values()))})
+    if taken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Products with SKU {taken} already exist or repeat in the batch",
+        )
+
+    return product.update_many(db, objs_in=updates)
+
+
+@router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
+def delete_products(
         *,
         db: Session = Depends(deps.get_db),
+        ids: List[int] = Query(..., max_length=settings.BATCH_MAX_SIZE),
+        current_user: User = Depends(deps.get_current_active_superuser),
+) -> None:
+    """ Delete several products by ids (missing ids are skipped) """
+    referenced = product.get_referenced_ids(db, ids=ids)
+    if referenced:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Products {referenced} are used in inventory, supplies or orders. Deactivate them instead.",
+        )
+
+    product.remove_many(db, ids=ids)
+    return None
+
+
+@router.get("/", response_model=ProductList)
+@query_budget(4)
+async def get_all_products(
+        *,
+        db: deps.AnySession = Depends(deps.get_read_db),
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=1000),
         is_active: Optional[bool] = None,
         search: Optional[str] = None,
-        current_user: User = Depends(deps.get_current_active_superuser),
+        ids: Optional[List[int]] = Query(None, max_length=settings.BATCH_MAX_SIZE),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
+        current_user: User = Depends(deps.get_read_active_superuser),
 ) -> Any:
-    """ Get all products w filters [RAW JSON] """
-    products = product.get_multi_all(
-        db, skip=skip, limit=limit, is_active=is_active, search=search
+    """ Get all products w filters [RAW JSON]; ?ids=1&ids=2 - only these products, one query """
+    if ids:
+        products = await product_async.get_many(db, ids)
+        return {
+            "total": len(products),
+            "products": products
+        }
+
+    result = await product_async.get_multi_all(
+        db, skip=skip, limit=limit, is_active=is_active, search=search, total_mode=total_mode
     )
-    total = db.query(Product).count()
 
     return {
-        "total": total,
-        "products": products
+        "total": result.total,
+        "products": result.items
     }
 
 
@@ -154,6 +248,24 @@ def get_all_products(
 #     }
 
 
+@router.get("/autocomplete", response_model=List[ProductAutocompleteItem])
+@query_budget(2)
+async def autocomplete_products(
+        *,
+        q: str = Query(..., min_length=1, max_length=100, description="Начало SKU или названия"),
+        limit: int = Query(10, ge=1, le=50),
+        current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """ Active products by SKU / name prefix from the in-memory index, SKU matches first """
+    if not product_autocomplete.loaded:
+        await run_in_threadpool(product_autocomplete.load)
+
+    return [
+        {"id": product_id, "sku": sku, "name": name}
+        for product_id, sku, name in product_autocomplete.search(q, limit)
+    ]
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 def get_product(
         *,
@@ -162,7 +274,7 @@ def get_product(
         current_user: User = Depends(deps.get_current_user),
 ) -> Any:
     """ Get chosen product information """
-    product_obj = product.get(db, id=product_id)
+    product_obj = product.get_cached(db, [product_id]).get(product_id)
     if not product_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,12 +1,15 @@
 from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
 from datetime import date
 
 from app.api import deps
+from app.config import settings
+from app.core.query_stats import query_budget
+from app.core.pagination import page_count
+from app.core.totals import TotalMode
 
-from app.crud.supply import supply, supply_item
-from app.crud.warehouse import warehouse
+from app.crud.supply import supply_async, supply_item_async
+from app.crud.warehouse import warehouse_async
 
 from app.schemas.supply import (
     SupplyCreate, SupplyUpdate, SupplyResponse, SupplyList,
@@ -24,9 +27,9 @@ router = APIRouter()
 
 
 @router.post("/", response_model=SupplyResponse, status_code=status.HTTP_201_CREATED)
-def create_supply(
+async def create_supply(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         supply_in: SupplyCreate,
         current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -34,16 +37,18 @@ def create_supply(
     Create new supply
     Available: employee of current warehouse
     """
-    warehouse_obj = warehouse.get(db, id=supply_in.warehouse_id)
-    if not warehouse_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Warehouse not found",
-        )
-
     # is_superuser = current_user.is_superuser
     is_employee = current_user.warehouse_id == supply_in.warehouse_id
 
+    # склад сотрудника существует (см. deps.can_access_warehouse), загружаем только чужой
+    if not (is_employee and settings.PRINCIPAL_CACHE_PERMISSIONS):
+        warehouse_obj = await warehouse_async.get(db, id=supply_in.warehouse_id)
+        if not warehouse_obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Warehouse not found",
+            )
+
     if not is_employee:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -53,14 +58,14 @@ def create_supply(
     # Проверяем, что все товары существуют
     # (можно добавить отдельную проверку)
 
-    supply_obj = supply.create_with_items(db, obj_in=supply_in)
+    supply_obj = await supply_async.create_with_items(db, obj_in=supply_in)
     return supply_obj
 
 
 @router.get("/{supply_id}", response_model=SupplyResponse)
-def read_supply(
+async def read_supply(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         supply_id: int,
         current_user: User = Depends(deps.get_current_user),
 ) -> Any:
@@ -68,7 +73,7 @@ def read_supply(
     Get supply by supply_id
     Available: admin or employee of current warehouse
     """
-    supply_obj = supply.get_with_items(db, id=supply_id)
+    supply_obj = await supply_async.get_with_items(db, id=supply_id)
     if not supply_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -88,9 +93,9 @@ def read_supply(
 
 
 @router.delete("/{supply_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_supply(
+async def delete_supply(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         supply_id: int,
         current_user: User = Depends(deps.get_current_user),
 ) -> None:
@@ -98,7 +103,7 @@ def delete_supply(
     Remove supply by supply_id (inventory is cleaning up)
     Available: admin or employee of current warehouse
     """
-    supply_obj = supply.get(db, id=supply_id)
+    supply_obj = await supply_async.get_with_items(db, id=supply_id)
     if not supply_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,36 +120,39 @@ def delete_supply(
             detail="Supply not found",
         )
 
-    supply.delete_with_items(db, db_obj=supply_obj)
+    await supply_async.delete_with_items(db, db_obj=supply_obj)
     return None
 
 
 @router.get("/warehouses/{warehouse_id}/supplies", response_model=SupplyList)
-def read_warehouse_supplies(
+@query_budget(5)
+async def read_warehouse_supplies(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_read_db),
         warehouse_id: int,
         page: int = Query(1, ge=1, description="Номер страницы"),
         per_page: int = Query(20, ge=1, le=100, description="Элементов на странице"),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         search: Optional[str] = Query(None, description="Поиск по номеру поставки"),
         date_from: Optional[date] = Query(None, description="Начальная дата (ГГГГ-ММ-ДД)"),
         date_to: Optional[date] = Query(None, description="Конечная дата (ГГГГ-ММ-ДД)"),
         product_id: Optional[int] = Query(None, description="Фильтр по товару"),
-        current_user: User = Depends(deps.get_current_user),
+        current_user: User = Depends(deps.get_read_user),
 ) -> Any:
     """
     Получить все поставки склада с пагинацией и фильтрацией.
     Доступно: админам ИЛИ сотрудникам этого склада.
     """
-    # Проверка доступа к складу
-    warehouse_obj = warehouse.get(db, id=warehouse_id)
+    # Проверка доступа к складу (склад нужен и для названия в ответе - загружаем всегда)
+    warehouse_obj = await warehouse_async.get(db, id=warehouse_id)
     if not warehouse_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Warehouse not found",
         )
 
-    is_superuser = current_user.is_superuser
+    is_superuser = deps.is_superuser(current_user)
     is_employee = current_user.warehouse_id == warehouse_id
 
     if not (is_superuser or is_employee):
@@ -164,33 +172,39 @@ def read_warehouse_supplies(
         product_id=product_id
     )
 
-    supplies, total = supply.get_multi_by_warehouse(
+    result = await supply_async.get_multi_by_warehouse(
         db,
         warehouse_id=warehouse_id,
         skip=skip,
         limit=per_page,
-        filters=filters
+        filters=filters,
+        after=after,
+        total_mode=total_mode
     )
 
     # Добавляем название склада для удобства
-    for s in supplies:
+    for s in result.items:
         s.warehouse_name = warehouse_obj.name
 
     return {
-        "total": total,
-        "page": page,
-        "pages": (total + per_page - 1) // per_page,
+        "total": result.total,
+        "page": None if after else page,
+        "pages": page_count(result.total, per_page),
         "per_page": per_page,
-        "supplies": supplies
+        "next_cursor": result.next_cursor,
+        "supplies": result.items
     }
 
 
 @router.get("/warehouses/my/supplies", response_model=SupplyList)
-def read_my_warehouse_supplies(
+@query_budget(5)
+async def read_my_warehouse_supplies(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         page: int = Query(1, ge=1),
         per_page: int = Query(20, ge=1, le=100),
+        after: Optional[str] = Query(None, description="Курсор: next_cursor предыдущей страницы (вместо page)"),
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         search: Optional[str] = None,
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
@@ -207,11 +221,13 @@ def read_my_warehouse_supplies(
             detail="You are not assigned to any warehouse",
         )
 
-    return read_warehouse_supplies(
+    return await read_warehouse_supplies(
         db=db,
         warehouse_id=current_user.warehouse_id,
         page=page,
         per_page=per_page,
+        after=after,
+        total_mode=total_mode,
         search=search,
         date_from=date_from,
         date_to=date_to,
@@ -262,9 +278,9 @@ def read_my_warehouse_supplies(
 
 
 @router.delete("/supply-items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_supply_item(
+async def delete_supply_item(
         *,
-        db: Session = Depends(deps.get_db),
+        db: deps.AnySession = Depends(deps.get_session),
         item_id: int,
         current_user: User = Depends(deps.get_current_user),
 ) -> None:
@@ -272,7 +288,7 @@ def delete_supply_item(
     Удалить позицию из поставки (уменьшает инвентарь).
     Доступно: админам ИЛИ сотрудникам склада.
     """
-    item_obj = supply_item.get(db, id=item_id)
+    item_obj = await supply_item_async.get_with_supply(db, id=item_id)
     if not item_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -280,7 +296,7 @@ def delete_supply_item(
         )
 
     # Проверка прав
-    is_superuser = deps.is_superuser(current_user)
+    is_superuser = current_user.is_superuser
     is_employee = current_user.warehouse_id == item_obj.supply.warehouse_id
 
     if not (is_superuser or is_employee):
@@ -289,5 +305,5 @@ def delete_supply_item(
             detail="Supply item not found",
         )
 
-    supply_item.delete_with_inventory(db, db_obj=item_obj)
+    await supply_item_async.delete_with_inventory(db, db_obj=item_obj)
     return None
@@ -3,7 +3,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.query_stats import query_budget
 from app.schemas.user import UserResponse, UserCreate, UserUpdate, UserList, UserInDB
+from app.crud.principal_cache import principal_cache
 from app.crud.user import user
 
 
@@ -28,6 +30,7 @@ def read_user_by_id(
 
 
 @router.patch("/status", response_model=UserResponse)
+@query_budget(3)
 def update_user_active(
         *,
         db: Session = Depends(deps.get_db),
@@ -54,11 +57,12 @@ def update_user_active(
 
     db_user.is_active = user_data.is_active
     db.commit()
-    db.refresh(db_user)
+    principal_cache.invalidate([db_user.id])
     return db_user
 
 
 @router.put("/{user_id}", response_model=UserResponse)
+@query_budget(4)
 def update_user(
         *,
         db: Session = Depends(deps.get_db),
@@ -82,6 +86,7 @@ def update_user(
             )
 
     updated_user = user.update(db, db_obj=db_user, obj_in=user_data)
+    principal_cache.invalidate([updated_user.id])
     return updated_user
 
 
@@ -105,10 +110,12 @@ def delete_user(
             detail="Can not remove yourself",
         )
 
-    user.remove(db, row_id=user_id)
+    removed_user = user.remove(db, row_id=user_id)
+    principal_cache.invalidate([removed_user.id])
 
 
 @router.post("/", response_model=UserResponse)
+@query_budget(3)
 def create_user(
         *,
         db: Session = Depends(deps.get_db),
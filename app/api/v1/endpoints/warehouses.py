@@ -4,7 +4,10 @@ from sqlalchemy.orm import Session
 
 
 from app.api import deps
+from app.core.query_stats import query_budget
+from app.core.totals import TotalMode
 
+from app.crud.principal_cache import principal_cache
 from app.crud.warehouse import warehouse
 # from app.crud.user import user
 
@@ -21,6 +24,7 @@ router = APIRouter()
 
 
 @router.post("/", response_model=WarehouseResponse)
+@query_budget(4)
 def create_warehouse(
         *,
         db: Session = Depends(deps.get_db),
@@ -32,10 +36,12 @@ def create_warehouse(
     Available: admin
     """
     warehouse_obj = warehouse.create_with_users(db, obj_in=warehouse_in)
+    principal_cache.invalidate(user_obj.id for user_obj in warehouse_obj.users)  # сменился warehouse_id
     return warehouse_obj
 
 
 @router.put("/{warehouse_id}", response_model=WarehouseResponse)
+@query_budget(5)
 def update_warehouse(
         *,
         db: Session = Depends(deps.get_db),
@@ -47,14 +53,17 @@ def update_warehouse(
     Update existing warehouse [RAW JSON]
     Available: admin
     """
-    warehouse_obj = warehouse.get(db, id=warehouse_id)
+    warehouse_obj = warehouse.get_with_users(db, id=warehouse_id)
     if not warehouse_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Warehouse not found",
         )
 
+    previous_user_ids = [user_obj.id for user_obj in warehouse_obj.users]
     warehouse_obj = warehouse.update_with_users(db, db_obj=warehouse_obj, obj_in=warehouse_in)
+    # warehouse_id сменился у снятых и у добавленных сотрудников
+    principal_cache.invalidate(previous_user_ids + [user_obj.id for user_obj in warehouse_obj.users])
     return warehouse_obj
 
 
@@ -76,7 +85,7 @@ def delete_warehouse(
             detail="Warehouse not found",
         )
 
-    if warehouse_obj.users:
+    if warehouse.has_users(db, id=warehouse_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete warehouse with assigned employees. Remove employees first.",
@@ -87,26 +96,27 @@ def delete_warehouse(
 
 
 @router.get("/", response_model=WarehouseList)
+@query_budget(5)
 def get_warehouses(
         *,
         db: Session = Depends(deps.get_db),
         skip: int = 0,
         limit: int = 100,
         is_active: Optional[bool] = None,
+        total_mode: TotalMode = Depends(deps.get_total_mode),
         current_user: User = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Get all warehouses with pagination [RAW JSON]
     Available: admin
     """
-    warehouses = warehouse.get_multi_with_users(
-        db, skip=skip, limit=limit, is_active=is_active
+    result = warehouse.get_multi_with_users(
+        db, skip=skip, limit=limit, is_active=is_active, total_mode=total_mode
     )
-    total = db.query(Warehouse).count()
 
     return {
-        "total": total,
-        "warehouses": warehouses
+        "total": result.total,
+        "warehouses": result.items
     }
 
 
@@ -126,13 +136,13 @@ def get_my_warehouse(
     Get my warehouse [RAW JSON]
     Available: employee
     """
-    if not current_user.warehouse:
+    if not current_user.warehouse_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="You are not assigned to any warehouse",
         )
 
-    warehouse_obj = warehouse.get_with_users(db, id=current_user.warehouse.id)
+    warehouse_obj = warehouse.get_with_users(db, id=current_user.warehouse_id)
     return warehouse_obj
 
 
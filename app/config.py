@@ -1,5 +1,7 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from sqlalchemy.engine import make_url
+from typing import Any, Dict, List, Optional
 from enum import Enum
 from pathlib import Path
 
@@ -14,6 +16,39 @@ class DatabaseType(str, Enum):
     POSTGRESQL = "postgresql"
 
 
+class QueryRepeatMode(str, Enum):
+    OFF = "off"
+    WARN = "warn"  # логировать
+    RAISE = "raise"  # уронить запрос (dev / тесты)
+
+
+class PageCountMode(str, Enum):
+    SEPARATE = "separate"  # отдельный SELECT count(*) перед страницей
+    SUBQUERY = "subquery"  # (SELECT count(*) ...) колонкой в запросе страницы
+    WINDOW = "window"  # COUNT(*) OVER () в запросе страницы, с курсором after - отдельный count
+
+
+# Профили пула соединений.
+# SQLite: локальный файл, соединения дешёвые и не рвутся, много писателей всё равно упрутся в блокировку.
+# PostgreSQL: сетевые соединения, нужны pre-ping и recycle (рвутся балансировщиком / pgbouncer).
+DB_POOL_PROFILES: Dict[DatabaseType, Dict[str, Any]] = {
+    DatabaseType.SQLITE: {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+    },
+    DatabaseType.POSTGRESQL: {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    },
+}
+
+
 class Settings(BaseSettings):
     # Базовые настройки
     PROJECT_NAME: str = "FastAPI Shop"
@@ -26,6 +61,74 @@ class Settings(BaseSettings):
     # Тип базы данных
     DB_TYPE: DatabaseType = DatabaseType.SQLITE
 
+    # Асинхронный режим: AsyncSession (aiosqlite / asyncpg) для эндпоинтов заказов, инвентаря и поставок
+    DB_ASYNC_MODE: bool = False
+
+    # Инструментирование SQL: число запросов и время БД на каждый HTTP запрос
+    QUERY_STATS_HEADERS: bool = True  # X-DB-Query-Count / X-DB-Time-Ms в ответе
+    # N+1 детектор: один и тот же запрос (с точностью до параметров) больше N раз за HTTP запрос
+    QUERY_REPEAT_MODE: QueryRepeatMode = QueryRepeatMode.OFF
+    QUERY_REPEAT_THRESHOLD: int = 10
+    # Превышение @query_budget эндпоинта (тот же выбор: off / warn / raise)
+    QUERY_BUDGET_MODE: QueryRepeatMode = QueryRepeatMode.OFF
+    # Неявная lazy-загрузка relationship во время HTTP запроса (загрузка должна быть в options CRUD-метода)
+    LAZY_LOAD_MODE: QueryRepeatMode = QueryRepeatMode.OFF
+
+    # Лог медленных запросов (кольцевой буфер + EXPLAIN), 0 = выкл.
+    SLOW_QUERY_MS: float = 200.0
+    SLOW_QUERY_SAMPLE_RATE: float = 1.0  # доля медленных запросов, которые логируются и EXPLAIN-ятся
+    SLOW_QUERY_BUFFER_SIZE: int = 200
+    # План медленного запроса: EXPLAIN в фоновом потоке на отдельном соединении пула (ещё один запрос к БД)
+    SLOW_QUERY_EXPLAIN: bool = False
+
+    # Номера документов (ORD-/SUP-): сколько номеров процесс резервирует за раз
+    NUMBER_BLOCK_SIZE: int = 20
+
+    # Часовой пояс для фильтров date_from / date_to (границы суток), в БД время хранится в UTC
+    TIMEZONE: str = "UTC"
+
+    # Кэш точных total для списков с пагинацией (сек.), 0 = выкл. Сбрасывается записью в таблицу
+    TOTALS_CACHE_TTL: float = 10.0
+    TOTALS_CACHE_SIZE: int = 1000
+    # Точный total тем же запросом, что и страница (см. PageCountMode).
+    # SUBQUERY, а не WINDOW: COUNT(*) OVER () собирает всю отфильтрованную выборку до LIMIT.
+    # scripts/bench_page_count.py, SQLite, 300k заказов, первая страница:
+    # все заказы 3.5 мс против 836 мс, заказы склада 2.4 мс против 56 мс
+    TOTALS_PAGE_COUNT: PageCountMode = PageCountMode.SUBQUERY
+
+    # Максимум строк в одном пакетном запросе (GET ?ids=, POST / PATCH /batch, DELETE ?ids=)
+    BATCH_MAX_SIZE: int = 1000
+
+    # Поиск товаров по полнотекстовому индексу (миграция 0005), False - ilike('%term%') по всей таблице
+    PRODUCT_SEARCH_FTS: bool = True
+    # Подсказки товаров по префиксу SKU / названия из памяти (GET /products/autocomplete)
+    PRODUCT_AUTOCOMPLETE_ON_STARTUP: bool = True  # загрузить при старте, иначе - при первом запросе
+    PRODUCT_AUTOCOMPLETE_REFRESH: float = 300.0  # полная перезагрузка (записи других воркеров), сек., 0 = выкл.
+    # Кэш каталога товаров в памяти процесса, только для чтения (GET /products/{id}, товары в остатках и заказах):
+    # LRU на N товаров, запись живёт TTL сек. (записи других воркеров видны не позже), 0 = выкл.
+    PRODUCT_CACHE_SIZE: int = 10000
+    PRODUCT_CACHE_TTL: float = 30.0
+    # Кэш аутентифицированных пользователей (get_current_user) по subject токена: LRU на N пользователей,
+    # запись живёт TTL сек. (изменения пользователей в других воркерах видны не позже), 0 = выкл.
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 30.0
+    # Доступ к складу в заказах / поставках / инвентаре - по warehouse_id и is_superuser пользователя,
+    # без загрузки склада (склад загружается только для админа: 404 на несуществующий)
+    PRINCIPAL_CACHE_PERMISSIONS: bool = True
+    # Токены с claims (id, роль и склад пользователя): get_current_user собирает пользователя из токена без БД.
+    # Изменение пользователя отзывает claims его выпущенных токенов (список отзыва в памяти процесса).
+    # Только с одним воркером (WEB_CONCURRENCY=1): другой воркер отзыв не увидит до истечения токена
+    TOKEN_CLAIMS: bool = False
+    # Число воркеров (uvicorn / gunicorn берут --workers по умолчанию из WEB_CONCURRENCY)
+    WEB_CONCURRENCY: int = 1
+    # Статусы заказов в памяти процесса (code <-> id): перечитать через N сек. (изменения других воркеров), 0 = выкл.
+    ORDER_STATUS_REFRESH: float = 300.0
+    # Поиск заказов по подстроке через trigram индекс SQLite (миграция 0006), False - ilike('%term%')
+    ORDER_SEARCH_FTS: bool = True
+    # Частота триграммы (выбор самых редких для MATCH): оценка по выборке из N строк, кэш на TTL сек.
+    TRIGRAM_SAMPLE_SIZE: int = 1000
+    TRIGRAM_COUNT_TTL: float = 300.0
+
     # Безопасность
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
@@ -34,6 +137,24 @@ class Settings(BaseSettings):
     # SQLite настройки
     SQLITE_DB_PATH: str = "./app.db"
 
+    # SQLite performance mode: WAL и прагмы на каждом соединении
+    SQLITE_PERFORMANCE_MODE: bool = False
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # в WAL режиме NORMAL безопасен и не делает fsync на каждый commit
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # байт
+    SQLITE_CACHE_SIZE: int = -64000  # отрицательное значение = KiB (64 МБ)
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Read replica для GET-списков (None = всё читается из основной БД).
+    # Локально: копия SQLite файла (sqlite:///./app_replica.db) или локальный PostgreSQL
+    READ_REPLICA_URL: Optional[str] = None
+    # Сколько секунд после своей записи пользователь читает из основной БД (read-your-writes), 0 = выкл.
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Повтор записи при "database is locked" / busy (экспоненциальная задержка)
+    DB_WRITE_RETRIES: int = 5
+    DB_WRITE_RETRY_BACKOFF: float = 0.05  # сек., удваивается на каждой попытке
+
     # PostgreSQL настройки
     POSTGRES_SERVER: Optional[str] = None
     POSTGRES_USER: Optional[str] = None
@@ -41,6 +162,13 @@ class Settings(BaseSettings):
     POSTGRES_DB: Optional[str] = None
     POSTGRES_PORT: str = "5432"
 
+    # Пул соединений: None = значение из профиля DB_POOL_PROFILES для текущего DB_TYPE
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: Optional[float] = None  # сек. ожидания свободного соединения
+    DB_POOL_RECYCLE: Optional[int] = None  # сек. жизни соединения, -1 = без ограничения
+    DB_POOL_PRE_PING: Optional[bool] = None
+
     # CORS
     # BACKEND_CORS_ORIGINS: List[str] = [
     #     "http://localhost:3000",
@@ -55,21 +183,57 @@ class Settings(BaseSettings):
         "some-hash-phrase-or-big-uuid-such-as-ext-api-key-2"
     ]
 
-    @property
-    def DATABASE_URL(self) -> str:
+    def _build_database_url(self, sqlite_driver: str, postgres_driver: str) -> str:
         if self.DB_TYPE == DatabaseType.POSTGRESQL:
             if not all([self.POSTGRES_SERVER, self.POSTGRES_USER,
                         self.POSTGRES_PASSWORD, self.POSTGRES_DB]):
                 raise ValueError("PostgreSQL credentials not set")
             return (
-                f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+                f"{postgres_driver}://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
                 f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
             )
         else:
             # SQLite
             db_path = Path(self.SQLITE_DB_PATH)
             db_path.parent.mkdir(parents=True, exist_ok=True)
-            return f"sqlite:///{db_path}"
+            return f"{sqlite_driver}:///{db_path}"
+
+    @property
+    def DATABASE_POOL_OPTIONS(self) -> Dict[str, Any]:
+        """Параметры пула для create_engine: профиль DB_TYPE + явные переопределения"""
+        options = dict(DB_POOL_PROFILES[self.DB_TYPE])
+        overrides = {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return options
+
+    @property
+    def DATABASE_URL(self) -> str:
+        return self._build_database_url("sqlite", "postgresql")
+
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return self._build_database_url("sqlite+aiosqlite", "postgresql+asyncpg")
+
+    @property
+    def ASYNC_READ_REPLICA_URL(self) -> Optional[str]:
+        if not self.READ_REPLICA_URL:
+            return None
+        url = make_url(self.READ_REPLICA_URL)
+        driver = "sqlite+aiosqlite" if url.get_backend_name() == "sqlite" else "postgresql+asyncpg"
+        return url.set(drivername=driver).render_as_string(hide_password=False)
+
+    @model_validator(mode="after")
+    def _check_token_claims(self) -> "Settings":
+        if self.TOKEN_CLAIMS and self.WEB_CONCURRENCY > 1:
+            # список отзыва у каждого воркера свой: деактивация в одном не видна остальным до истечения токена
+            raise ValueError("TOKEN_CLAIMS requires WEB_CONCURRENCY=1")
+        return self
 
     class Config:
         env_file = ".env"
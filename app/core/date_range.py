@@ -0,0 +1,62 @@
+"""
+Фильтр по датам для списков: полуоткрытый диапазон [date_from 00:00, date_to + 1 день 00:00)
+в часовом поясе settings.TIMEZONE, границы переводятся в UTC.
+
+Колонка сравнивается как есть (без func.date), поэтому работают индексы по created_at.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import DateTime, String, literal
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.types import TypeDecorator
+
+from app.config import settings
+
+
+class UTCBound(TypeDecorator):
+    """
+    Граница диапазона: aware datetime в UTC (naive считается UTC - так их читает SQLite).
+    SQLite хранит server_default CURRENT_TIMESTAMP строкой 'YYYY-MM-DD HH:MM:SS' (UTC),
+    поэтому там граница передаётся строкой того же формата (сравнение строк = сравнение времени).
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value: Optional[datetime], dialect):
+        if value is None:
+            return None
+        value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+        if dialect.name == "sqlite":
+            return value.strftime("%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S")
+        return value
+
+
+def day_bounds(
+        date_from: Optional[date], date_to: Optional[date]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Начало date_from и начало дня после date_to (aware, в UTC)"""
+    tz = ZoneInfo(settings.TIMEZONE)
+    start = datetime.combine(date_from, time.min, tzinfo=tz).astimezone(timezone.utc) if date_from else None
+    end = (
+        datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz).astimezone(timezone.utc)
+        if date_to else None
+    )
+    return start, end
+
+
+def date_range_filter(column, date_from: Optional[date], date_to: Optional[date]) -> List[ColumnElement]:
+    """Условия для query.filter(*...): column >= начало date_from AND column < начало (date_to + 1)"""
+    start, end = day_bounds(date_from, date_to)
+    conditions = []
+    if start is not None:
+        conditions.append(column >= literal(start, UTCBound()))
+    if end is not None:
+        conditions.append(column < literal(end, UTCBound()))
+    return conditions
@@ -0,0 +1,50 @@
+"""
+Простой реестр метрик процесса.
+
+Подсистемы регистрируют коллекторы (функции, возвращающие список Metric),
+/monitoring/metrics отдаёт их в текстовом формате Prometheus.
+"""
+from typing import Callable, Dict, Iterable, List, NamedTuple
+
+
+class Metric(NamedTuple):
+    name: str
+    value: float
+    help: str = ""
+    kind: str = "gauge"  # gauge | counter
+    labels: Dict[str, str] = {}
+
+
+Collector = Callable[[], Iterable[Metric]]
+
+_collectors: List[Collector] = []
+
+
+def register_collector(collector: Collector) -> Collector:
+    """Зарегистрировать коллектор (можно использовать как декоратор)"""
+    _collectors.append(collector)
+    return collector
+
+
+def collect() -> List[Metric]:
+    metrics: List[Metric] = []
+    for collector in _collectors:
+        metrics.extend(collector())
+    return metrics
+
+
+def render_prometheus() -> str:
+    # Сэмплы одной метрики должны идти подряд, группируем по имени
+    families: Dict[str, List[Metric]] = {}
+    for metric in collect():
+        families.setdefault(metric.name, []).append(metric)
+
+    lines: List[str] = []
+    for name, samples in families.items():
+        if samples[0].help:
+            lines.append(f"# HELP {name} {samples[0].help}")
+        lines.append(f"# TYPE {name} {samples[0].kind}")
+        for metric in samples:
+            labels = ",".join(f'{key}="{value}"' for key, value in metric.labels.items())
+            lines.append(f"{name}{{{labels}}} {metric.value}" if labels else f"{name} {metric.value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) пагинация: следующая страница начинается после ключа сортировки последней строки,
+а не через OFFSET, поэтому глубокие страницы стоят столько же, сколько первая.
+
+Курсор непрозрачный для клиента: base64(JSON значений ключа сортировки).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import settings, PageCountMode
+from app.core.date_range import UTCBound
+from app.core.totals import PendingTotal
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или от другого списка"""
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    total: Optional[int]  # None, если total не запрашивали (TotalMode.NONE)
+    next_cursor: Optional[str] = None  # None = это последняя страница
+
+
+# Ключ сортировки: [(колонка, по убыванию)], последним - уникальная колонка (id)
+SortKey = Sequence[Tuple[Any, bool]]
+
+
+def page_count(total: Optional[int], per_page: int) -> Optional[int]:
+    return (total + per_page - 1) // per_page if total is not None else None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError
+        return [datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value for value in payload]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError("Invalid cursor")
+
+
+def _bind(value):
+    # datetime сравниваем в формате хранения (см. UTCBound), иначе на SQLite равные значения не равны
+    return literal(value, UTCBound()) if isinstance(value, datetime) else value
+
+
+def after_condition(sort_key: SortKey, values: Sequence[Any]) -> ColumnElement:
+    """
+    Строки строго после values в порядке sort_key:
+    (a > x) OR (a = x AND b > y) ..., плюс a >= x для диапазона по индексу
+    """
+    branches = []
+    for position, (column, descending) in enumerate(sort_key):
+        value = _bind(values[position])
+        equal_prefix = [
+            prefix_column == _bind(values[i])
+            for i, (prefix_column, _) in enumerate(sort_key[:position])
+        ]
+        branches.append(and_(*equal_prefix, column < value if descending else column > value))
+
+    first_column, first_descending = sort_key[0]
+    first_value = _bind(values[0])
+    first_range = first_column <= first_value if first_descending else first_column >= first_value
+    return and_(first_range, or_(*branches))
+
+
+def keyset_page(
+        query: Query, sort_key: SortKey, *, total: Union[int, PendingTotal, None], skip: int, limit: int,
+        after: Optional[str] = None
+) -> Page:
+    """
+    Страница query по sort_key: после курсора after (тогда skip не используется) или со смещением skip.
+    next_cursor строится по последней строке, если за ней есть ещё строки.
+
+    total=PendingTotal (count_total(..., with_page=True)) считается тем же запросом, что и страница
+    (settings.TOTALS_PAGE_COUNT): скалярный подзапрос (SELECT count(*) ...) или COUNT(*) OVER ().
+    Окно видит только строки после курсора, поэтому с after вместо него отдельный COUNT.
+    """
+    count_column = None
+    if isinstance(total, PendingTotal):
+        if settings.TOTALS_PAGE_COUNT == PageCountMode.SUBQUERY:
+            # как Query.count(): SELECT count(*) FROM (query). with_entities(func.count()) без фильтров
+            # теряет FROM и коррелирует с внешним запросом - (SELECT count(*)) без таблицы всегда 1
+            count_column = select(func.count()).select_from(query.order_by(None).subquery()).scalar_subquery()
+        elif settings.TOTALS_PAGE_COUNT == PageCountMode.WINDOW and not after:
+            count_column = func.count().over()
+        else:
+            total = total.resolve()
+
+    if after:
+        query = query.filter(after_condition(sort_key, decode_cursor(after, len(sort_key))))
+        skip = 0
+    if count_column is not None:
+        query = query.add_columns(count_column.label("total_count"))
+
+    order = [column.desc() if descending else column.asc() for column, descending in sort_key]
+    rows = query.order_by(*order).offset(skip).limit(limit + 1).all()
+
+    if count_column is not None:
+        # пустая страница total не несёт: 0, если это начало списка, иначе resolve сделает COUNT
+        total = total.resolve(rows[0].total_count if rows else (0 if skip == 0 and not after else None))
+        rows = [row[0] for row in rows]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column, _ in sort_key])
+    return Page(rows, total, next_cursor)
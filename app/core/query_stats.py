@@ -0,0 +1,224 @@
+"""
+Статистика SQL на HTTP запрос: число запросов, время в БД, повторы одинаковых запросов (N+1),
+бюджет запросов эндпоинта (@query_budget), неявные lazy-загрузки relationship (LAZY_LOAD_MODE).
+
+Движки подключаются через instrument_engine, сессии - через instrument_session (app/database.py),
+запрос открывается и закрывается middleware в app/main.py.
+Длительность каждого statement также передаётся в лог медленных запросов (app/core/slow_queries.py).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, RelationshipProperty
+
+from app.config import settings, QueryRepeatMode
+from app.core.metrics import Metric, register_collector
+from app.core import slow_queries
+
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+class RepeatedQueryError(RuntimeError):
+    """Один и тот же запрос выполнен больше QUERY_REPEAT_THRESHOLD раз за HTTP запрос"""
+
+
+class QueryBudgetError(RuntimeError):
+    """Эндпоинт выполнил больше SQL запросов, чем его @query_budget"""
+
+
+class LazyLoadError(RuntimeError):
+    """Relationship загружен лениво при обращении к атрибуту, а не options() CRUD-метода"""
+
+
+Endpoint = TypeVar("Endpoint", bound=Callable[..., Any])
+
+
+def query_budget(limit: int) -> Callable[[Endpoint], Endpoint]:
+    """
+    Максимум SQL запросов на вызов эндпоинта (вместе с зависимостями: пользователь, сессия).
+    Превышение обрабатывается по QUERY_BUDGET_MODE.
+    """
+    def decorate(endpoint: Endpoint) -> Endpoint:
+        endpoint.query_budget = limit
+        return endpoint
+
+    return decorate
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: без лишних пробелов, IN (?, ?, ?) -> IN (?)"""
+    return _IN_LIST.sub("(?)", _SPACES.sub(" ", statement).strip())
+
+
+class RequestQueryStats:
+    def __init__(self, route: str, scope: Optional[dict] = None):
+        self.route = route
+        self.scope = scope  # ASGI scope: после роутинга в нём endpoint (для бюджета)
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+        self.budget_exceeded = False
+        self.lazy_loads = 0
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == settings.QUERY_REPEAT_THRESHOLD + 1:
+            self._on_repeat(shape)
+
+        budget = self.budget
+        if budget is not None and self.count == budget + 1:
+            self._on_budget(budget, statement)
+
+    @property
+    def budget(self) -> Optional[int]:
+        endpoint = self.scope.get("endpoint") if self.scope is not None else None
+        return getattr(endpoint, "query_budget", None)
+
+    def _on_repeat(self, shape: str) -> None:
+        message = (
+            f"{self.route}: statement repeated more than {settings.QUERY_REPEAT_THRESHOLD} times "
+            f"(possible N+1): {shape[:300]}"
+        )
+        if settings.QUERY_REPEAT_MODE == QueryRepeatMode.RAISE:
+            raise RepeatedQueryError(message)
+        if settings.QUERY_REPEAT_MODE == QueryRepeatMode.WARN:
+            logger.warning(message)
+
+    def _on_budget(self, budget: int, statement: str) -> None:
+        self.budget_exceeded = True
+        message = f"{self.route}: query budget of {budget} exceeded by: {statement_shape(statement)[:300]}"
+        if settings.QUERY_BUDGET_MODE == QueryRepeatMode.RAISE:
+            raise QueryBudgetError(message)
+        if settings.QUERY_BUDGET_MODE == QueryRepeatMode.WARN:
+            logger.warning(message)
+
+    def on_lazy_load(self, relationship: str) -> None:
+        self.lazy_loads += 1
+        message = f"{self.route}: implicit lazy load of {relationship}, declare it in the CRUD method options()"
+        if settings.LAZY_LOAD_MODE == QueryRepeatMode.RAISE:
+            raise LazyLoadError(message)
+        if settings.LAZY_LOAD_MODE == QueryRepeatMode.WARN:
+            logger.warning(message)
+
+
+class RouteTotals:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.max_queries = 0
+        self.budget_exceeded = 0
+        self.lazy_loads = 0
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+_routes: Dict[str, RouteTotals] = {}
+
+
+def start_request(route: str, scope: Optional[dict] = None) -> RequestQueryStats:
+    stats = RequestQueryStats(route, scope)
+    _current.set(stats)
+    return stats
+
+
+def current_request() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+
+def route_template(scope) -> str:
+    """Путь запроса с параметрами пути вместо значений: /api/v1/orders/5 -> /api/v1/orders/{order_id}"""
+    if scope.get("route") is None:
+        return "<unmatched>"  # 404: не плодим метки из произвольных путей
+    values = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    if not values:
+        return scope["path"]
+    return "/".join(f"{{{values[part]}}}" if part in values else part for part in scope["path"].split("/"))
+
+
+def finish_request(stats: RequestQueryStats, route: Optional[str] = None) -> None:
+    """Закрыть запрос и добавить его в агрегаты по маршруту (route - шаблон пути)"""
+    totals = _routes.setdefault(route or stats.route, RouteTotals())
+    totals.requests += 1
+    totals.queries += stats.count
+    totals.seconds += stats.duration
+    totals.max_queries = max(totals.max_queries, stats.count)
+    totals.budget_exceeded += stats.budget_exceeded
+    totals.lazy_loads += stats.lazy_loads
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    stats = _current.get()
+    slow_queries.observe(conn, statement, parameters, executemany, elapsed, stats.route if stats else None)
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def _do_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    # lazy_loaded_from есть только у ленивой загрузки по обращению к атрибуту (и только у SELECT),
+    # selectinload / joinedload из options() сюда не попадают.
+    # Загрузки самого flush (каскады delete) задаются cascade / passive_deletes модели, а не хендлером
+    if not orm_execute_state.is_select or orm_execute_state.session._flushing:
+        return
+    if orm_execute_state.lazy_loaded_from is None:
+        return
+    stats = _current.get()
+    if stats is None:
+        return  # вне HTTP запроса (скрипты, миграции) ленивая загрузка допустима
+    prop = orm_execute_state.loader_strategy_path.prop
+    if isinstance(prop, RelationshipProperty):
+        stats.on_lazy_load(str(prop))
+    else:
+        stats.on_lazy_load(type(orm_execute_state.lazy_loaded_from.object).__name__)
+
+
+def instrument_session(session_class) -> None:
+    event.listen(session_class, "do_orm_execute", _do_orm_execute)
+
+
+@register_collector
+def _query_metrics() -> List[Metric]:
+    metrics = []
+    for route, totals in _routes.items():
+        labels = {"route": route}
+        metrics += [
+            Metric("http_db_requests_total", totals.requests, "HTTP requests with DB stats", "counter", labels),
+            Metric("http_db_queries_total", totals.queries, "SQL statements issued", "counter", labels),
+            Metric("http_db_seconds_total", round(totals.seconds, 6), "Time spent in the DB", "counter", labels),
+            Metric("http_db_queries_max", totals.max_queries, "Most statements in one request", labels=labels),
+            Metric("http_db_query_budget_exceeded_total", totals.budget_exceeded,
+                   "Requests over the endpoint query budget", "counter", labels),
+            Metric("http_db_lazy_loads_total", totals.lazy_loads,
+                   "Implicit relationship lazy loads", "counter", labels),
+        ]
+    return metrics
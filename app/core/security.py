@@ -18,17 +18,22 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(
         subject: Union[str, Any],  # Здесь ожидается строка, а не dict!
-        expires_delta: Optional[timedelta] = None
+        expires_delta: Optional[timedelta] = None,
+        claims: Optional[dict] = None  # principal_claims пользователя (TOKEN_CLAIMS)
 ) -> str:
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(
+        expire = now + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
     # subject уже должен быть строкой (username)
     to_encode = {"exp": expire, "sub": str(subject)}
+    if claims:
+        # iat - для списка отзыва claims (app/crud/principal_cache.py)
+        to_encode.update(claims, iat=now)
     encoded_jwt = jwt.encode(
         to_encode,
         settings.SECRET_KEY,
@@ -37,6 +42,14 @@ def create_access_token(
     return encoded_jwt
 
 
+def principal_claims(user_obj: Any) -> dict:
+    """Claims пользователя в токене: get_current_user собирает пользователя из них без запроса к БД"""
+    return {
+        "user_id": user_obj.id,
+        "role": "admin" if user_obj.is_superuser else "employee",
+        "warehouse_id": user_obj.warehouse_id,
+    }
+
 
 def decode_token(token: str) -> Optional[dict]:
     try:
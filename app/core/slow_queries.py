@@ -0,0 +1,184 @@
+"""
+Лог медленных запросов: statement дольше SLOW_QUERY_MS попадает в кольцевой буфер
+вместе с параметрами, маршрутом и планом (EXPLAIN / EXPLAIN QUERY PLAN, SLOW_QUERY_EXPLAIN).
+
+План снимает фоновый поток на отдельном соединении из пула, вне транзакции запроса:
+запрос, который и так медленный, его не ждёт. До готовности plan у записи None.
+
+Время запроса меряет app/core/query_stats.py, он же вызывает observe().
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.core.metrics import Metric, register_collector
+
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+_MAX_PARAMS_LENGTH = 500
+_EXPLAIN_QUEUE_SIZE = 100
+
+
+class SlowQuery:
+    def __init__(self, statement: str, parameters: str, route: Optional[str],
+                 duration: float, plan: Optional[List[str]]):
+        self.statement = statement
+        self.parameters = parameters
+        self.route = route
+        self.duration = duration
+        self.plan = plan
+        self.recorded_at = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "duration_ms": round(self.duration * 1000, 2),
+            "route": self.route,
+            "statement": self.statement,
+            "parameters": self.parameters,
+            "plan": self.plan,
+            "recorded_at": self.recorded_at,
+        }
+
+
+_buffer: Deque[SlowQuery] = deque(maxlen=max(settings.SLOW_QUERY_BUFFER_SIZE, 1))
+_slow_total = 0
+_sampled_total = 0
+_explain_skipped_total = 0
+
+_explain_queue: "queue.Queue" = queue.Queue(maxsize=_EXPLAIN_QUEUE_SIZE)
+_explain_thread: Optional[threading.Thread] = None
+_explain_thread_lock = threading.Lock()
+
+
+def _explain_engine(conn) -> Engine:
+    """
+    Движок для EXPLAIN. Соединения async движка (aiosqlite / asyncpg) работают только в event loop,
+    поэтому для них берётся синхронный движок к той же базе
+    """
+    from app import database
+
+    if database.async_engine is not None and conn.engine is database.async_engine.sync_engine:
+        return database.engine
+    if database.async_read_engine is not None and conn.engine is database.async_read_engine.sync_engine:
+        return database.read_engine
+    return conn.engine
+
+
+def _explain(engine: Engine, statement: str, parameters) -> List[str]:
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    # Сырое DBAPI соединение из пула: события движка не срабатывают, повторного замера нет.
+    # Своя транзакция: ошибка EXPLAIN не трогает транзакцию запроса, при возврате в пул - rollback
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [str(row[-1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def _explain_worker() -> None:
+    while True:
+        entry, engine, statement, parameters = _explain_queue.get()
+        try:
+            entry.plan = _explain(engine, statement, parameters)
+        except Exception as e:
+            entry.plan = [f"EXPLAIN failed: {type(e).__name__}: {e}"]
+
+
+def _submit_explain(conn, entry: SlowQuery, statement: str, parameters) -> None:
+    global _explain_thread, _explain_skipped_total
+
+    engine = _explain_engine(conn)
+    if engine.dialect.paramstyle != conn.dialect.paramstyle:
+        # asyncpg ($1) против psycopg2 (%(name)s): параметры statement синхронному драйверу не подходят
+        entry.plan = [f"EXPLAIN skipped: paramstyle {conn.dialect.paramstyle} != {engine.dialect.paramstyle}"]
+        return
+    with _explain_thread_lock:
+        if _explain_thread is None:
+            _explain_thread = threading.Thread(target=_explain_worker, name="slow-query-explain", daemon=True)
+            _explain_thread.start()
+    try:
+        _explain_queue.put_nowait((entry, engine, statement, parameters))
+    except queue.Full:
+        _explain_skipped_total += 1
+        entry.plan = ["EXPLAIN skipped: queue is full"]
+
+
+def observe(conn, statement: str, parameters, executemany: bool,
+            duration: float, route: Optional[str]) -> None:
+    """Вызывается после каждого statement с его длительностью"""
+    global _slow_total, _sampled_total
+
+    if settings.SLOW_QUERY_MS <= 0 or duration * 1000 < settings.SLOW_QUERY_MS:
+        return
+    _slow_total += 1
+    if random.random() >= settings.SLOW_QUERY_SAMPLE_RATE:
+        return
+    _sampled_total += 1
+
+    entry = SlowQuery(statement, repr(parameters)[:_MAX_PARAMS_LENGTH], route, duration, None)
+    _buffer.append(entry)
+    if settings.SLOW_QUERY_EXPLAIN and not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+        _submit_explain(conn, entry, statement, parameters)
+    logger.warning("slow query %.1f ms [%s]: %s params=%s",
+                   duration * 1000, route, " ".join(statement.split()), entry.parameters)
+
+
+def worst(limit: int = 20) -> List[Dict[str, Any]]:
+    """Самые медленные запросы из буфера"""
+    return [entry.as_dict() for entry in sorted(_buffer, key=lambda e: e.duration, reverse=True)[:limit]]
+
+
+def worst_by_shape(limit: int = 20) -> List[Dict[str, Any]]:
+    """Буфер, сгруппированный по форме запроса: сколько раз, суммарно и максимум, худший пример"""
+    from app.core.query_stats import statement_shape
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for entry in _buffer:
+        shape = statement_shape(entry.statement)
+        group = groups.setdefault(shape, {"count": 0, "total_ms": 0.0, "worst": entry})
+        group["count"] += 1
+        group["total_ms"] += entry.duration * 1000
+        if entry.duration > group["worst"].duration:
+            group["worst"] = entry
+
+    result = [
+        {
+            "statement": shape,
+            "count": group["count"],
+            "total_ms": round(group["total_ms"], 2),
+            "max_ms": round(group["worst"].duration * 1000, 2),
+            "worst": group["worst"].as_dict(),
+        }
+        for shape, group in groups.items()
+    ]
+    result.sort(key=lambda item: item["total_ms"], reverse=True)
+    return result[:limit]
+
+
+def clear() -> None:
+    _buffer.clear()
+
+
+@register_collector
+def _slow_query_metrics() -> List[Metric]:
+    return [
+        Metric("db_slow_queries_total", _slow_total, "Statements slower than SLOW_QUERY_MS", "counter"),
+        Metric("db_slow_queries_sampled_total", _sampled_total, "Slow statements logged", "counter"),
+        Metric("db_slow_queries_explain_skipped_total", _explain_skipped_total,
+               "Slow statements not explained because the EXPLAIN queue was full", "counter"),
+        Metric("db_slow_queries_buffered", len(_buffer), "Slow statements in the ring buffer"),
+    ]
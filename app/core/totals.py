@@ -0,0 +1,209 @@
+"""
+Общее число строк (total) для списков с пагинацией.
+
+Режимы (TotalMode):
+    exact  - COUNT(*) по фильтрам, результат кэшируется на TOTALS_CACHE_TTL секунд;
+    approx - оценка планировщика по статистике таблиц (PostgreSQL: EXPLAIN, SQLite: sqlite_stat1
+             для списка без фильтров), если оценки нет - как exact;
+    none   - не считать, total = None.
+
+Ключ кэша - SQL count-запроса с параметрами, поэтому одинаковые фильтры попадают в одну запись.
+Любой INSERT / UPDATE / DELETE в таблицу из запроса сбрасывает записи (instrument_engine
+в app/database.py). Кэш свой у каждого процесса: запись в другом воркере видна не позже чем через TTL.
+
+При промахе кэша списки с keyset_page считают total тем же запросом, что и страницу (PendingTotal).
+"""
+import json
+import re
+import threading
+import time
+from enum import Enum
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import Table, event, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.sql.util import find_tables
+
+from app.config import settings, PageCountMode
+from app.core.metrics import Metric, register_collector
+
+
+class TotalMode(str, Enum):
+    EXACT = "exact"
+    APPROX = "approx"
+    NONE = "none"
+
+
+_WRITE = re.compile(
+    r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+(?:"?\w+"?\.)?"?(\w+)',
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+# таблица -> версия, растёт на каждой записи в таблицу
+_generations: Dict[str, int] = {}
+# ключ запроса -> (истекает, версии таблиц запроса, total)
+_cache: Dict[Tuple[str, str, str], Tuple[float, Tuple[int, ...], int]] = {}
+_hits = 0
+_misses = 0
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) <select> с обычной обработкой параметров"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class PendingTotal(NamedTuple):
+    """
+    Точный total, которого нет в кэше: его посчитает запрос страницы (см. keyset_page),
+    resolve кладёт результат в кэш.
+    """
+    query: Query
+    key: Optional[Tuple[str, str, str]]
+    generations: Tuple[int, ...]
+
+    def resolve(self, total: Optional[int] = None) -> int:
+        """total из запроса страницы или, если его там нет (страница пустая), отдельный COUNT"""
+        if total is None:
+            total = self.query.count()
+        if self.key is not None:
+            _store(self.key, self.generations, total)
+        return total
+
+
+def count_total(
+        db: Session, query: Query, mode: TotalMode = TotalMode.EXACT, with_page: bool = False
+) -> Union[int, PendingTotal, None]:
+    """
+    total для query (без ORDER BY / LIMIT) в заданном режиме.
+    with_page: точный total не из кэша вернуть как PendingTotal, чтобы посчитать его вместе со страницей
+    """
+    if mode == TotalMode.NONE:
+        return None
+    if mode == TotalMode.APPROX:
+        estimate = _estimate(db, query)
+        if estimate is not None:
+            return estimate
+
+    total, pending = _lookup(db, query)
+    if total is not None:
+        return total
+    if with_page and settings.TOTALS_PAGE_COUNT != PageCountMode.SEPARATE:
+        return pending
+    return pending.resolve()
+
+
+def _estimate(db: Session, query: Query) -> Optional[int]:
+    statement = query.order_by(None).statement
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        plan = db.execute(_Explain(statement)).scalar()
+        if isinstance(plan, str):  # asyncpg отдаёт json строкой
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    if dialect == "sqlite":
+        # У SQLite нет оценки для произвольного WHERE, только размер таблицы после ANALYZE
+        froms = statement.get_final_froms()
+        if statement.whereclause is not None or len(froms) != 1 or not isinstance(froms[0], Table):
+            return None
+        try:
+            stat = db.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"), {"table": froms[0].name}
+            ).scalar()
+        except exc.OperationalError:  # ANALYZE ещё не запускался
+            return None
+        return int(stat.split()[0]) if stat else None
+
+    return None
+
+
+def _lookup(db: Session, query: Query) -> Tuple[Optional[int], PendingTotal]:
+    global _hits, _misses
+
+    if settings.TOTALS_CACHE_TTL <= 0:
+        return None, PendingTotal(query, None, ())
+
+    bind = db.get_bind()
+    statement = query.order_by(None).statement
+    compiled = statement.compile(dialect=bind.dialect)
+    key = (str(bind.url), compiled.string, repr(sorted(compiled.params.items())))
+    tables = sorted({table.name for table in find_tables(statement, include_joins=True)})
+
+    now = time.monotonic()
+    with _lock:
+        generations = tuple(_generations.get(table, 0) for table in tables)
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now and entry[1] == generations:
+            _hits += 1
+            return entry[2], PendingTotal(query, None, ())
+        _misses += 1
+    # версии сняты до COUNT: запись во время подсчёта сделает эту запись кэша устаревшей
+    return None, PendingTotal(query, key, generations)
+
+
+def _store(key: Tuple[str, str, str], generations: Tuple[int, ...], total: int) -> None:
+    now = time.monotonic()
+    with _lock:
+        if len(_cache) >= settings.TOTALS_CACHE_SIZE:
+            for stale in [k for k, (expires, _, _) in _cache.items() if expires <= now]:
+                del _cache[stale]
+            if len(_cache) >= settings.TOTALS_CACHE_SIZE:
+                _cache.clear()
+        _cache[key] = (now + settings.TOTALS_CACHE_TTL, generations, total)
+
+
+def invalidate(table: str) -> None:
+    with _lock:
+        _generations[table] = _generations.get(table, 0) + 1
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    match = _WRITE.match(statement)
+    if match is None:
+        return
+    table = match.group(1).lower()
+    conn.info.setdefault("written_tables", set()).add(table)
+    invalidate(table)
+
+
+def _after_commit(conn) -> None:
+    # total, посчитанный другим соединением до commit, тоже устарел
+    for table in conn.info.pop("written_tables", ()):
+        invalidate(table)
+
+
+def _after_rollback(conn) -> None:
+    conn.info.pop("written_tables", None)
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "commit", _after_commit)
+    event.listen(sync_engine, "rollback", _after_rollback)
+
+
+@register_collector
+def _totals_metrics() -> List[Metric]:
+    return [
+        Metric("totals_cache_hits_total", _hits, "List totals served from cache", "counter"),
+        Metric("totals_cache_misses_total", _misses, "List totals counted in the DB", "counter"),
+        Metric("totals_cache_entries", len(_cache), "Cached list totals"),
+    ]
@@ -0,0 +1,103 @@
+"""
+Поиск подстроки по FTS5 индексу с токенайзером trigram (SQLite, миграция 0006_order_search).
+
+Фраза "2024-0424242" в MATCH читает списки документов всех своих триграмм, а частые
+("202", "д. ") встречаются почти в каждой строке - на 10M заказов это сотни мс. Поэтому
+в MATCH идут только самые редкие триграммы строки (AND), а точное совпадение подстроки
+проверяет ilike по найденным строкам.
+
+Частота триграммы - оценка по первым TRIGRAM_SAMPLE_SIZE документам (списки в FTS5 идут
+по возрастанию rowid), кэшируется на TRIGRAM_COUNT_TTL секунд (у каждого процесса свой кэш).
+Точность не нужна: неточная или устаревшая частота меняет только скорость, не результат.
+"""
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import Metric, register_collector
+
+
+_lock = threading.Lock()
+# (FTS таблица, триграмма) -> (истекает, оценка числа документов)
+_counts: Dict[Tuple[str, str], Tuple[float, int]] = {}
+_hits = 0
+_misses = 0
+
+# записей кэша на процесс, при переполнении кэш очищается
+_CACHE_SIZE = 100000
+
+
+def trigrams(value: str) -> List[str]:
+    """Триграммы строки без учёта регистра (как у токенайзера trigram), без повторов"""
+    value = value.lower()
+    return sorted({value[i:i + 3] for i in range(len(value) - 2)})
+
+
+def phrase(value: str) -> str:
+    """Строка в кавычках для MATCH"""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def rare_trigrams(db: Session, table: str, content_table: str, value: str, count: int = 3) -> List[str]:
+    """
+    count самых редких триграмм value в FTS таблице table (для MATCH "a" AND "b"),
+    content_table - таблица с содержимым (rowid индекса = её rowid).
+    Пустой список - строка короче 3 символов, индексом её не найти.
+    """
+    global _hits, _misses
+
+    grams = trigrams(value)
+    if not grams:
+        return []
+    now = time.monotonic()
+    with _lock:
+        cached = {gram: _counts[(table, gram)] for gram in grams if (table, gram) in _counts}
+        frequencies = {gram: entry[1] for gram, entry in cached.items() if entry[0] > now}
+        _hits += len(frequencies)
+        _misses += len(grams) - len(frequencies)
+    missing = [gram for gram in grams if gram not in frequencies]
+
+    if missing:
+        # одним запросом: первые TRIGRAM_SAMPLE_SIZE документов каждой триграммы (по возрастанию rowid)
+        # и rowid последнего из них. Не дочитали список - частота ~ выборка * max(rowid) / последний rowid
+        statement = " UNION ALL ".join(
+            f"SELECT :gram_{i}, count(*), max(rowid), (SELECT max(rowid) FROM {content_table}) "
+            f"FROM (SELECT rowid FROM {table} WHERE {table} MATCH :match_{i} LIMIT :sample)"
+            for i in range(len(missing))
+        )
+        params = {"sample": settings.TRIGRAM_SAMPLE_SIZE}
+        for i, gram in enumerate(missing):
+            params[f"gram_{i}"] = gram
+            params[f"match_{i}"] = phrase(gram)
+        rows = db.execute(text(statement), params).all()
+
+        expires = time.monotonic() + settings.TRIGRAM_COUNT_TTL
+        with _lock:
+            if len(_counts) + len(rows) > _CACHE_SIZE:
+                _counts.clear()
+            for gram, sampled, last_rowid, max_rowid in rows:
+                frequency = sampled
+                if sampled >= settings.TRIGRAM_SAMPLE_SIZE and last_rowid:
+                    frequency = sampled * max(max_rowid or 0, last_rowid) // last_rowid
+                frequencies[gram] = frequency
+                if settings.TRIGRAM_COUNT_TTL > 0:
+                    _counts[(table, gram)] = (expires, frequency)
+
+    return sorted(grams, key=lambda gram: (frequencies[gram], gram))[:count]
+
+
+def clear() -> None:
+    with _lock:
+        _counts.clear()
+
+
+@register_collector
+def _trigram_metrics() -> List[Metric]:
+    return [
+        Metric("trigram_count_cache_hits_total", _hits, "Trigram frequencies served from cache", "counter"),
+        Metric("trigram_count_cache_misses_total", _misses, "Trigram frequencies counted in the DB", "counter"),
+    ]
@@ -1,13 +1,17 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import Base
+from app.database import Base, retry_on_locked
 
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+CRUDType = TypeVar("CRUDType")
 
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
@@ -20,34 +24,118 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[ModelType]:
         return db.query(self.model).offset(skip).limit(limit).all()
 
+    def count(self, db: Session) -> int:
+        return db.query(self.model).count()
+
+    @retry_on_locked
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
+    @retry_on_locked
     def update(self, db: Session, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        print(obj_data)
-
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        for field, value in self._update_values(obj_in).items():
+            setattr(db_obj, field, value)
 
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
+    @retry_on_locked
     def remove(self, db: Session, *, row_id: int) -> ModelType:
         obj = db.query(self.model).get(row_id)
         db.delete(obj)
         db.commit()
         return obj
+
+    # - - - BATCH - - - #
+
+    def get_many(self, db: Session, ids: Sequence[Any], *, populate_existing: bool = False) -> List[ModelType]:
+        """Строки по списку id одним SELECT ... WHERE id IN (...), по возрастанию id; отсутствующие id пропускаются"""
+        if not ids:
+            return []
+        query = db.query(self.model).filter(self.model.id.in_(set(ids))).order_by(self.model.id)
+        if populate_existing:
+            query = query.populate_existing()
+        return query.all()
+
+    @retry_on_locked
+    def create_many(self, db: Session, *, objs_in: Sequence[CreateSchemaType]) -> List[ModelType]:
+        """
+        Один INSERT ... VALUES (...), (...) RETURNING (insertmanyvalues), объекты по возрастанию id.
+        sort_by_parameter_order не используем: на SQLite он разбивает вставку на INSERT на каждую строку
+        """
+        if not objs_in:
+            return []
+        db_objs = db.scalars(insert(self.model).returning(self.model), [obj_in.model_dump() for obj_in in objs_in]).all()
+        db.commit()
+        return sorted(db_objs, key=lambda db_obj: db_obj.id)
+
+    @retry_on_locked
+    def update_many(
+            self, db: Session, *, objs_in: Dict[Any, Union[UpdateSchemaType, Dict[str, Any]]]
+    ) -> List[ModelType]:
+        """
+        Частичное обновление по id (objs_in: id -> поля). UPDATE ... WHERE id = ? через executemany:
+        строки с одинаковым набором полей уходят одним statement. Возвращает строки после обновления
+        """
+        rows = []
+        for id, obj_in in objs_in.items():
+            values = self._update_values(obj_in)
+            if values:
+                rows.append({"id": id, **values})
+
+        if rows:
+            rows.sort(key=lambda row: sorted(row))  # одинаковые наборы полей подряд -> один executemany
+            db.execute(update(self.model), rows)
+            db.commit()
+        # bulk UPDATE не трогает объекты в сессии: перечитываем
+        return self.get_many(db, list(objs_in), populate_existing=True)
+
+    @retry_on_locked
+    def remove_many(self, db: Session, *, ids: Sequence[Any]) -> int:
+        """
+        DELETE ... WHERE id IN (...) одним statement, возвращает число удалённых строк.
+        ORM-каскады не выполняются: зависимые строки должна удалять БД (ON DELETE CASCADE) или вызывающий код
+        """
+        if not ids:
+            return 0
+        result = db.execute(delete(self.model).where(self.model.id.in_(set(ids))))
+        db.commit()
+        return result.rowcount
+
+    # - - - /END BATCH - - - #
+
+    def _update_values(self, obj_in: Union[UpdateSchemaType, Dict[str, Any]]) -> Dict[str, Any]:
+        """Переданные поля obj_in, которые есть в таблице модели (password и т.п. пропускаются)"""
+        update_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+        columns = self.model.__table__.columns
+        return {field: value for field, value in update_data.items() if field in columns}
+
+
+class AsyncCRUD(Generic[CRUDType]):
+    """
+    Асинхронная версия CRUD-класса: те же методы, но через await.
+    AsyncSession -> метод выполняется в run_sync (greenlet, event loop не блокируется),
+    Session -> метод уходит в threadpool.
+    Возвращаемые объекты должны быть загружены полностью: lazy load вне run_sync
+    на AsyncSession невозможен.
+    """
+    def __init__(self, crud: CRUDType):
+        self.crud = crud
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.crud, name)
+        if not callable(method):
+            return method
+
+        async def call(db: Union[Session, AsyncSession], *args: Any, **kwargs: Any) -> Any:
+            if isinstance(db, AsyncSession):
+                return await db.run_sync(lambda session: method(session, *args, **kwargs))
+            return await run_in_threadpool(method, db, *args, **kwargs)
+
+        call.__name__ = name
+        return call
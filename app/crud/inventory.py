@@ -1,7 +1,11 @@
 from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, func
-from app.crud.base import CRUDBase
+from app.core.pagination import Page, keyset_page
+from app.core.totals import TotalMode, count_total
+from app.crud.base import CRUDBase, AsyncCRUD
+from app.crud.product import product
+from app.database import retry_on_locked
 from app.models.inventory import Inventory
 from app.models.product import Product
 from app.schemas.inventory import InventoryCreate, InventoryUpdate, InventoryAdjustment, InventoryFilterParams
@@ -21,10 +25,11 @@ class CRUDInventory(CRUDBase[Inventory, InventoryCreate, InventoryUpdate]):
     def get_with_product(
             self, db: Session, *, id: int
     ) -> Optional[Inventory]:
-        """Получить запись инвентаря с данными о товаре"""
-        return db.query(Inventory).options(
-            joinedload(Inventory.product)
-        ).filter(Inventory.id == id).first()
+        """Получить запись инвентаря с данными о товаре (товар - из кэша каталога)"""
+        db_obj = db.query(Inventory).filter(Inventory.id == id).first()
+        if db_obj is not None:
+            product.fill_products(db, [db_obj])
+        return db_obj
 
     def get_multi_by_warehouse(
             self,
@@ -33,15 +38,15 @@ class CRUDInventory(CRUDBase[Inventory, InventoryCreate, InventoryUpdate]):
             warehouse_id: int,
             skip: int = 0,
             limit: int = 100,
-            filters: Optional[InventoryFilterParams] = None
-    ) -> Tuple[List[Inventory], int]:
+            filters: Optional[InventoryFilterParams] = None,
+            after: Optional[str] = None,  # курсор (next_cursor предыдущей страницы) вместо skip
+            total_mode: TotalMode = TotalMode.EXACT
+    ) -> Page:
         """
-        Получить инвентарь склада с пагинацией и фильтрацией
-        Возвращает (список, общее_количество)
+        Получить инвентарь склада с пагинацией и фильтрацией (по product_id)
+        Возвращает Page(список, общее_количество, курсор следующей страницы), товары - из кэша каталога
         """
-        query = db.query(Inventory).options(
-            joinedload(Inventory.product)
-        ).filter(Inventory.warehouse_id == warehouse_id)
+        query = db.query(Inventory).filter(Inventory.warehouse_id == warehouse_id)
 
         if filters:
             if filters.search:
@@ -66,14 +71,16 @@ class CRUDInventory(CRUDBase[Inventory, InventoryCreate, InventoryUpdate]):
                     )
                 )
 
-        total = query.count()
+        total = count_total(db, query, total_mode, with_page=True)
 
-        items = query.order_by(
-            Inventory.product_id
-        ).offset(skip).limit(limit).all()
-
-        return items, total
+        page = keyset_page(
+            query, [(Inventory.product_id, False), (Inventory.id, False)],
+            total=total, skip=skip, limit=limit, after=after
+        )
+        product.fill_products(db, page.items)
+        return page
 
+    @retry_on_locked
     def adjust_quantity(
             self,
             db: Session,
@@ -114,7 +121,6 @@ class CRUDInventory(CRUDBase[Inventory, InventoryCreate, InventoryUpdate]):
             inventory.updated_at = func.now()
 
         db.commit()
-        db.refresh(inventory)
         return inventory
 
     def add_from_supply(
@@ -153,3 +159,5 @@ class CRUDInventory(CRUDBase[Inventory, InventoryCreate, InventoryUpdate]):
 
 
 inventory = CRUDInventory(Inventory)
+
+inventory_async = AsyncCRUD(inventory)
@@ -1,9 +1,18 @@
-from typing import Optional, List, Tuple
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func
+from typing import Any, Dict, Optional, List, Tuple, Union
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
+from sqlalchemy import and_, or_, false, func, column, literal_column, select, table
 from datetime import datetime, date
 
-from app.crud.base import CRUDBase
+from app.config import settings
+from app.core import trigram
+from app.core.date_range import date_range_filter
+from app.core.pagination import Page, keyset_page
+from app.core.totals import TotalMode, count_total
+from app.crud.base import CRUDBase, AsyncCRUD
+from app.crud.number_sequence import number_allocator
+from app.crud.order_status_registry import order_status_registry
+from app.crud.product import product
+from app.database import retry_on_locked
 
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.inventory import Inventory
@@ -11,7 +20,12 @@ from app.models.inventory import Inventory
 from app.schemas.order import OrderCreate, OrderUpdate, OrderItemCreate, OrderItemUpdate, OrderFilterParams, OrderStatusCreate, OrderStatusUpdate
 
 
+# FTS5 trigram таблица SQLite (миграция 0006), rowid = orders.id
+_orders_search = table("orders_search", column("rowid"))
+
+
 class CRUDOrderStatus(CRUDBase[OrderStatus, OrderStatusCreate, OrderStatusUpdate]):
+    """Запись статусов сбрасывает order_status_registry этого процесса"""
 
     def get_by_code(self, db: Session, *, code: str) -> Optional[OrderStatus]:
         return db.query(OrderStatus).filter(OrderStatus.code == code).first()
@@ -20,27 +34,38 @@ class CRUDOrderStatus(CRUDBase[OrderStatus, OrderStatusCreate, OrderStatusUpdate
         """Получить статус 'new' (обычно id=1)"""
         return db.query(OrderStatus).filter(OrderStatus.code == "new").first()
 
+    def create(self, db: Session, *, obj_in: OrderStatusCreate) -> OrderStatus:
+        db_obj = super().create(db, obj_in=obj_in)
+        order_status_registry.invalidate()
+        return db_obj
+
+    def update(self, db: Session, *, db_obj: OrderStatus, obj_in: Union[OrderStatusUpdate, Dict[str, Any]]) -> OrderStatus:
+        db_obj = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        order_status_registry.invalidate()
+        return db_obj
+
+    def remove(self, db: Session, *, row_id: int) -> OrderStatus:
+        db_obj = super().remove(db, row_id=row_id)
+        order_status_registry.invalidate()
+        return db_obj
+
 
 class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
 
     def generate_order_number(self, db: Session) -> str:
         """Генерирует уникальный номер заказа: ORD-YYYY-XXXXX"""
-        year = datetime.now().year
-
-        count = db.query(func.count(Order.id)).filter(
-            func.extract('year', Order.created_at) == year
-        ).scalar()
-
-        next_num = count + 1
-        return f"ORD-{year}-{next_num:05d}"
+        return number_allocator.next_number(db, "ORD")
 
     def get_with_items(self, db: Session, *, id: int) -> Optional[Order]:
-        """Получить заказ с позициями, товарами и статусом"""
-        return db.query(Order).options(
-            joinedload(Order.items).joinedload(OrderItem.product),
+        """Получить заказ с позициями, товарами (из кэша каталога) и статусом"""
+        db_obj = db.query(Order).options(
+            joinedload(Order.items),
             joinedload(Order.status),
             joinedload(Order.warehouse)
         ).filter(Order.id == id).first()
+        if db_obj is not None:
+            product.fill_products(db, db_obj.items)
+        return db_obj
 
     def get_by_external_id(self, db: Session, *, external_order_id: str) -> Optional[Order]:
         """Получить заказ по ID внешней системы"""
@@ -49,6 +74,7 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
             joinedload(Order.status)
         ).filter(Order.external_order_id == external_order_id).first()
 
+    @retry_on_locked
     def create_from_external(
             self,
             db: Session,
@@ -65,7 +91,9 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
 
         order_number = self.generate_order_number(db)
 
-        new_status = db.query(OrderStatus).filter(OrderStatus.code == "new").first()
+        new_status_id = order_status_registry.id_by_code(db, "new")
+        if new_status_id is None:
+            raise ValueError("Status 'new' not found")
 
         subtotal = obj_in.subtotal or sum(item.quantity * item.price for item in obj_in.items)
         total = obj_in.total_amount or (subtotal + obj_in.shipping_cost)
@@ -74,7 +102,7 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
             order_number=order_number,
             external_order_id=obj_in.external_order_id,
             warehouse_id=obj_in.warehouse_id,
-            status_id=new_status.id,
+            status_id=new_status_id,
             customer_name=obj_in.customer_name,
             customer_email=obj_in.customer_email,
             customer_phone=obj_in.customer_phone,
@@ -99,9 +127,9 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
             db.add(db_item)
 
         db.commit()
-        db.refresh(db_order)
-        return db_order
+        return self.get_with_items(db, id=db_order.id)
 
+    @retry_on_locked
     def update_status(
             self,
             db: Session,
@@ -110,11 +138,11 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
             status_code: str
     ) -> Order:
         """Обновить статус заказа"""
-        status = db.query(OrderStatus).filter(OrderStatus.code == status_code).first()
-        if not status:
+        status_id = order_status_registry.id_by_code(db, status_code)
+        if status_id is None:
             raise ValueError(f"Status '{status_code}' not found")
 
-        db_obj.status_id = status.id
+        db_obj.status_id = status_id
         db_obj.updated_at = func.now()
 
         # Если статус "shipped" - записываем дату отгрузки
@@ -128,8 +156,7 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
 
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return self.get_with_items(db, id=db_obj.id)
 
     def sync_from_external(
             self,
@@ -152,6 +179,7 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
 
         return self.update_status(db, db_obj=order, status_code=status_code)
 
+    @retry_on_locked
     def delete_from_external(
             self,
             db: Session,
@@ -171,6 +199,27 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
         db.commit()
         return True
 
+    def _search(self, db: Session, query: Query, search: str) -> Query:
+        """
+        Поиск по подстроке в order_number, external_order_id, address (миграция 0006_order_search).
+        SQLite: кандидаты - по редким триграммам из FTS5 orders_search (app/core/trigram.py),
+        подстроку проверяет ilike. PostgreSQL: ilike по GIN индексам pg_trgm.
+        Строка короче 3 символов и ORDER_SEARCH_FTS=false (база без 0006) - ilike по всей таблице.
+        """
+        if settings.ORDER_SEARCH_FTS and db.get_bind().dialect.name == "sqlite":
+            grams = trigram.rare_trigrams(db, "orders_search", "orders", search)
+            if grams:
+                match = " AND ".join(trigram.phrase(gram) for gram in grams)
+                query = query.filter(Order.id.in_(
+                    select(_orders_search.c.rowid).where(literal_column("orders_search").op("MATCH")(match))
+                ))
+
+        return query.filter(or_(
+            Order.external_order_id.ilike(f"%{search}%"),
+            Order.address.ilike(f"%{search}%"),
+            Order.order_number.ilike(f"%{search}%")
+        ))
+
     def get_multi_filtered(
             self,
             db: Session,
@@ -179,10 +228,12 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
             limit: int = 100,
             filters: Optional[OrderFilterParams] = None,
             warehouse_id: Optional[int] = None,  # для фильтрации по складу
-            is_superuser: bool = False  # админ видит всё
-    ) -> Tuple[List[Order], int]:
+            is_superuser: bool = False,  # админ видит всё
+            after: Optional[str] = None,  # курсор (next_cursor предыдущей страницы) вместо skip
+            total_mode: TotalMode = TotalMode.EXACT
+    ) -> Page:
         """
-        Получить заказы с пагинацией и фильтрацией
+        Получить заказы с пагинацией и фильтрацией (новые сначала)
         """
         query = db.query(Order).options(
             joinedload(Order.status),
@@ -196,27 +247,18 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
         # Применяем фильтры
         if filters:
             if filters.search:
-                search_filter = or_(
-                    Order.external_order_id.ilike(f"%{filters.search}%"),
-                    Order.customer_name.ilike(f"%{filters.search}%"),
-                    Order.shipping_address.ilike(f"%{filters.search}%"),
-                    Order.order_number.ilike(f"%{filters.search}%")
-                )
-                query = query.filter(search_filter)
+                query = self._search(db, query, filters.search)
 
             if filters.status_code:
-                query = query.join(OrderStatus).filter(
-                    OrderStatus.code == filters.status_code
-                )
+                # id статуса из order_status_registry, без JOIN order_statuses; неизвестный код - пустой список
+                status_id = order_status_registry.id_by_code(db, filters.status_code)
+                query = query.filter(Order.status_id == status_id if status_id is not None else false())
 
             if filters.warehouse_id and is_superuser:  # админ может фильтровать по любому складу
                 query = query.filter(Order.warehouse_id == filters.warehouse_id)
 
-            if filters.date_from:
-                query = query.filter(func.date(Order.created_at) >= filters.date_from)
-
-            if filters.date_to:
-                query = query.filter(func.date(Order.created_at) <= filters.date_to)
+            if filters.date_from or filters.date_to:
+                query = query.filter(*date_range_filter(Order.created_at, filters.date_from, filters.date_to))
 
             if filters.is_shipped is not None:
                 if filters.is_shipped:
@@ -224,21 +266,22 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
                 else:
                     query = query.filter(Order.shipped_at.is_(None))
 
-        total = query.count()
-        orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-
-        # Загружаем позиции отдельно для избежания N+1
-        for order in orders:
-            items = db.query(OrderItem).options(
-                joinedload(OrderItem.product)
-            ).filter(OrderItem.order_id == order.id).all()
-            order.items = items
+        total = count_total(db, query, total_mode, with_page=True)
 
-        return orders, total
+        # Позиции всей страницы одним SELECT ... WHERE order_id IN (...), а не запросом на заказ,
+        # товары позиций - из кэша каталога
+        query = query.options(selectinload(Order.items))
+        page = keyset_page(
+            query, [(Order.created_at, True), (Order.id, True)],
+            total=total, skip=skip, limit=limit, after=after
+        )
+        product.fill_products(db, [item for order_obj in page.items for item in order_obj.items])
+        return page
 
 
 class CRUDOrderItem(CRUDBase[OrderItem, OrderItemCreate, OrderItemUpdate]):
 
+    @retry_on_locked
     def create_with_order(
             self, db: Session, *, order_id: int, obj_in: OrderItemCreate
     ) -> OrderItem:
@@ -251,10 +294,11 @@ class CRUDOrderItem(CRUDBase[OrderItem, OrderItemCreate, OrderItemUpdate]):
         )
         db.add(db_item)
         db.commit()
-        db.refresh(db_item)
         return db_item
 
 
 order_status = CRUDOrderStatus(OrderStatus)
 order = CRUDOrder(Order)
 order_item = CRUDOrderItem(OrderItem)
+
+order_async = AsyncCRUD(order)
@@ -0,0 +1,56 @@
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.order import OrderStatus
+
+
+class OrderStatusRegistry:
+    """
+    Статусы заказов в памяти процесса: code -> id и id -> code (несколько строк, меняются редко).
+
+    Загружается при старте (load) и перечитывается запросом в сессии вызывающего кода:
+    после записи статусов через CRUDOrderStatus этого процесса (invalidate), по неизвестному
+    коду / id (статус добавлен другим воркером) и раз в ORDER_STATUS_REFRESH секунд.
+    """
+
+    def __init__(self):
+        # (code -> id, id -> code) - заменяются целиком, читаются без блокировки
+        self._maps: Tuple[Dict[str, int], Dict[int, str]] = ({}, {})
+        self._loaded_at: Optional[float] = None
+
+    def load(self, db: Optional[Session] = None) -> int:
+        """Перечитать статусы из БД (без db - в своей сессии), возвращает число статусов"""
+        if db is None:
+            with SessionLocal() as db:
+                return self.load(db)
+        rows = db.query(OrderStatus.id, OrderStatus.code).all()
+        self._maps = ({code: status_id for status_id, code in rows}, {status_id: code for status_id, code in rows})
+        self._loaded_at = time.monotonic()
+        return len(rows)
+
+    def invalidate(self) -> None:
+        """Следующее обращение перечитает статусы"""
+        self._loaded_at = None
+
+    def id_by_code(self, db: Session, code: str) -> Optional[int]:
+        """id статуса по коду, None - такого статуса нет"""
+        if self._stale() or code not in self._maps[0]:
+            self.load(db)
+        return self._maps[0].get(code)
+
+    def code_by_id(self, db: Session, status_id: int) -> Optional[str]:
+        if self._stale() or status_id not in self._maps[1]:
+            self.load(db)
+        return self._maps[1].get(status_id)
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or (
+            settings.ORDER_STATUS_REFRESH > 0 and time.monotonic() - self._loaded_at > settings.ORDER_STATUS_REFRESH
+        )
+
+
+order_status_registry = OrderStatusRegistry()
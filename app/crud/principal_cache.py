@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import instance_state
+
+from app.config import settings
+from app.core.metrics import Metric, register_collector
+from app.models.user import User
+
+
+class PrincipalCache:
+    """
+    Кэш аутентифицированных пользователей (deps.get_current_user): subject токена (username) -> колонки User.
+
+    LRU на PRINCIPAL_CACHE_SIZE пользователей, запись живёт PRINCIPAL_CACHE_TTL секунд (0 в любом = выкл.).
+    Эндпоинты, меняющие пользователей (users.py, сотрудники склада в warehouses.py), сбрасывают записи
+    этого процесса сразу (invalidate); изменения в других воркерах видны не позже чем через TTL -
+    столько же деактивированный пользователь может работать в другом воркере. hashed_password не кэшируется.
+    invalidate также отзывает claims выпущенных пользователю токенов (token_revocations).
+    """
+
+    # не нужна для авторизации запроса - не держим в памяти
+    _EXCLUDE = {"hashed_password"}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # subject -> (истекает, значения колонок), порядок - от давно использованных к недавним
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._subjects: Dict[int, str] = {}  # id -> subject, для invalidate по id
+        # растёт на каждом invalidate: пользователь, прочитанный из БД до сброса, в кэш не попадёт
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.PRINCIPAL_CACHE_SIZE > 0 and settings.PRINCIPAL_CACHE_TTL > 0
+
+    def get(self, subject: str) -> Optional[User]:
+        """Новый detached User из кэша (без hashed_password и relationship) или None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None and entry[0] <= now:
+                self._drop(subject)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            values = entry[1]
+        return self.detached(values)
+
+    def put(self, subject: str, user_obj: User, generation: int) -> None:
+        """Пользователь, прочитанный из БД; generation - значение self.generation до запроса"""
+        if not self.enabled:
+            return
+        values = {attr.key: user_obj.__dict__[attr.key] for attr in inspect(User).column_attrs
+                  if attr.key not in self._EXCLUDE and attr.key in user_obj.__dict__}
+        expires = time.monotonic() + settings.PRINCIPAL_CACHE_TTL
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(subject)
+            self._entries[subject] = (expires, values)
+            self._subjects[values["id"]] = subject
+            while len(self._entries) > settings.PRINCIPAL_CACHE_SIZE:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        """Сбросить пользователей после изменения (вызывать после commit)"""
+        user_ids = list(user_ids)
+        token_revocations.revoke(user_ids)
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                subject = self._subjects.get(user_id)
+                if subject is not None:
+                    self._drop(subject)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._subjects.clear()
+
+    @staticmethod
+    def detached(values: Dict[str, Any]) -> User:
+        """Новый detached User с загруженными колонками values, без SQL и без событий ORM"""
+        mapper = inspect(User)
+        user_obj = mapper.class_manager.new_instance()
+        user_obj.__dict__.update(values)
+        instance_state(user_obj).key = mapper.identity_key_from_primary_key((values["id"],))
+        return user_obj
+
+    def _drop(self, subject: str) -> None:
+        entry = self._entries.pop(subject, None)
+        if entry is not None and self._subjects.get(entry[1]["id"]) == subject:
+            del self._subjects[entry[1]["id"]]
+
+
+class TokenRevocations:
+    """
+    Список отзыва claims токенов (TOKEN_CLAIMS): user id -> время последнего изменения пользователя.
+
+    Claims токена используются, только если он выпущен (iat) после старта процесса и после последнего
+    изменения пользователя, иначе get_current_user читает пользователя из БД (через principal_cache) -
+    токен остаётся рабочим, но роль и склад берутся из строки. Запись старше ACCESS_TOKEN_EXPIRE_MINUTES
+    удаляется: выпущенные до неё токены уже истекли.
+    Список в памяти процесса, общего маркера отзыва между воркерами нет: TOKEN_CLAIMS только с одним
+    воркером (WEB_CONCURRENCY=1, проверяется в Settings), иначе деактивация в одном воркере не видна
+    остальным до истечения токена (ACCESS_TOKEN_EXPIRE_MINUTES).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked: Dict[int, float] = {}
+        # токены, выпущенные до старта, могли быть отозваны в прошлом процессе
+        self._started = time.time()
+        self.trusted = 0
+        self.fallbacks = 0
+
+    def revoke(self, user_ids: Iterable[int]) -> None:
+        now = time.time()
+        horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        with self._lock:
+            for user_id in user_ids:
+                self._revoked[user_id] = now
+            for user_id in [user_id for user_id, revoked_at in self._revoked.items() if revoked_at < horizon]:
+                del self._revoked[user_id]
+
+    def trusts(self, user_id: Optional[int], issued_at: Optional[int]) -> bool:
+        """Можно ли собрать пользователя из claims токена (iat в целых секундах - сравнение строгое)"""
+        if not settings.TOKEN_CLAIMS or user_id is None or issued_at is None:
+            return False
+        with self._lock:
+            trusted = issued_at > max(self._started, self._revoked.get(user_id, 0.0))
+            if trusted:
+                self.trusted += 1
+            else:
+                self.fallbacks += 1
+        return trusted
+
+
+token_revocations = TokenRevocations()
+principal_cache = PrincipalCache()
+
+
+@register_collector
+def _principal_cache_metrics() -> List[Metric]:
+    return [
+        Metric("principal_cache_hits_total", principal_cache.hits, "Authenticated users served from cache", "counter"),
+        Metric("principal_cache_misses_total", principal_cache.misses, "Authenticated users read from the DB", "counter"),
+        Metric("principal_cache_evictions_total", principal_cache.evictions, "Users evicted by cache size", "counter"),
+        Metric("principal_cache_entries", len(principal_cache._entries), "Cached authenticated users"),
+        Metric("token_claims_trusted_total", token_revocations.trusted, "Users built from token claims", "counter"),
+        Metric("token_claims_fallbacks_total", token_revocations.fallbacks,
+               "Claims tokens read from the DB (revoked or issued before start)", "counter"),
+        Metric("token_revocations_entries", len(token_revocations._revoked), "Users in the claims revocation list"),
+    ]
@@ -1,17 +1,94 @@
-from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from app.crud.base import CRUDBase
+import re
+from typing import Any, Dict, Optional, List, Sequence, Union
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import column, func, literal_column, or_, select, table, union
+from app.config import settings
+from app.core.pagination import Page
+from app.core.totals import TotalMode, count_total
+from app.crud.base import CRUDBase, AsyncCRUD
+from app.crud.product_autocomplete import product_autocomplete
+from app.crud.product_cache import product_cache
+from app.database import retry_on_locked
+from app.models.inventory import Inventory
+from app.models.order import OrderItem
 from app.models.product import Product
+from app.models.supply import SupplyItem
 from app.schemas.product import ProductCreate, ProductUpdate
 
 
+# Слово поиска: буквы и цифры (разделители - как у токенайзеров unicode61 / 'simple')
+_SEARCH_WORD = re.compile(r"[^\W_]+")
+# FTS5 таблица SQLite (миграция 0005), rowid = products.id
+_products_fts = table("products_fts", column("rowid"))
+
+
 class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
 
+    # - - - CACHE (app/crud/product_cache.py) - - - #
+
+    def get_cached(self, db: Session, ids: Sequence[int]) -> Dict[int, Product]:
+        """
+        Товары по id (id -> товар, отсутствующие пропускаются) только для чтения (ответ API):
+        объект сессии, кэш каталога (новый detached объект, в сессию не добавляется) или
+        промахи одним SELECT ... WHERE id IN (...).
+        Для изменения товар читается из БД (get / get_by_sku), не отсюда
+        """
+        found: Dict[int, Product] = {}
+        for product_id in set(ids):
+            db_obj = db.identity_map.get(self.model.__mapper__.identity_key_from_primary_key((product_id,)))
+            if db_obj is not None:
+                found[product_id] = db_obj
+
+        for product_id, values in product_cache.lookup(set(ids) - set(found)).items():
+            found[product_id] = product_cache.detached(values)
+
+        missing = set(ids) - set(found)
+        if missing:
+            generation = product_cache.generation
+            db_objs = self.get_many(db, list(missing))
+            product_cache.store(db_objs, generation)
+            found.update((db_obj.id, db_obj) for db_obj in db_objs)
+        return found
+
+    def fill_products(self, db: Session, objs: Sequence[Any]) -> None:
+        """
+        Вложенный товар (obj.product) для строк с product_id (остатки, позиции заказов) вместо
+        joinedload: из кэша каталога, промахи - одним запросом на все строки. Только для ответа (см. get_cached)
+        """
+        products = self.get_cached(db, [obj.product_id for obj in objs])
+        for obj in objs:
+            set_committed_value(obj, "product", products.get(obj.product_id))
+
+    # - - - /END CACHE - - - #
+
     def get_by_sku(self, db: Session, *, sku: str) -> Optional[Product]:
-        """Получить товар по SKU"""
+        """Получить товар по SKU (по БД: проверка уникальности перед записью)"""
         return db.query(Product).filter(Product.sku == sku).first()
 
+    def get_by_skus(self, db: Session, *, skus: Sequence[str]) -> List[Product]:
+        """Товары с SKU из списка (одним запросом, для пакетных операций)"""
+        if not skus:
+            return []
+        return db.query(Product).filter(Product.sku.in_(set(skus))).all()
+
+    def get_referenced_ids(self, db: Session, *, ids: Sequence[int]) -> List[int]:
+        """id товаров из списка, на которые ссылаются остатки, поставки или заказы"""
+        if not ids:
+            return []
+        ids = set(ids)
+        return sorted(db.scalars(union(
+            select(Inventory.product_id).where(Inventory.product_id.in_(ids)),
+            select(SupplyItem.product_id).where(SupplyItem.product_id.in_(ids)),
+            select(OrderItem.product_id).where(OrderItem.product_id.in_(ids)),
+        )))
+
+    def has_stock(self, db: Session, *, id: int) -> bool:
+        """Есть ли товар в остатках хоть одного склада (EXISTS, без загрузки inventory_items)"""
+        return db.query(
+            db.query(Inventory).filter(Inventory.product_id == id, Inventory.quantity > 0).exists()
+        ).scalar()
+
     def get_multi_active(
             self, db: Session, *, skip: int = 0, limit: int = 100, search: Optional[str] = None
     ) -> List[Product]:
@@ -19,35 +96,59 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
         query = db.query(Product).filter(Product.is_active == True)
 
         if search:
-            search_filter = or_(
-                Product.name.ilike(f"%{search}%"),
-                Product.sku.ilike(f"%{search}%"),
-                Product.description.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            query = self._search(db, query, search)
 
         return query.offset(skip).limit(limit).all()
 
     def get_multi_all(
             self, db: Session, *, skip: int = 0, limit: int = 100,
-            is_active: Optional[bool] = None, search: Optional[str] = None
-    ) -> List[Product]:
-        """Получить все товары (для админа) с фильтрацией"""
+            is_active: Optional[bool] = None, search: Optional[str] = None,
+            total_mode: TotalMode = TotalMode.EXACT
+    ) -> Page:
+        """Получить все товары (для админа) с фильтрацией, total - по тем же фильтрам"""
         query = db.query(Product)
 
         if is_active is not None:
             query = query.filter(Product.is_active == is_active)
 
         if search:
-            search_filter = or_(
-                Product.name.ilike(f"%{search}%"),
-                Product.sku.ilike(f"%{search}%"),
-                Product.description.ilike(f"%{search}%")
+            query = self._search(db, query, search)
+
+        total = count_total(db, query, total_mode)
+        return Page(query.offset(skip).limit(limit).all(), total)
+
+    def _search(self, db: Session, query: Query, search: str) -> Query:
+        """
+        Поиск по name, sku, description: каждое слово строки - префикс, нужны все слова (AND),
+        сортировка по релевантности. Индекс - миграция 0005_product_search:
+        SQLite - FTS5 products_fts ("бол"* AND "м8"*), PostgreSQL - search_vector (бол:* & м8:*).
+        Без индекса (PRODUCT_SEARCH_FTS=false, другая СУБД) и для строки без слов - ilike по подстроке.
+        """
+        words = [word.lower() for word in _SEARCH_WORD.findall(search)]
+        dialect = db.get_bind().dialect.name
+
+        if settings.PRODUCT_SEARCH_FTS and words and dialect == "sqlite":
+            fts = literal_column("products_fts")
+            match = " AND ".join(f'"{word}"*' for word in words)
+            # веса bm25 по колонкам: name, sku, description (меньше - релевантнее)
+            return query.join(_products_fts, _products_fts.c.rowid == Product.id).filter(
+                fts.op("MATCH")(match)
+            ).order_by(func.bm25(fts, 10.0, 10.0, 1.0), Product.id)
+
+        if settings.PRODUCT_SEARCH_FTS and words and dialect == "postgresql":
+            search_vector = literal_column("products.search_vector")
+            ts_query = func.to_tsquery("simple", " & ".join(f"{word}:*" for word in words))
+            return query.filter(search_vector.op("@@")(ts_query)).order_by(
+                func.ts_rank(search_vector, ts_query).desc(), Product.id
             )
-            query = query.filter(search_filter)
 
-        return query.offset(skip).limit(limit).all()
+        return query.filter(or_(
+            Product.name.ilike(f"%{search}%"),
+            Product.sku.ilike(f"%{search}%"),
+            Product.description.ilike(f"%{search}%")
+        ))
 
+    @retry_on_locked
     def create(self, db: Session, *, obj_in: ProductCreate) -> Product:
         """Создать товар с проверкой уникальности SKU"""
         db_obj = Product(
@@ -59,7 +160,7 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
         )
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
+        product_autocomplete.put([db_obj])
         return db_obj
 
     def update(
@@ -68,15 +169,47 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
         update_data = obj_in.model_dump(exclude_unset=True)
 
         if 'sku' in update_data and update_data['sku'] != db_obj.sku:
-            existing = self.get_by_sku(db, sku=update_data['sku'])
-            if existing:
+            # проверка уникальности - по БД, не по кэшу
+            if self.get_by_skus(db, skus=[update_data['sku']]):
                 raise ValueError(f"Product with SKU '{update_data['sku']}' already exists")
 
-        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+        db_obj = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        product_cache.invalidate([db_obj.id])
+        product_autocomplete.put([db_obj])
+        return db_obj
+
+    def remove(self, db: Session, *, row_id: int) -> Product:
+        db_obj = super().remove(db, row_id=row_id)
+        product_cache.invalidate([row_id])
+        product_autocomplete.discard([row_id])
+        return db_obj
+
+    # - - - BATCH (с обновлением кэша и подсказок) - - - #
+
+    def create_many(self, db: Session, *, objs_in: Sequence[ProductCreate]) -> List[Product]:
+        db_objs = super().create_many(db, objs_in=objs_in)
+        product_autocomplete.put(db_objs)
+        return db_objs
+
+    def update_many(self, db: Session, *, objs_in: Dict[int, Union[ProductUpdate, Dict[str, Any]]]) -> List[Product]:
+        db_objs = super().update_many(db, objs_in=objs_in)
+        product_cache.invalidate(objs_in)
+        product_autocomplete.put(db_objs)
+        return db_objs
+
+    def remove_many(self, db: Session, *, ids: Sequence[int]) -> int:
+        removed = super().remove_many(db, ids=ids)
+        product_cache.invalidate(ids)
+        product_autocomplete.discard(ids)
+        return removed
+
+    # - - - /END BATCH - - - #
 
 
 product = CRUDProduct(Product)
 
+product_async = AsyncCRUD(product)
+
 
 # from sqlalchemy.orm import Session
 # from typing import Optional
@@ -0,0 +1,123 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.database import ReadSessionLocal
+from app.models.product import Product
+
+
+class ProductAutocomplete:
+    """
+    Подсказки товаров по префиксу SKU и названия без запроса в БД.
+
+    Два отсортированных списка ключей "<sku|name в нижнем регистре>\\0<id>" (поиск - bisect по префиксу)
+    и id -> (sku, name) для ответа. В индексе только активные товары.
+
+    Загружается целиком при старте (load) и перезагружается раз в PRODUCT_AUTOCOMPLETE_REFRESH
+    секунд - так видны записи других воркеров. Записи через CRUDProduct этого процесса попадают
+    в индекс сразу (put / discard), в том числе во время перезагрузки.
+    """
+
+    # больше изменений за раз - списки пересобираются сортировкой, а не вставкой по одному
+    _REBUILD_THRESHOLD = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._skus: List[str] = []
+        self._names: List[str] = []
+        self._items: Dict[int, Tuple[str, str]] = {}
+        self._pending: Optional[List[Tuple[int, Optional[Tuple[str, str]]]]] = None  # изменения во время load
+        self.loaded = False
+
+    def load(self) -> int:
+        """Полная (пере)загрузка активных товаров из БД, возвращает число товаров"""
+        with self._lock:
+            self._pending = []
+        try:
+            with ReadSessionLocal() as db:
+                rows = db.query(Product.id, Product.sku, Product.name).filter(Product.is_active == True).all()
+            items = {product_id: (sku, name) for product_id, sku, name in rows}
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            for product_id, item in self._pending:
+                if item is None:
+                    items.pop(product_id, None)
+                else:
+                    items[product_id] = item
+            self._pending = None
+            self._items = items
+            self._rebuild()
+            self.loaded = True
+            return len(items)
+
+    def put(self, products: Iterable[Product]) -> None:
+        """Товары после create / update: неактивные убираются из индекса"""
+        changes = [
+            (product_obj.id, (product_obj.sku, product_obj.name) if product_obj.is_active else None)
+            for product_obj in products
+        ]
+        self._apply(changes)
+
+    def discard(self, product_ids: Iterable[int]) -> None:
+        """Удалённые товары"""
+        self._apply([(product_id, None) for product_id in product_ids])
+
+    def search(self, prefix: str, limit: int = 10) -> List[Tuple[int, str, str]]:
+        """(id, sku, name) товаров, у которых SKU или название начинается с prefix: сначала по SKU"""
+        prefix = prefix.lower()
+        found: Dict[int, Tuple[str, str]] = {}
+        with self._lock:
+            for keys in (self._skus, self._names):
+                i = bisect_left(keys, prefix)
+                while i < len(keys) and len(found) < limit and keys[i].startswith(prefix):
+                    product_id = int(keys[i].rpartition("\0")[2])
+                    found.setdefault(product_id, self._items[product_id])
+                    i += 1
+        return [(product_id, sku, name) for product_id, (sku, name) in found.items()]
+
+    def _apply(self, changes: List[Tuple[int, Optional[Tuple[str, str]]]]) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(changes)
+            if not self.loaded:
+                return
+
+            if len(changes) > self._REBUILD_THRESHOLD:
+                for product_id, item in changes:
+                    if item is None:
+                        self._items.pop(product_id, None)
+                    else:
+                        self._items[product_id] = item
+                self._rebuild()
+                return
+
+            for product_id, item in changes:
+                old = self._items.pop(product_id, None)
+                if old is not None:
+                    self._remove_key(self._skus, old[0], product_id)
+                    self._remove_key(self._names, old[1], product_id)
+                if item is not None:
+                    self._items[product_id] = item
+                    insort(self._skus, self._key(item[0], product_id))
+                    insort(self._names, self._key(item[1], product_id))
+
+    def _rebuild(self) -> None:
+        self._skus = sorted(self._key(sku, product_id) for product_id, (sku, _) in self._items.items())
+        self._names = sorted(self._key(name, product_id) for product_id, (_, name) in self._items.items())
+
+    @staticmethod
+    def _key(value: str, product_id: int) -> str:
+        return f"{value.lower()}\0{product_id}"
+
+    def _remove_key(self, keys: List[str], value: str, product_id: int) -> None:
+        key = self._key(value, product_id)
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+
+product_autocomplete = ProductAutocomplete()
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import instance_state
+
+from app.config import settings
+from app.core.metrics import Metric, register_collector
+from app.models.product import Product
+
+
+class ProductCache:
+    """
+    Кэш каталога товаров в памяти процесса: id -> значения колонок товара.
+
+    LRU на PRODUCT_CACHE_SIZE записей, запись живёт PRODUCT_CACHE_TTL секунд (0 в любом = выкл.).
+    Записи через CRUDProduct этого процесса сбрасывают записи сразу (invalidate), записи других
+    воркеров и прямой SQL видны не позже чем через TTL. Отсутствующие товары не кэшируются.
+
+    Из кэша отдаются новые detached объекты Product на каждый запрос (объекты сессий не делятся
+    между потоками) - только для чтения (товар в ответе). В сессию они не добавляются: значения могут
+    отставать от БД на TTL, поэтому товар для изменения читается из БД (CRUDProduct.get / get_by_sku).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # id -> (истекает, значения колонок), порядок - от давно использованных к недавним
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # растёт на каждом invalidate: значения, прочитанные из БД до сброса, в кэш не попадут
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.PRODUCT_CACHE_SIZE > 0 and settings.PRODUCT_CACHE_TTL > 0
+
+    def lookup(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Значения колонок найденных в кэше товаров (id -> значения)"""
+        if not self.enabled:
+            return {}
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for product_id in ids:
+                entry = self._entries.get(product_id)
+                if entry is not None and entry[0] <= now:
+                    self._drop(product_id)
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(product_id)
+                self.hits += 1
+                found[product_id] = entry[1]
+        return found
+
+    def store(self, products: Iterable[Product], generation: int) -> None:
+        """Товары, прочитанные из БД; generation - значение self.generation до запроса"""
+        if not self.enabled:
+            return
+        columns = [attr.key for attr in inspect(Product).column_attrs]
+        rows = [{key: product_obj.__dict__[key] for key in columns} for product_obj in products
+                if all(key in product_obj.__dict__ for key in columns)]  # без истёкших / не загруженных колонок
+        expires = time.monotonic() + settings.PRODUCT_CACHE_TTL
+        with self._lock:
+            if generation != self.generation:
+                return
+            for values in rows:
+                self._drop(values["id"])
+                self._entries[values["id"]] = (expires, values)
+            while len(self._entries) > settings.PRODUCT_CACHE_SIZE:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, ids: Iterable[int]) -> None:
+        """Сбросить товары после записи (вызывать после commit)"""
+        with self._lock:
+            self.generation += 1
+            for product_id in ids:
+                self._drop(product_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries)}
+
+    @staticmethod
+    def detached(values: Dict[str, Any]) -> Product:
+        """Новый detached Product с загруженными колонками, без SQL и без событий ORM"""
+        mapper = inspect(Product)
+        product_obj = mapper.class_manager.new_instance()
+        product_obj.__dict__.update(values)
+        instance_state(product_obj).key = mapper.identity_key_from_primary_key((values["id"],))
+        return product_obj
+
+    def _drop(self, product_id: int) -> None:
+        self._entries.pop(product_id, None)
+
+
+product_cache = ProductCache()
+
+
+@register_collector
+def _product_cache_metrics() -> List[Metric]:
+    return [
+        Metric("product_cache_hits_total", product_cache.hits, "Products served from the catalog cache", "counter"),
+        Metric("product_cache_misses_total", product_cache.misses, "Products read from the DB", "counter"),
+        Metric("product_cache_evictions_total", product_cache.evictions, "Products evicted by cache size", "counter"),
+        Metric("product_cache_entries", len(product_cache._entries), "Cached products"),
+    ]
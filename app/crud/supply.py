@@ -1,9 +1,14 @@
 from typing import Optional, List, Tuple
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import and_, or_, func
 from datetime import date, datetime
 
-from app.crud.base import CRUDBase
+from app.core.date_range import date_range_filter
+from app.core.pagination import Page, keyset_page
+from app.core.totals import TotalMode, count_total
+from app.crud.base import CRUDBase, AsyncCRUD
+from app.crud.number_sequence import number_allocator
+from app.database import retry_on_locked
 
 from app.models.supply import Supply, SupplyItem
 from app.models.inventory import Inventory
@@ -15,15 +20,7 @@ class CRUDSupply(CRUDBase[Supply, SupplyCreate, SupplyUpdate]):
 
     def generate_supply_number(self, db: Session) -> str:
         """Генерирует уникальный номер поставки: SUP-YYYY-XXXXX"""
-        year = datetime.now().year
-
-        # Считаем поставки за этот год
-        count = db.query(func.count(Supply.id)).filter(
-            func.extract('year', Supply.created_at) == year
-        ).scalar()
-
-        next_num = count + 1
-        return f"SUP-{year}-{next_num:05d}"
+        return number_allocator.next_number(db, "SUP")
 
     def get_with_items(self, db: Session, *, id: int) -> Optional[Supply]:
         """Получить поставку вместе с позициями и товарами"""
@@ -39,11 +36,13 @@ class CRUDSupply(CRUDBase[Supply, SupplyCreate, SupplyUpdate]):
             warehouse_id: int,
             skip: int = 0,
             limit: int = 100,
-            filters: Optional[SupplyFilterParams] = None
-    ) -> Tuple[List[Supply], int]:
+            filters: Optional[SupplyFilterParams] = None,
+            after: Optional[str] = None,  # курсор (next_cursor предыдущей страницы) вместо skip
+            total_mode: TotalMode = TotalMode.EXACT
+    ) -> Page:
         """
-        Получить поставки склада с пагинацией и фильтрацией
-        Возвращает (список, общее_количество)
+        Получить поставки склада с пагинацией и фильтрацией (новые сначала)
+        Возвращает Page(список, общее_количество, курсор следующей страницы)
         """
         query = db.query(Supply).filter(Supply.warehouse_id == warehouse_id)
 
@@ -52,33 +51,28 @@ class CRUDSupply(CRUDBase[Supply, SupplyCreate, SupplyUpdate]):
             if filters.search:
                 query = query.filter(Supply.supply_number.ilike(f"%{filters.search}%"))
 
-            if filters.date_from:
-                query = query.filter(
-                    func.date(Supply.created_at) >= filters.date_from
-                )
-
-            if filters.date_to:
-                query = query.filter(
-                    func.date(Supply.created_at) <= filters.date_to
-                )
+            if filters.date_from or filters.date_to:
+                query = query.filter(*date_range_filter(Supply.created_at, filters.date_from, filters.date_to))
 
             if filters.product_id:
-                # Подзапрос: поставки, содержащие указанный товар
-                query = query.join(Supply.items).filter(
-                    SupplyItem.product_id == filters.product_id
-                ).distinct()
+                # EXISTS вместо join + DISTINCT: строка на поставку, COUNT(*) OVER () считает поставки
+                query = query.filter(Supply.items.any(SupplyItem.product_id == filters.product_id))
 
-        # Считаем общее количество ДО пагинации
-        total = query.count()
+        # Считаем общее количество ДО пагинации (или вместе со страницей, см. keyset_page)
+        total = count_total(db, query, total_mode, with_page=True)
 
-        # Загружаем с отношениями
-        supplies = query.options(
-            joinedload(Supply.items).joinedload(SupplyItem.product),
+        # Загружаем с отношениями: позиции отдельным IN-запросом на всю страницу,
+        # joinedload коллекции размножил бы строки под LIMIT / OFFSET
+        query = query.options(
+            selectinload(Supply.items).joinedload(SupplyItem.product),
             joinedload(Supply.warehouse)
-        ).order_by(Supply.created_at.desc()).offset(skip).limit(limit).all()
-
-        return supplies, total
+        )
+        return keyset_page(
+            query, [(Supply.created_at, True), (Supply.id, True)],
+            total=total, skip=skip, limit=limit, after=after
+        )
 
+    @retry_on_locked
     def create_with_items(
             self,
             db: Session,
@@ -128,9 +122,9 @@ class CRUDSupply(CRUDBase[Supply, SupplyCreate, SupplyUpdate]):
                 db.add(inventory)
 
         db.commit()
-        db.refresh(db_supply)
-        return db_supply
+        return self.get_with_items(db, id=db_supply.id)
 
+    @retry_on_locked
     def delete_with_items(self, db: Session, *, db_obj: Supply) -> None:
         """
         Удалить поставку и уменьшить инвентарь
@@ -155,6 +149,13 @@ class CRUDSupply(CRUDBase[Supply, SupplyCreate, SupplyUpdate]):
 
 class CRUDSupplyItem(CRUDBase[SupplyItem, SupplyItemCreate, SupplyItemUpdate]):
 
+    def get_with_supply(self, db: Session, *, id: int) -> Optional[SupplyItem]:
+        """Получить позицию вместе с поставкой (нужен warehouse_id для проверки прав)"""
+        return db.query(SupplyItem).options(
+            joinedload(SupplyItem.supply)
+        ).filter(SupplyItem.id == id).first()
+
+    @retry_on_locked
     def update_quantity_and_inventory(
             self,
             db: Session,
@@ -179,9 +180,9 @@ class CRUDSupplyItem(CRUDBase[SupplyItem, SupplyItemCreate, SupplyItemUpdate]):
         db_obj.quantity = new_quantity
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
+    @retry_on_locked
     def delete_with_inventory(self, db: Session, *, db_obj: SupplyItem) -> None:
         """Удалить позицию и уменьшить инвентарь"""
         # Уменьшаем инвентарь
@@ -203,3 +204,6 @@ class CRUDSupplyItem(CRUDBase[SupplyItem, SupplyItemCreate, SupplyItemUpdate]):
 
 supply = CRUDSupply(Supply)
 supply_item = CRUDSupplyItem(SupplyItem)
+
+supply_async = AsyncCRUD(supply)
+supply_item_async = AsyncCRUD(supply_item)
@@ -1,9 +1,10 @@
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from app.core.security import get_password_hash, verify_password
+from app.database import retry_on_locked
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
-from .base import CRUDBase
+from .base import CRUDBase, AsyncCRUD
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -17,6 +18,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def get_by_username(self, db: Session, *, username: str) -> Optional[User]:
         return db.query(User).filter(User.username == username).first()
 
+    @retry_on_locked
     def create(self, db: Session, *, obj_in: UserCreate) -> User:
         db_obj = User(
             username=obj_in.username,
@@ -25,7 +27,6 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         )
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
     def authenticate(
@@ -50,3 +51,5 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
 
 
 user = CRUDUser(User)
+
+user_async = AsyncCRUD(user)
@@ -1,6 +1,9 @@
 from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
-from app.crud.base import CRUDBase
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.core.pagination import Page
+from app.core.totals import TotalMode, count_total
+from app.crud.base import CRUDBase, AsyncCRUD
+from app.database import retry_on_locked
 from app.models.warehouse import Warehouse
 from app.models.user import User
 from app.schemas.warehouse import WarehouseCreate, WarehouseUpdate
@@ -15,43 +18,43 @@ class CRUDWarehouse(CRUDBase[Warehouse, WarehouseCreate, WarehouseUpdate]):
         ).filter(Warehouse.id == id).first()
 
     def get_multi_with_users(
-            self, db: Session, *, skip: int = 0, limit: int = 100, is_active: Optional[bool] = None
-    ) -> List[Warehouse]:
-        """Получить список складов с сотрудниками"""
-        query = db.query(Warehouse).options(joinedload(Warehouse.users))
+            self, db: Session, *, skip: int = 0, limit: int = 100, is_active: Optional[bool] = None,
+            total_mode: TotalMode = TotalMode.EXACT
+    ) -> Page:
+        """Получить список складов с сотрудниками, total - по тем же фильтрам"""
+        query = db.query(Warehouse)
 
         if is_active is not None:
             query = query.filter(Warehouse.is_active == is_active)
 
-        return query.offset(skip).limit(limit).all()
+        total = count_total(db, query, total_mode)
+        warehouses = query.options(selectinload(Warehouse.users)).offset(skip).limit(limit).all()
+        return Page(warehouses, total)
 
+    @retry_on_locked
     def create_with_users(
             self, db: Session, *, obj_in: WarehouseCreate
     ) -> Warehouse:
         """Создать склад и привязать сотрудников"""
+        # Сотрудников привязываем до add: у нового объекта нечего подгружать из users
+        users = db.query(User).filter(User.id.in_(obj_in.user_ids)).all() if obj_in.user_ids else []
         db_obj = Warehouse(
             name=obj_in.name,
             state=obj_in.state,
             city=obj_in.city,
             description=obj_in.description,
             is_active=obj_in.is_active,
+            users=users,
         )
         db.add(db_obj)
-        db.flush()  # чтобы получить id
-
-        # Привязываем сотрудников
-        if obj_in.user_ids:
-            users = db.query(User).filter(User.id.in_(obj_in.user_ids)).all()
-            db_obj.users = users
-
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
+    @retry_on_locked
     def update_with_users(
             self, db: Session, *, db_obj: Warehouse, obj_in: WarehouseUpdate
     ) -> Warehouse:
-        """Обновить склад и список сотрудников"""
+        """Обновить склад и список сотрудников (db_obj - из get_with_users)"""
         # Обновляем простые поля
         update_data = obj_in.model_dump(exclude_unset=True, exclude={'user_ids'})
         for field, value in update_data.items():
@@ -67,22 +70,26 @@ class CRUDWarehouse(CRUDBase[Warehouse, WarehouseCreate, WarehouseUpdate]):
 
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
+    def has_users(self, db: Session, *, id: int) -> bool:
+        """Есть ли у склада сотрудники (EXISTS, без загрузки списка)"""
+        return db.query(db.query(User).filter(User.warehouse_id == id).exists()).scalar()
+
     def get_by_user_id(self, db: Session, *, user_id: int) -> Optional[Warehouse]:
         """Получить склад сотрудника (если сотрудник привязан к одному складу)"""
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.query(User).options(joinedload(User.warehouse)).filter(User.id == user_id).first()
         if user and user.warehouse:
             return user.warehouse
         return None
 
     def is_user_in_warehouse(self, db: Session, *, warehouse_id: int, user_id: int) -> bool:
         """Проверить, является ли пользователь сотрудником склада"""
-        warehouse = db.query(Warehouse).filter(Warehouse.id == warehouse_id).first()
-        if not warehouse:
-            return False
-        return any(user.id == user_id for user in warehouse.users)
+        return db.query(
+            db.query(User).filter(User.id == user_id, User.warehouse_id == warehouse_id).exists()
+        ).scalar()
 
 
 warehouse = CRUDWarehouse(Warehouse)
+
+warehouse_async = AsyncCRUD(warehouse)
@@ -1,17 +1,316 @@
-from sqlalchemy import create_engine
+import asyncio
+import functools
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.config import settings
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import await_only
+from app.config import settings, DatabaseType
+from app.core.metrics import Metric, register_collector
+from app.core import query_stats, totals
+
+
+class PoolStatsMixin:
+    """Счётчики ожидания соединения из пула (время checkout, таймауты)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "timeout": self.timeout(),
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+class InstrumentedQueuePool(PoolStatsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """SQLite performance mode: прагмы выставляются на каждое новое соединение"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+
+def _configure_engine(sync_engine: Engine) -> None:
+    query_stats.instrument_engine(sync_engine)
+    totals.instrument_engine(sync_engine)
+    if sync_engine.dialect.name == "sqlite" and settings.SQLITE_PERFORMANCE_MODE:
+        event.listen(sync_engine, "connect", apply_sqlite_pragmas)
+
+
+def _make_engine(url: str) -> Engine:
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {},
+        echo=True if settings.ENVIRONMENT == "development" else False,
+        poolclass=InstrumentedQueuePool,
+        **settings.DATABASE_POOL_OPTIONS,
+    )
+    _configure_engine(db_engine)
+    return db_engine
+
+
+def _make_async_engine(url: str) -> AsyncEngine:
+    db_engine = create_async_engine(
+        url,
+        echo=True if settings.ENVIRONMENT == "development" else False,
+        poolclass=InstrumentedAsyncQueuePool,
+        **settings.DATABASE_POOL_OPTIONS,
+    )
+    _configure_engine(db_engine.sync_engine)
+    return db_engine
+
+
+class PrimarySession(Session):
+    """Сессия основной БД для AsyncSession (отдельный класс, чтобы вешать события только на неё)"""
+
+
+class ReplicaSession(Session):
+    """Сессия read replica: flush с изменениями запрещён"""
+
+
+@event.listens_for(ReplicaSession, "before_flush")
+def _reject_flush(session, flush_context, instances) -> None:
+    raise RuntimeError("Read replica session is read-only")
+
+
+# Все сессии (и sync-сессии внутри AsyncSession): учёт неявных lazy-загрузок (LAZY_LOAD_MODE)
+query_stats.instrument_session(Session)
+
+
+engine = _make_engine(settings.DATABASE_URL)
+
+# expire_on_commit=False: объект после commit сериализуется в ответ без повторного SELECT.
+# Значения БД (id, created_at, updated_at) приходят в том же INSERT / UPDATE через RETURNING (eager_defaults),
+# поэтому refresh после commit не нужен. Колонкам с onupdate нужен default=null(): иначе после INSERT
+# SQLAlchemy дочитывает их отдельным SELECT.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+class ModelBase:
+    __mapper_args__ = {"eager_defaults": True}
+
+
+Base = declarative_base(cls=ModelBase)
+
+
+# Асинхронный движок создаём только в DB_ASYNC_MODE (нужен aiosqlite / asyncpg)
+async_engine = _make_async_engine(settings.ASYNC_DATABASE_URL) if settings.DB_ASYNC_MODE else None
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, sync_session_class=PrimarySession
+) if async_engine is not None else None
 
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=True if settings.ENVIRONMENT == "development" else False,
-)
+# Read replica: отдельный движок только для чтения (без READ_REPLICA_URL читаем из основной БД)
+if settings.READ_REPLICA_URL:
+    read_engine = _make_engine(settings.READ_REPLICA_URL)
+    ReadSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine, class_=ReplicaSession
+    )
+else:
+    read_engine, ReadSessionLocal = engine, SessionLocal
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+if settings.READ_REPLICA_URL and async_engine is not None:
+    async_read_engine = _make_async_engine(settings.ASYNC_READ_REPLICA_URL)
+    AsyncReadSessionLocal = async_sessionmaker(
+        async_read_engine, autoflush=False, expire_on_commit=False, sync_session_class=ReplicaSession
+    )
+else:
+    async_read_engine, AsyncReadSessionLocal = async_engine, AsyncSessionLocal
+
+
+# - - - READ-YOUR-WRITES - - - #
+
+# Пользователь текущего запроса - subject токена (выставляет deps.authenticate):
+# deps.get_read_db выбирает основную БД или реплику по токену, до загрузки пользователя
+_request_subject: ContextVar[Optional[str]] = ContextVar("request_subject", default=None)
+# subject -> time.monotonic() последнего commit с изменениями
+_last_write_at: Dict[str, float] = {}
+
+
+def bind_request_user(subject: str) -> None:
+    _request_subject.set(subject)
+
+
+def wrote_recently(subject: str) -> bool:
+    """Была ли у пользователя запись в окне READ_YOUR_WRITES_SECONDS"""
+    written_at = _last_write_at.get(subject)
+    return written_at is not None and time.monotonic() - written_at < settings.READ_YOUR_WRITES_SECONDS
+
+
+def _mark_dirty(session, flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+def _remember_write(session) -> None:
+    if not session.info.pop("has_writes", False):
+        return
+    subject = _request_subject.get()
+    if subject is None:
+        return
+
+    now = time.monotonic()
+    _last_write_at[subject] = now
+    if len(_last_write_at) > 10000:
+        for key, written_at in list(_last_write_at.items()):
+            if now - written_at >= settings.READ_YOUR_WRITES_SECONDS:
+                _last_write_at.pop(key, None)
+
+
+if settings.READ_REPLICA_URL and settings.READ_YOUR_WRITES_SECONDS > 0:
+    for primary in (SessionLocal, PrimarySession):
+        event.listen(primary, "after_flush", _mark_dirty)
+        event.listen(primary, "after_commit", _remember_write)
+
+# - - - /END READ-YOUR-WRITES - - - #
+
+
+WriteMethod = TypeVar("WriteMethod", bound=Callable[..., Any])
+
+_LOCKED_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+# ключи session.info: внутри retry_on_locked / в транзакции уже был flush
+_RETRYING = "retry_on_locked"
+_FLUSHED = "flushed_in_transaction"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flushed(session, flush_context) -> None:
+    session.info[_FLUSHED] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_flushed(session) -> None:
+    session.info.pop(_FLUSHED, None)
+
+
+def _is_locked_error(error: exc.OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return any(text in message for text in _LOCKED_MESSAGES)
+
+
+def _has_caller_changes(db: Session) -> bool:
+    """В сессии есть изменения вызывающего кода, которые rollback перед повтором молча отбросил бы"""
+    return bool(db.new or db.dirty or db.deleted or db.info.get(_FLUSHED))
+
+
+def retry_on_locked(method: WriteMethod) -> WriteMethod:
+    """
+    Повторить CRUD-метод записи, если БД занята (SQLite "database is locked").
+    Транзакция откатывается и метод выполняется заново с экспоненциальной задержкой.
+    Повторяется только метод, который сам начинает единицу работы:
+    - если в сессии уже есть изменения вызывающего кода (db.new / dirty / deleted или flush
+      в текущей транзакции), ошибка пробрасывается без повтора - rollback отбросил бы их;
+    - вложенный вызов (CRUDProduct.update -> CRUDBase.update) не повторяется сам,
+      повторяет самый внешний метод - число попыток не перемножается.
+    Сигнатура метода: (self, db, ...)
+    """
+    @functools.wraps(method)
+    def wrapper(self, db, *args, **kwargs):
+        if db.info.get(_RETRYING) or _has_caller_changes(db):
+            return method(self, db, *args, **kwargs)
+
+        db.info[_RETRYING] = True
+        try:
+            attempt = 0
+            while True:
+                try:
+                    return method(self, db, *args, **kwargs)
+                except exc.OperationalError as e:
+                    if attempt >= settings.DB_WRITE_RETRIES or not _is_locked_error(e):
+                        raise
+                    db.rollback()
+                    delay = settings.DB_WRITE_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    attempt += 1
+                    if db.get_bind().dialect.is_async:
+                        # Внутри AsyncSession.run_sync: ждём, не блокируя event loop
+                        await_only(asyncio.sleep(delay))
+                    else:
+                        time.sleep(delay)
+        finally:
+            db.info.pop(_RETRYING, None)
+
+    return wrapper
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Текущее состояние пулов соединений"""
+    pools = {"primary": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.pool
+    if settings.READ_REPLICA_URL:
+        pools["replica"] = read_engine.pool
+        if async_read_engine is not None:
+            pools["async_replica"] = async_read_engine.pool
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+@register_collector
+def _pool_metrics() -> List[Metric]:
+    metrics = []
+    for name, stats in get_pool_stats().items():
+        labels = {"pool": name}
+        metrics += [
+            Metric("db_pool_size", stats["size"], "Configured pool size", labels=labels),
+            Metric("db_pool_checked_out", stats["checked_out"], "Connections in use", labels=labels),
+            Metric("db_pool_idle", stats["idle"], "Idle connections in pool", labels=labels),
+            Metric("db_pool_overflow", stats["overflow"], "Overflow connections open", labels=labels),
+            Metric("db_pool_checkouts_total", stats["checkouts"], "Connection checkouts", "counter", labels),
+            Metric("db_pool_checkout_timeouts_total", stats["checkout_timeouts"],
+                   "Checkouts failed with pool timeout", "counter", labels),
+            Metric("db_pool_wait_seconds_total", stats["wait_seconds_total"],
+                   "Time spent waiting for a connection", "counter", labels),
+            Metric("db_pool_wait_seconds_max", stats["wait_seconds_max"],
+                   "Longest wait for a connection", labels=labels),
+        ]
+    return metrics
 
 
 def get_db():
@@ -21,3 +320,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency для получения AsyncSession (DB_ASYNC_MODE)"""
+    async with AsyncSessionLocal() as db:
+        yield db
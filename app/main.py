@@ -1,16 +1,55 @@
-from fastapi import FastAPI # , Request, Depends
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.api.api import api_router
+from app.core import query_stats
+from app.core.pagination import InvalidCursorError
+from app.crud.order_status_registry import order_status_registry
+from app.crud.product_autocomplete import product_autocomplete
 # from app.database import get_db
 # from app.api.deps import get_current_user
 
 import uvicorn
 
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    refresh = None
+    await run_in_threadpool(order_status_registry.load)
+    if settings.PRODUCT_AUTOCOMPLETE_ON_STARTUP:
+        await run_in_threadpool(product_autocomplete.load)
+    if settings.PRODUCT_AUTOCOMPLETE_REFRESH > 0:
+        refresh = asyncio.create_task(_refresh_product_autocomplete())
+    yield
+    if refresh is not None:
+        refresh.cancel()
+
+
+async def _refresh_product_autocomplete():
+    """Перезагрузка подсказок товаров: записи других воркеров (у каждого процесса свой индекс)"""
+    while True:
+        await asyncio.sleep(settings.PRODUCT_AUTOCOMPLETE_REFRESH)
+        if not product_autocomplete.loaded:
+            continue
+        try:
+            await run_in_threadpool(product_autocomplete.load)
+        except Exception:
+            logger.exception("product autocomplete refresh failed")
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
@@ -32,6 +71,25 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def db_query_stats(request: Request, call_next):
+    """Число SQL запросов и время в БД на каждый HTTP запрос"""
+    stats = query_stats.start_request(f"{request.method} {request.url.path}", request.scope)
+    response = await call_next(request)
+
+    query_stats.finish_request(stats, f"{request.method} {query_stats.route_template(request.scope)}")
+    if settings.QUERY_STATS_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+    return response
+
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError):
+    """Повреждённый after= в любом списке с курсором -> 400"""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
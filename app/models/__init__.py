@@ -4,6 +4,7 @@ from app.models.product import Product
 from app.models.inventory import Inventory
 from app.models.supply import Supply, SupplyItem
 from app.models.order import Order, OrderItem, OrderStatus
+from app.models.number_sequence import NumberSequence
 
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "OrderStatus",
     "Order",
     "OrderItem",
+    "NumberSequence",
 ]
\ No newline at end of file
@@ -1,18 +1,22 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, null
 from app.database import Base
 
 
 class Inventory(Base):
     __tablename__ = "inventory"
+    __table_args__ = (
+        # одна строка остатка на товар на складе; заодно индекс для поиска (warehouse_id, product_id)
+        Index("uq_inventory_warehouse_product", "warehouse_id", "product_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     warehouse_id = Column(Integer, ForeignKey('warehouses.id', ondelete="CASCADE"), nullable=False)
     product_id = Column(Integer, ForeignKey('products.id', ondelete="CASCADE"), nullable=False)
     quantity = Column(Integer, default=0, nullable=False)
     # created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=null(), onupdate=func.now())
 
     warehouse = relationship("Warehouse", back_populates="inventory_items")
     product = relationship("Product", back_populates="inventory_items")
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class NumberSequence(Base):
+    """Счётчик номеров документов: последний выданный номер на (префикс, год)"""
+    __tablename__ = "number_sequences"
+
+    prefix = Column(String, primary_key=True)  # ORD, SUP
+    year = Column(Integer, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
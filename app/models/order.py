@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index
+from sqlalchemy.orm import relationship, synonym
+from sqlalchemy.sql import func, null
 from app.database import Base
 
 
@@ -9,6 +9,8 @@ class OrderStatus(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)
+    # код статуса (new, shipping, cancelled, ...) хранится в name
+    code = synonym("name")
 
     orders = relationship("Order", back_populates="status")
 
@@ -29,7 +31,7 @@ class Order(Base):
     # shipping_address = Column(String)
     notes = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=null(), onupdate=func.now())
     shipped_at = Column(DateTime(timezone=True))
     # delivered_at = Column(DateTime(timezone=True))
 
@@ -37,6 +39,23 @@ class Order(Base):
     status = relationship("OrderStatus", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_orders_created_at", "created_at"),  # список всех заказов (админ) и фильтр по датам
+        Index("ix_orders_warehouse_id_created_at", "warehouse_id", "created_at"),
+        Index("ix_orders_status_id_created_at", "status_id", "created_at"),
+        # новые заказы склада (GET /orders/new, фильтр status_code у сотрудника)
+        Index("ix_orders_warehouse_id_status_id_created_at", "warehouse_id", "status_id", "created_at"),
+        Index(
+            "ix_orders_shipped_at", "shipped_at",
+            sqlite_where=shipped_at.isnot(None), postgresql_where=shipped_at.isnot(None),
+        ),
+        # частичный: неотгруженные заказы склада (очередь на сборку)
+        Index(
+            "ix_orders_unshipped_warehouse_id_created_at", "warehouse_id", "created_at",
+            sqlite_where=shipped_at.is_(None), postgresql_where=shipped_at.is_(None),
+        ),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -49,3 +68,7 @@ class OrderItem(Base):
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
+
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+    )
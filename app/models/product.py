@@ -1,6 +1,6 @@
-from sqlalchemy import Boolean, Column, Float, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, Column, Float, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, null
 from app.database import Base
 
 
@@ -15,9 +15,17 @@ class Product(Base):
     is_active = Column(Boolean, default=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=null(), onupdate=func.now())
 
     inventory_items = relationship("Inventory", back_populates="product")
     supply_items = relationship("SupplyItem", back_populates="product")
     order_items = relationship("OrderItem", back_populates="product")
 
+    __table_args__ = (
+        # частичный: только активные товары (каталог для сотрудников)
+        Index(
+            "ix_products_active_name", "name",
+            sqlite_where=is_active == True, postgresql_where=is_active == True,
+        ),
+    )
+
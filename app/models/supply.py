@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -16,6 +16,10 @@ class Supply(Base):
     warehouse = relationship("Warehouse", back_populates="supplies")
     items = relationship("SupplyItem", back_populates="supply", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_supplies_warehouse_id_created_at", "warehouse_id", "created_at"),
+    )
+
 
 class SupplyItem(Base):
     __tablename__ = "supply_items"
@@ -28,3 +32,8 @@ class SupplyItem(Base):
 
     supply = relationship("Supply", back_populates="items")
     product = relationship("Product", back_populates="supply_items")
+
+    __table_args__ = (
+        Index("ix_supply_items_supply_id", "supply_id"),
+        Index("ix_supply_items_product_id", "product_id"),
+    )
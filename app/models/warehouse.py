@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, null
 from app.database import Base
 
 
@@ -14,7 +14,7 @@ class Warehouse(Base):
     is_active = Column(Boolean, default=True)
     description = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=null(), onupdate=func.now())
 
     users = relationship("User", back_populates="warehouse")
     supplies = relationship("Supply", back_populates="warehouse")
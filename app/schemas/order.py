@@ -111,16 +111,17 @@ class OrderResponse(OrderInDB):
 
 
 class OrderList(BaseModel):
-    total: int
-    page: int
+    total: Optional[int] = None  # None при include_total=false
+    page: Optional[int] = None  # None в режиме курсора (after=)
     pages: Optional[int] = None
     per_page: int
+    next_cursor: Optional[str] = None  # передать как after= для следующей страницы, None = конец списка
     orders: List[OrderResponse]
 
 
 # ----- Фильтры для пагинации -----
 class OrderFilterParams(BaseModel):
-    search: Optional[str] = None  # поиск по external_order_id, customer_name, shipping_address
+    search: Optional[str] = None  # поиск по подстроке в order_number, external_order_id, address
     status_code: Optional[str] = None
     warehouse_id: Optional[int] = None
     date_from: Optional[date] = None
@@ -23,6 +23,10 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class ProductBatchUpdate(ProductUpdate):
+    id: int
+
+
 class ProductInDB(ProductBase):
     id: int
     created_at: datetime
@@ -36,10 +40,16 @@ class ProductResponse(ProductInDB):
 
 
 class ProductList(BaseModel):
-    total: int
+    total: Optional[int] = None  # None при include_total=false
     products: List[ProductResponse]
 
 
+class ProductAutocompleteItem(BaseModel):
+    id: int
+    sku: str
+    name: str
+
+
 class InventoryBase(BaseModel):
     warehouse_id: int
     product_id: int
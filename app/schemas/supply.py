@@ -63,10 +63,11 @@ class SupplyResponse(SupplyInDB):
 
 
 class SupplyList(BaseModel):
-    total: int
-    page: int
+    total: Optional[int] = None  # None при include_total=false
+    page: Optional[int] = None  # None в режиме курсора (after=)
     pages: Optional[int] = None
     per_page: int
+    next_cursor: Optional[str] = None  # передать как after= для следующей страницы, None = конец списка
     supplies: List[SupplyResponse]
 
 
@@ -40,5 +40,5 @@ class WarehouseResponse(WarehouseInDB):
 
 
 class WarehouseList(BaseModel):
-    total: int
+    total: Optional[int] = None  # None при include_total=false
     warehouses: List[WarehouseResponse]
@@ -0,0 +1,68 @@
+"""hot path indexes
+
+Составные индексы под фильтры и сортировки списков, уникальность остатка
+(warehouse_id, product_id) и частичные индексы (активные товары, неотгруженные заказы;
+индекс по shipped_at только по отгруженным, иначе планировщик берёт его для shipped_at IS NULL).
+На PostgreSQL индексы строятся CONCURRENTLY, без блокировки записи.
+
+Проверка плана до / после: scripts/bench_indexes.py
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# (имя, таблица, колонки, unique, WHERE для частичного индекса)
+INDEXES = [
+    ("uq_inventory_warehouse_product", "inventory", ["warehouse_id", "product_id"], True, None),
+    ("ix_orders_warehouse_id_created_at", "orders", ["warehouse_id", "created_at"], False, None),
+    ("ix_orders_status_id_created_at", "orders", ["status_id", "created_at"], False, None),
+    ("ix_orders_shipped_at", "orders", ["shipped_at"], False, sa.column("shipped_at").isnot(None)),
+    ("ix_orders_unshipped_warehouse_id_created_at", "orders", ["warehouse_id", "created_at"], False,
+     sa.column("shipped_at").is_(None)),
+    ("ix_supplies_warehouse_id_created_at", "supplies", ["warehouse_id", "created_at"], False, None),
+    ("ix_supply_items_product_id", "supply_items", ["product_id"], False, None),
+    ("ix_products_active_name", "products", ["name"], False, sa.column("is_active") == sa.true()),
+]
+
+
+def _check_inventory_duplicates() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT warehouse_id, product_id, COUNT(*) FROM inventory "
+        "GROUP BY warehouse_id, product_id HAVING COUNT(*) > 1 LIMIT 10"
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(
+            "inventory has several rows for the same (warehouse_id, product_id), "
+            f"merge them before upgrading: {[tuple(row) for row in duplicates]}"
+        )
+
+
+def upgrade() -> None:
+    _check_inventory_duplicates()
+
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    for name, table, columns, unique, where in INDEXES:
+        kwargs = {}
+        if where is not None:
+            kwargs["sqlite_where"] = where
+            kwargs["postgresql_where"] = where
+        if concurrently:
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, **kwargs)
+        else:
+            op.create_index(name, table, columns, unique=unique, **kwargs)
+
+
+def downgrade() -> None:
+    for name, table, _, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,44 @@
+"""list query indexes
+
+Фильтр date_from / date_to теперь сравнивает created_at с границами диапазона (без func.date):
+- orders (created_at) - список всех заказов у админа (диапазон дат без склада + сортировка),
+  для списков склада хватает (warehouse_id, created_at) из 0002;
+- order_items (order_id), supply_items (supply_id) - позиции к странице заказов / поставок
+  без полного прохода по таблице позиций.
+
+Проверка: scripts/check_query_plans.py
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_orders_created_at", "orders", ["created_at"]),
+    ("ix_order_items_order_id", "order_items", ["order_id"]),
+    ("ix_supply_items_supply_id", "supply_items", ["supply_id"]),
+]
+
+
+def upgrade() -> None:
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    for name, table, columns in INDEXES:
+        if concurrently:
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        else:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,54 @@
+"""number sequences
+
+Счётчик номеров документов (prefix, year) -> last_value вместо COUNT(*) по году на каждую вставку.
+Начальные значения - максимальные существующие номера ORD-YYYY-NNNNN / SUP-YYYY-NNNNN.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+NUMBER = re.compile(r"^([A-Z]+)-(\d{4})-(\d+)$")
+
+
+def _existing_maximums():
+    maximums = {}
+    bind = op.get_bind()
+    for table, column in (("orders", "order_number"), ("supplies", "supply_number")):
+        for (value,) in bind.execute(sa.text(f"SELECT {column} FROM {table}")):
+            match = NUMBER.match(value or "")
+            if match:
+                key = (match.group(1), int(match.group(2)))
+                maximums[key] = max(maximums.get(key, 0), int(match.group(3)))
+    return maximums
+
+
+def upgrade() -> None:
+    sequences = op.create_table(
+        'number_sequences',
+        sa.Column('prefix', sa.String(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('prefix', 'year'),
+    )
+    rows = [
+        {"prefix": prefix, "year": year, "last_value": last_value}
+        for (prefix, year), last_value in _existing_maximums().items()
+    ]
+    if rows:
+        op.bulk_insert(sequences, rows)
+
+
+def downgrade() -> None:
+    op.drop_table('number_sequences')
@@ -0,0 +1,85 @@
+"""product search
+
+Полнотекстовый индекс товаров (name, sku, description) вместо ilike('%term%') по всей таблице:
+- SQLite: FTS5 таблица products_fts с внешним содержимым (content='products'), префиксные
+  индексы 2-4 символа, синхронизация триггерами на INSERT / UPDATE / DELETE;
+- PostgreSQL: генерируемая колонка products.search_vector (tsvector, конфигурация 'simple':
+  name и sku - вес A, description - вес B) и GIN индекс по ней.
+
+Поиск: CRUDProduct._search (app/crud/product.py). Замер: scripts/bench_product_search.py
+
+Триггеры SQLite живут на таблице products: миграция, пересоздающая products (batch_alter_table),
+должна создать их заново.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE products_fts USING fts5("
+    "name, sku, description, content='products', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+    "CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts (rowid, name, sku, description) "
+    "VALUES (new.id, new.name, new.sku, new.description); END",
+    "CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, sku, description) "
+    "VALUES ('delete', old.id, old.name, old.sku, old.description); END",
+    "CREATE TRIGGER products_fts_au AFTER UPDATE OF name, sku, description ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, sku, description) "
+    "VALUES ('delete', old.id, old.name, old.sku, old.description); "
+    "INSERT INTO products_fts (rowid, name, sku, description) "
+    "VALUES (new.id, new.name, new.sku, new.description); END",
+    # существующие товары
+    "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS products_fts_au",
+    "DROP TRIGGER IF EXISTS products_fts_ad",
+    "DROP TRIGGER IF EXISTS products_fts_ai",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+POSTGRESQL_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        op.execute(
+            f"ALTER TABLE products ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({POSTGRESQL_SEARCH_VECTOR}) STORED"
+        )
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_products_search_vector", "products", ["search_vector"],
+                postgresql_using="gin", postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        op.drop_index("ix_products_search_vector", table_name="products")
+        op.drop_column("products", "search_vector")
@@ -0,0 +1,83 @@
+"""order search
+
+Поиск заказов по подстроке (order_number, external_order_id, address) без полного прохода
+по orders - ilike('%term%') не использует B-tree индексы:
+- SQLite: FTS5 таблица orders_search с внешним содержимым (content='orders') и токенайзером
+  trigram (поиск подстроки от 3 символов), синхронизация триггерами на INSERT / UPDATE / DELETE -
+  любой путь записи (API, внешняя синхронизация, SQL) обновляет индекс;
+- PostgreSQL: pg_trgm и GIN индексы gin_trgm_ops по каждой колонке, ilike в CRUD не меняется.
+
+customer_name / shipping_address из схемы API в таблице orders нет, адрес доставки - address.
+
+Поиск: CRUDOrder.get_multi_filtered. Замер: scripts/bench_order_search.py
+
+Триггеры SQLite живут на таблице orders: миграция, пересоздающая orders (batch_alter_table),
+должна создать их заново.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ["order_number", "external_order_id", "address"]
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE orders_search USING fts5("
+    "order_number, external_order_id, address, content='orders', content_rowid='id', "
+    "tokenize='trigram')",
+    "CREATE TRIGGER orders_search_ai AFTER INSERT ON orders BEGIN "
+    "INSERT INTO orders_search (rowid, order_number, external_order_id, address) "
+    "VALUES (new.id, new.order_number, new.external_order_id, new.address); END",
+    "CREATE TRIGGER orders_search_ad AFTER DELETE ON orders BEGIN "
+    "INSERT INTO orders_search (orders_search, rowid, order_number, external_order_id, address) "
+    "VALUES ('delete', old.id, old.order_number, old.external_order_id, old.address); END",
+    "CREATE TRIGGER orders_search_au AFTER UPDATE OF order_number, external_order_id, address ON orders BEGIN "
+    "INSERT INTO orders_search (orders_search, rowid, order_number, external_order_id, address) "
+    "VALUES ('delete', old.id, old.order_number, old.external_order_id, old.address); "
+    "INSERT INTO orders_search (rowid, order_number, external_order_id, address) "
+    "VALUES (new.id, new.order_number, new.external_order_id, new.address); END",
+    # существующие заказы
+    "INSERT INTO orders_search (orders_search) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS orders_search_au",
+    "DROP TRIGGER IF EXISTS orders_search_ad",
+    "DROP TRIGGER IF EXISTS orders_search_ai",
+    "DROP TABLE IF EXISTS orders_search",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            for column in COLUMNS:
+                op.create_index(
+                    f"ix_orders_{column}_trgm", "orders", [column],
+                    postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+                    postgresql_concurrently=True,
+                )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        for column in reversed(COLUMNS):
+            op.drop_index(f"ix_orders_{column}_trgm", table_name="orders")
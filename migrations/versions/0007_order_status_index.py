@@ -0,0 +1,49 @@
+"""order status index
+
+Новые заказы склада (GET /orders/new, фильтр status_code): после реестра статусов
+(app/crud/order_status_registry.py) фильтр сравнивает orders.status_id без JOIN order_statuses,
+индекс (warehouse_id, status_id, created_at) отдаёт страницу одним проходом по диапазону индекса
+в порядке сортировки. Отдельная колонка с кодом статуса не нужна: status_id - компактный код
+статуса на самой строке заказа, update_status / sync_from_external уже его обновляют.
+
+Заказы без статуса (status_id IS NULL) не попадают ни в один фильтр по статусу - проставляем 'new'.
+
+Проверка: scripts/check_query_plans.py, scripts/bench_indexes.py
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_orders_warehouse_id_status_id_created_at", "orders", ["warehouse_id", "status_id", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE orders SET status_id = (SELECT id FROM order_statuses WHERE name = 'new') "
+        "WHERE status_id IS NULL"
+    )
+
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    for name, table, columns in INDEXES:
+        if concurrently:
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        else:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,125 @@
+"""
+Задержка подсказок товаров из памяти (app/crud/product_autocomplete.py) на большом каталоге.
+
+Создаёт временную SQLite базу на миграциях (upgrade head), заливает каталог
+(scripts/bench_product_search.py, по умолчанию 1M SKU), загружает индекс и замеряет:
+время и память загрузки, p50 / p99 / max поиска по случайным префиксам SKU и названий,
+обновление индекса на create / update / remove через CRUDProduct.
+
+    python scripts/bench_autocomplete.py
+    python scripts/bench_autocomplete.py --products 100000 --queries 50000
+
+Код возврата 1, если p99 поиска больше 1 мс или индекс разошёлся с БД.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import bench_product_search  # noqa: E402  выставляет временную SQLite базу в окружении
+
+from alembic import command
+from sqlalchemy import text
+
+from app.crud.product import product
+from app.crud.product_autocomplete import product_autocomplete
+from app.database import engine, SessionLocal
+from app.schemas.product import ProductCreate, ProductUpdate
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def measure_search(args) -> bool:
+    rnd = random.Random(7)
+    with engine.connect() as conn:
+        samples = conn.execute(text(
+            "SELECT sku, name FROM products WHERE is_active = 1 ORDER BY random() LIMIT 1000"
+        )).all()
+    prefixes = []
+    for _ in range(args.queries):
+        sku, name = rnd.choice(samples)
+        value = sku if rnd.random() < 0.7 else name
+        prefixes.append(value[:rnd.randint(1, min(len(value), 10))])
+
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        product_autocomplete.search(prefix, args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    p99 = percentile(timings, 0.99)
+    print(f"search x{len(prefixes)} (limit={args.limit}): p50={percentile(timings, 0.5):.4f} ms "
+          f"p99={p99:.4f} ms max={max(timings):.4f} ms")
+    return p99 < 1.0
+
+
+def check_writes() -> bool:
+    """create / update / deactivate / remove через CRUDProduct сразу видны в подсказках"""
+    def skus(prefix: str):
+        return [sku for _, sku, _ in product_autocomplete.search(prefix, 10)]
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        created = product.create(db, obj_in=ProductCreate(name="Zz-подсказка", sku="ZZ-AUTO-1", cost_price=1.0))
+        create_ms = (time.perf_counter() - started) * 1000
+        after_create = skus("zz-auto") == ["ZZ-AUTO-1"]
+
+        product.update(db, db_obj=created, obj_in=ProductUpdate(sku="ZZ-AUTO-2"))
+        after_update = skus("zz-auto") == ["ZZ-AUTO-2"] and skus("zz-подск") == ["ZZ-AUTO-2"]
+
+        product.update(db, db_obj=created, obj_in=ProductUpdate(is_active=False))
+        after_deactivate = skus("zz-auto") == []
+
+        product.update(db, db_obj=created, obj_in=ProductUpdate(is_active=True))
+        product.remove(db, row_id=created.id)
+        after_remove = skus("zz-auto") == []
+    finally:
+        db.close()
+
+    reloaded = product_autocomplete.load()
+    with engine.connect() as conn:
+        active = conn.execute(text("SELECT count(*) FROM products WHERE is_active = 1")).scalar()
+
+    ok = after_create and after_update and after_deactivate and after_remove and reloaded == active
+    print(f"{'OK  ' if ok else 'FAIL'} writes: create={after_create} ({create_ms:.2f} ms with commit) "
+          f"update={after_update} deactivate={after_deactivate} remove={after_remove} reload={reloaded}/{active}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    command.upgrade(bench_product_search.alembic_config(), "head")
+    print(f"filling {engine.url} with {args.products} products ...")
+    bench_product_search.fill(args)
+
+    started = time.perf_counter()
+    loaded = product_autocomplete.load()
+    print(f"load: {loaded} active products in {time.perf_counter() - started:.2f} s")
+
+    tracemalloc.start()
+    product_autocomplete.load()
+    memory_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    print(f"index memory: ~{memory_mb:.0f} MB")
+
+    ok = measure_search(args)
+    ok = check_writes() and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+HTTP нагрузочный тест для запущенного сервера (без внешних зависимостей).
+
+Сравнение sync / async режима БД:
+    DB_ASYNC_MODE=false uvicorn app.main:app --workers 1
+    python scripts/bench_http.py --url http://127.0.0.1:8000/api/v1/orders/warehouse/my \
+        --token <JWT> --concurrency 500 --requests 20000
+
+    DB_ASYNC_MODE=true uvicorn app.main:app --workers 1
+    python scripts/bench_http.py ... (те же параметры)
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status_code = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status_code
+
+
+async def worker(url, headers, counter, latencies, statuses, resets):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        + "".join(f"{h}\r\n" for h in headers)
+        + "Connection: keep-alive\r\n\r\n"
+    ).encode()
+
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            started = time.perf_counter()
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_code = await read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # сервер закрыл соединение (после ответа 500) - переподключаемся и повторяем запрос
+                resets[0] += 1
+                counter[0] += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(url, headers, concurrency, total):
+    counter = [total]
+    latencies, statuses, resets = [], {}, [0]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(url, headers, counter, latencies, statuses, resets) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(f"requests:    {len(latencies)} ({concurrency} connections)")
+    print(f"statuses:    {statuses} (reconnects: {resets[0]})")
+    print(f"rps:         {len(latencies) / elapsed:.1f}")
+    print(f"latency ms:  mean={statistics.mean(latencies) * 1000:.1f} "
+          f"p50={ms(0.50):.1f} p95={ms(0.95):.1f} p99={ms(0.99):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--token", help="JWT access token (Authorization: Bearer)")
+    parser.add_argument("--header", action="append", default=[], help="Доп. заголовок 'Name: value'")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+
+    headers = list(args.header)
+    if args.token:
+        headers.append(f"Authorization: Bearer {args.token}")
+
+    asyncio.run(run(args.url, headers, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+План и время горячих запросов до и после миграции индексов (0002_hot_path_indexes).
+
+Создаёт временную базу на ревизии 0001 (baseline), заливает большой набор данных,
+снимает EXPLAIN (QUERY PLAN) и время каждого запроса, затем делает upgrade head + ANALYZE
+и повторяет замер.
+
+    python scripts/bench_indexes.py
+    python scripts/bench_indexes.py --orders 1000000 --repeat 50
+
+Код возврата 1, если после миграции какой-то запрос всё ещё читает таблицу целиком.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "indexes.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+from app.database import engine
+
+
+# (название, SQL) - те же предикаты и сортировки, что в CRUD
+QUERIES = [
+    ("inventory by warehouse+product",
+     "SELECT * FROM inventory WHERE warehouse_id = :warehouse_id AND product_id = :product_id"),
+    ("orders of warehouse, newest first",
+     "SELECT * FROM orders WHERE warehouse_id = :warehouse_id ORDER BY created_at DESC LIMIT 20"),
+    ("orders by status, newest first",
+     "SELECT * FROM orders WHERE status_id = :status_id ORDER BY created_at DESC LIMIT 20"),
+    ("new orders of warehouse",
+     "SELECT * FROM orders WHERE warehouse_id = :warehouse_id AND status_id = :status_id "
+     "ORDER BY created_at DESC, id DESC LIMIT 20"),
+    ("orders shipped in a day",
+     "SELECT * FROM orders WHERE shipped_at >= :day AND shipped_at < :next_day"),
+    ("unshipped orders of warehouse",
+     "SELECT * FROM orders WHERE warehouse_id = :warehouse_id AND shipped_at IS NULL "
+     "ORDER BY created_at DESC LIMIT 20"),
+    ("supplies of warehouse, newest first",
+     "SELECT * FROM supplies WHERE warehouse_id = :warehouse_id ORDER BY created_at DESC LIMIT 20"),
+    ("supply items of product",
+     "SELECT * FROM supply_items WHERE product_id = :product_id"),
+    ("active products by name",
+     "SELECT * FROM products WHERE is_active = 1 ORDER BY name LIMIT 50"),
+]
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def fill(args) -> None:
+    rnd = random.Random(42)
+    start = datetime(2024, 1, 1)
+
+    def ts(i: int, total: int) -> str:
+        return (start + timedelta(seconds=i * 60 * 60 * 24 * 365 // total)).isoformat(sep=" ")
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO order_statuses (id, name) VALUES (1, 'new'), (2, 'shipping')"))
+        conn.execute(text("INSERT INTO warehouses (id, name, state) VALUES (:id, :name, 'bench')"),
+                     [{"id": w, "name": f"W{w}"} for w in range(1, args.warehouses + 1)])
+        conn.execute(text(
+            "INSERT INTO products (id, name, sku, cost_price, is_active) VALUES (:id, :name, :sku, 1.0, :active)"
+        ), [{"id": p, "name": f"Product {rnd.randrange(10 ** 6):06d}", "sku": f"SKU-{p}",
+             "active": rnd.random() < 0.3} for p in range(1, args.products + 1)])
+        conn.execute(text(
+            "INSERT INTO inventory (warehouse_id, product_id, quantity) VALUES (:w, :p, :q)"
+        ), [{"w": w, "p": p, "q": rnd.randrange(100)}
+            for w in range(1, args.warehouses + 1) for p in range(1, args.products + 1, 4)])
+        conn.execute(text(
+            "INSERT INTO orders (order_number, warehouse_id, status_id, postal_code, country, city, address, "
+            "created_at, shipped_at) VALUES (:n, :w, :s, '0', 'RU', 'City', 'Street', :created, :shipped)"
+        ), [{"n": f"ORD-{i}", "w": rnd.randrange(1, args.warehouses + 1), "s": 2 if i % 20 else 1,
+             "created": ts(i, args.orders), "shipped": ts(i, args.orders) if i % 20 else None}
+            for i in range(args.orders)])
+        supplies = args.orders // 5
+        conn.execute(text(
+            "INSERT INTO supplies (id, supply_number, warehouse_id, created_at) VALUES (:id, :n, :w, :created)"
+        ), [{"id": i + 1, "n": f"SUP-{i}", "w": rnd.randrange(1, args.warehouses + 1),
+             "created": ts(i, supplies)} for i in range(supplies)])
+        conn.execute(text(
+            "INSERT INTO supply_items (supply_id, product_id, quantity) VALUES (:s, :p, 5)"
+        ), [{"s": i // 3 + 1, "p": rnd.randrange(1, args.products + 1)} for i in range(supplies * 3)])
+
+
+def measure(label: str, args) -> bool:
+    """Печатает план и время каждого запроса; False, если есть полный проход по таблице"""
+    params = {
+        "warehouse_id": args.warehouses // 2, "product_id": 1 + 4 * (args.products // 8),
+        "status_id": 1, "day": "2024-06-01", "next_day": "2024-06-02",
+    }
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    all_indexed = True
+
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        for name, sql in QUERIES:
+            plan = [str(row[-1]) for row in conn.execute(text(explain + sql), params)]
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                conn.execute(text(sql), params).fetchall()
+            elapsed_ms = (time.perf_counter() - started) / args.repeat * 1000
+
+            full_scan = any(
+                (line.startswith("SCAN") and "USING" not in line) or "Seq Scan" in line for line in plan
+            )
+            all_indexed = all_indexed and not full_scan
+            print(f"{name:38} {elapsed_ms:9.3f} ms  {' | '.join(plan)}")
+    return all_indexed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--warehouses", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    config = alembic_config()
+    command.upgrade(config, "0001")
+    print(f"filling {engine.url} ...")
+    fill(args)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    measure("baseline (0001)", args)
+
+    command.upgrade(config, "head")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    ok = measure("hot path indexes (head)", args)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Поиск заказов по подстроке до и после trigram индекса (0006_order_search).
+
+Создаёт временную SQLite базу на ревизии 0005, заливает заказы (по умолчанию 10M),
+замеряет order.get_multi_filtered(search=...) с ilike('%term%'), затем делает upgrade head
+(построение FTS5 trigram индекса по существующим заказам) и повторяет замер.
+cold - первый поиск (частоты триграмм не в кэше, app/core/trigram.py), page+total и page only -
+повторные поиски с total и без (total_mode=none).
+В конце проверяет синхронизацию индекса с таблицей после INSERT / UPDATE / DELETE.
+
+    python scripts/bench_order_search.py
+    python scripts/bench_order_search.py --orders 1000000 --repeat 20
+
+Код возврата 1, если после миграции поиск читает orders целиком или индекс разошёлся с таблицей.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "order_search.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+os.environ["TOTALS_CACHE_TTL"] = "0"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, text
+
+from app.config import settings
+from app.core import trigram
+from app.core.totals import TotalMode
+from app.crud.order import order
+from app.database import engine, SessionLocal
+from app.schemas.order import OrderFilterParams
+
+
+STREETS = ["Ленина", "Лесная", "Садовая", "Советская", "Молодёжная", "Центральная", "Школьная",
+           "Main St", "Oak Ave", "Park Rd", "Mira", "Gagarina", "Pushkina", "Naberezhnaya"]
+
+# (название, строка поиска)
+SEARCHES = [
+    ("order number", "2024-0424242"),
+    ("external id", "EXT-4242424"),
+    ("address", "Лесная, д. 173, кв. 42"),
+    ("short address", "Gagarina, д. 17,"),
+    ("no matches", "отсутствует"),
+]
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def fill(args, chunk: int = 100000) -> None:
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO order_statuses (id, name) VALUES (1, 'new')"))
+        conn.execute(text("INSERT INTO warehouses (id, name, state) VALUES (:id, :name, 'bench')"),
+                     [{"id": w, "name": f"W{w}"} for w in range(1, args.warehouses + 1)])
+    for start in range(0, args.orders, chunk):
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO orders (order_number, external_order_id, warehouse_id, status_id, postal_code, "
+                "country, city, address) VALUES (:n, :e, :w, 1, '0', 'RU', 'City', :a)"
+            ), [{
+                "n": f"ORD-2024-{i:07d}", "e": f"EXT-{rnd.randrange(10 ** 7):07d}",
+                "w": rnd.randrange(1, args.warehouses + 1),
+                "a": f"ул. {rnd.choice(STREETS)}, д. {rnd.randrange(1, 300)}, кв. {rnd.randrange(1, 200)}",
+            } for i in range(start, min(start + chunk, args.orders))])
+
+
+@contextmanager
+def capture_selects():
+    statements: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def search_page(db, search: str, total_mode: TotalMode):
+    return order.get_multi_filtered(
+        db, is_superuser=True, limit=20, filters=OrderFilterParams(search=search), total_mode=total_mode
+    )
+
+
+def measure(label: str, args) -> bool:
+    """Время страницы с total и без; False, если какой-то запрос читает orders целиком"""
+    indexed = True
+    print(f"\n=== {label} ===")
+    print(f"{'':16} {'search':26} {'total':>8} {'cold':>12} {'page+total':>12} {'page only':>12}")
+    db = SessionLocal()
+    try:
+        for name, search in SEARCHES:
+            trigram.clear()
+            started = time.perf_counter()
+            with capture_selects() as statements:
+                page = search_page(db, search, TotalMode.EXACT)
+            cold_ms = (time.perf_counter() - started) * 1000
+            with engine.connect() as conn:
+                plan = [str(row[-1]) for statement, parameters in statements
+                        for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+            timings = []
+            for total_mode in (TotalMode.EXACT, TotalMode.NONE):
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    search_page(db, search, total_mode)
+                timings.append((time.perf_counter() - started) / args.repeat * 1000)
+
+            full_scan = any(line.split()[:2] == ["SCAN", "orders"] for line in plan)
+            if args.verbose:
+                print("\n".join("      " + line for line in plan))
+            indexed = indexed and not full_scan
+            print(f"{name:16} {search!r:26} {page.total:>8} {cold_ms:9.3f} ms {timings[0]:9.3f} ms {timings[1]:9.3f} ms"
+                  f"  {'FULL SCAN' if full_scan else 'index'}")
+    finally:
+        db.close()
+    return indexed
+
+
+def check_sync() -> bool:
+    """INSERT / UPDATE / DELETE (любой путь записи) видны в индексе, integrity-check FTS5 проходит"""
+    def found(search: str) -> List[str]:
+        db = SessionLocal()
+        try:
+            return [o.order_number for o in search_page(db, search, TotalMode.NONE).items]
+        finally:
+            db.close()
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO orders (order_number, external_order_id, warehouse_id, status_id, postal_code, "
+            "country, city, address) VALUES ('ORD-SYNC-1', 'EXT-SYNC-CHECK', 1, 1, '0', 'RU', 'City', 'Фонтанка 1')"
+        ))
+    inserted = found("sync-check") == ["ORD-SYNC-1"]
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE orders SET address = 'Мойка 12' WHERE order_number = 'ORD-SYNC-1'"))
+    updated = not found("Фонтанка") and found("Мойка 1") == ["ORD-SYNC-1"]
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM orders WHERE order_number = 'ORD-SYNC-1'"))
+        conn.execute(text("INSERT INTO orders_search (orders_search) VALUES ('integrity-check')"))
+    deleted = not found("sync-check")
+
+    ok = inserted and updated and deleted
+    print(f"\n{'OK  ' if ok else 'FAIL'} index sync: insert={inserted} update={updated} delete={deleted}, "
+          f"integrity-check passed")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10000000)
+    parser.add_argument("--warehouses", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = alembic_config()
+    command.upgrade(config, "0005")
+    print(f"filling {engine.url} with {args.orders} orders ...")
+    fill(args)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    settings.ORDER_SEARCH_FTS = False
+    measure("ilike (0005)", args)
+
+    started = time.perf_counter()
+    command.upgrade(config, "head")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"\nupgrade head (trigram index rebuild): {time.perf_counter() - started:.1f} s")
+    settings.ORDER_SEARCH_FTS = True
+    ok = measure("trigram index (head)", args)
+
+    ok = check_sync() and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Страница + total: отдельный COUNT против total в том же запросе (TOTALS_PAGE_COUNT):
+скалярный подзапрос (SELECT count(*) ...) и COUNT(*) OVER ().
+
+Поднимает базу на миграциях (upgrade head), заливает данные (scripts/bench_indexes.py) и гоняет
+настоящие CRUD-методы списков в каждом режиме при выключенном кэше total.
+Проверяет, что total и страница во всех режимах совпадают, а у списков с count - что total
+равен числу строк (SELECT count(*) по таблице).
+
+    python scripts/bench_page_count.py
+    python scripts/bench_page_count.py --orders 1000000 --repeat 50
+    DB_TYPE=postgresql POSTGRES_DB=bench ... python scripts/bench_page_count.py   # пустая база
+
+Код возврата 1, если результаты режимов различаются или total не равен числу строк.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+from typing import Callable, List, NamedTuple, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import bench_indexes  # noqa: E402  выставляет временную SQLite базу в окружении
+
+from alembic import command
+from sqlalchemy import event, text
+
+from app.config import settings, PageCountMode
+from app.database import engine, SessionLocal
+from app.crud.inventory import inventory
+from app.crud.order import order
+from app.crud.supply import supply
+from app.schemas.inventory import InventoryFilterParams
+from app.schemas.order import OrderFilterParams
+from app.schemas.supply import SupplyFilterParams
+
+
+class Params(NamedTuple):
+    warehouse_id: int
+    product_id: int  # товар, который чаще всего приходит на склад
+    skip: int
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable
+    count: Optional[str] = None  # SQL: число строк списка, которому должен быть равен total
+
+
+CASES: List[Case] = [
+    Case("all orders (admin), no filters",
+         lambda db, p: order.get_multi_filtered(db, is_superuser=True, skip=p.skip, limit=20),
+         "SELECT count(*) FROM orders"),
+    Case("orders of warehouse, first page",
+         lambda db, p: order.get_multi_filtered(db, warehouse_id=p.warehouse_id, skip=p.skip, limit=20)),
+    Case("orders of warehouse by month",
+         lambda db, p: order.get_multi_filtered(
+             db, warehouse_id=p.warehouse_id, skip=p.skip, limit=20,
+             filters=OrderFilterParams(date_from=date(2024, 6, 1), date_to=date(2024, 6, 30)))),
+    Case("all orders, unshipped (admin)",
+         lambda db, p: order.get_multi_filtered(
+             db, is_superuser=True, skip=p.skip, limit=20, filters=OrderFilterParams(is_shipped=False))),
+    Case("supplies of warehouse, number search",
+         lambda db, p: supply.get_multi_by_warehouse(
+             db, warehouse_id=p.warehouse_id, skip=p.skip, limit=20, filters=SupplyFilterParams(search="SUP-1"))),
+    Case("supplies of warehouse with product",
+         lambda db, p: supply.get_multi_by_warehouse(
+             db, warehouse_id=p.warehouse_id, skip=p.skip, limit=20, filters=SupplyFilterParams(product_id=p.product_id))),
+    Case("inventory of warehouse, name search",
+         lambda db, p: inventory.get_multi_by_warehouse(
+             db, warehouse_id=p.warehouse_id, skip=p.skip, limit=20, filters=InventoryFilterParams(search="Product 1"))),
+]
+
+
+def run_case(case: Case, params: Params, repeat: int):
+    """(мс на вызов, запросов на вызов, total, id строк страницы)"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db = SessionLocal()
+            try:
+                page = case.run(db, params)
+            finally:
+                db.close()
+        elapsed_ms = (time.perf_counter() - started) / repeat * 1000
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return elapsed_ms, len(statements) / repeat, page.total, [row.id for row in page.items]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--warehouses", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    command.upgrade(bench_indexes.alembic_config(), "head")
+    print(f"filling {engine.url} ...")
+    bench_indexes.fill(args)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    settings.TOTALS_CACHE_TTL = 0  # меряем сами запросы, не кэш
+    warehouse_id = args.warehouses // 2
+    with engine.connect() as conn:
+        product_id = conn.execute(text(
+            "SELECT supply_items.product_id FROM supply_items JOIN supplies ON supplies.id = supply_items.supply_id "
+            "WHERE supplies.warehouse_id = :w GROUP BY supply_items.product_id ORDER BY count(*) DESC LIMIT 1"
+        ), {"w": warehouse_id}).scalar()
+    same = True
+
+    modes = list(PageCountMode)
+    print(f"{'':50}" + "".join(f"{mode.value:>20}" for mode in modes))
+    for case in CASES:
+        for skip in (0, 200):
+            results = []
+            for mode in modes:
+                settings.TOTALS_PAGE_COUNT = mode
+                results.append(run_case(case, Params(warehouse_id, product_id, skip), args.repeat))
+            ok = all(result[2:] == results[0][2:] for result in results)
+            if case.count:
+                with engine.connect() as conn:
+                    rows = conn.execute(text(case.count)).scalar()
+                ok = ok and all(result[2] == rows for result in results)
+            same = same and ok
+            print(f"{case.name + f' (skip={skip})':50}"
+                  + "".join(f"{elapsed_ms:9.2f} ms {queries:4.0f} q " for elapsed_ms, queries, _, _ in results)
+                  + f" total={results[0][2]}" + ("" if ok else f" MISMATCH {[result[2] for result in results]}"
+                                                     + (f" rows={rows}" if case.count else "")))
+
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
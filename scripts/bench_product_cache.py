@@ -0,0 +1,229 @@
+"""
+Кэш каталога товаров (app/crud/product_cache.py): задержка списка остатков склада и карточки заказа.
+
+Создаёт временную SQLite базу на миграциях (upgrade head), заливает каталог
+(scripts/bench_product_search.py), остатки одного склада и заказы с позициями, затем замеряет
+p50 / p99 страницы inventory.get_multi_by_warehouse, order.get_with_items и product.get_cached (новая сессия
+на вызов, как у запроса API) в трёх режимах:
+    joinedload - товары тем же запросом через JOIN, product.get - SELECT (как было до кэша);
+    cache off  - PRODUCT_CACHE_SIZE=0: товары вторым запросом WHERE id IN (...);
+    cache on   - товары из кэша (после прогрева), печатаются hits / misses / evictions.
+В списках кэш на прогретом кэше убирает JOIN и разбор колонок товара из строк (число запросов то же),
+product.get_cached (GET /products/{id}) обходится без запроса. --latency-ms добавляет задержку на каждый SQL запрос
+(сетевая БД), чтобы увидеть цену сэкономленного запроса.
+В конце проверяет, что update / смена активности / remove через CRUDProduct сразу видны, а запись
+после изменения товара в обход кэша (другой воркер) идёт по значениям из БД, а не из кэша.
+
+    python scripts/bench_product_cache.py
+    python scripts/bench_product_cache.py --latency-ms 0.5 --repeat 2000
+
+Код возврата 1, если запись через CRUDProduct не сбросила кэш или изменила товар по значениям из кэша.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import bench_product_search  # noqa: E402  выставляет временную SQLite базу в окружении
+
+from alembic import command
+from sqlalchemy import event, text
+from sqlalchemy.orm import joinedload
+
+from app.config import settings
+from app.core.totals import TotalMode
+from app.crud.inventory import inventory
+from app.crud.order import order
+from app.crud.product import product
+from app.crud.product_cache import product_cache
+from app.database import engine, SessionLocal
+from app.models.inventory import Inventory
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.schemas.product import ProductUpdate
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def fill_stock(args, chunk: int = 50000) -> None:
+    """Остатки склада 1 по первым args.inventory товарам, заказы по 1..args.items_per_order позиций из них"""
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO order_statuses (id, name) VALUES (1, 'new')"))
+        conn.execute(text("INSERT INTO warehouses (id, name, state) VALUES (1, 'W1', 'bench')"))
+        conn.execute(text("INSERT INTO inventory (warehouse_id, product_id, quantity) VALUES (1, :p, :q)"),
+                     [{"p": p, "q": rnd.randrange(100)} for p in range(1, args.inventory + 1)])
+        for start in range(1, args.orders + 1, chunk):
+            ids = range(start, min(start + chunk, args.orders + 1))
+            conn.execute(text(
+                "INSERT INTO orders (id, order_number, warehouse_id, status_id, postal_code, country, city, address) "
+                "VALUES (:id, :n, 1, 1, '0', 'RU', 'City', 'ул. Лесная, д. 1')"
+            ), [{"id": i, "n": f"ORD-2024-{i:07d}"} for i in ids])
+            conn.execute(text(
+                "INSERT INTO order_items (order_id, product_id, quantity) VALUES (:o, :p, 1)"
+            ), [{"o": i, "p": p} for i in ids
+                for p in rnd.sample(range(1, args.inventory + 1), rnd.randint(1, args.items_per_order))])
+
+
+def inventory_page_joinedload(db, skip: int, limit: int):
+    """Страница остатков как до кэша: товар JOIN-ом"""
+    return db.query(Inventory).options(joinedload(Inventory.product)).filter(
+        Inventory.warehouse_id == 1
+    ).order_by(Inventory.product_id, Inventory.id).offset(skip).limit(limit).all()
+
+
+def order_joinedload(db, id: int):
+    """Карточка заказа как до кэша"""
+    return db.query(Order).options(
+        joinedload(Order.items).joinedload(OrderItem.product),
+        joinedload(Order.status),
+        joinedload(Order.warehouse)
+    ).filter(Order.id == id).first()
+
+
+def inventory_page(db, skip: int, limit: int):
+    return inventory.get_multi_by_warehouse(db, warehouse_id=1, skip=skip, limit=limit, total_mode=TotalMode.NONE).items
+
+
+def product_select(db, id: int):
+    """product.get как до кэша"""
+    return db.query(Product).filter(Product.id == id).first()
+
+
+def order_detail(db, id: int):
+    return order.get_with_items(db, id=id)
+
+
+def product_get(db, id: int):
+    return product.get_cached(db, [id]).get(id)
+
+
+def measure(label: str, args, page, detail, get) -> None:
+    rnd = random.Random(7)
+    pages = args.inventory // args.limit
+    calls = [
+        ("inventory list", lambda db: page(db, rnd.randrange(pages) * args.limit, args.limit)),
+        ("order detail", lambda db: detail(db, rnd.randrange(1, args.orders + 1))),
+        ("product get", lambda db: get(db, rnd.randrange(1, args.inventory + 1))),
+    ]
+    for name, call in calls:
+        timings = []
+        for _ in range(args.repeat):
+            db = SessionLocal()
+            try:
+                started = time.perf_counter()
+                call(db)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                db.close()
+        print(f"{label:12} {name:16} p50={percentile(timings, 0.5):7.3f} ms p99={percentile(timings, 0.99):7.3f} ms")
+
+
+def check_writes() -> bool:
+    """
+    update / смена активности / remove через CRUDProduct сразу видны во вложенных товарах и product.get_cached;
+    смена активности после UPDATE в обход кэша переключает значение из БД
+    """
+    def detail_names(order_id: int):
+        db = SessionLocal()
+        try:
+            return {item.product_id: item.product.name for item in order.get_with_items(db, id=order_id).items}
+        finally:
+            db.close()
+
+    def cached_get(product_id: int):
+        db = SessionLocal()
+        try:
+            product_obj = product.get_cached(db, [product_id]).get(product_id)
+            return product_obj and (product_obj.name, product_obj.is_active)
+        finally:
+            db.close()
+
+    product_id = next(iter(detail_names(1)))
+    db = SessionLocal()
+    try:
+        product_obj = product.get(db, id=product_id)
+        product.update(db, db_obj=product_obj, obj_in=ProductUpdate(name="Переименован"))
+        product_obj = product.get(db, id=product_id)
+        was_active = product_obj.is_active
+        product.update(db, db_obj=product_obj, obj_in=ProductUpdate(is_active=not was_active))
+    finally:
+        db.close()
+    updated = detail_names(1)[product_id] == "Переименован"
+    toggled = cached_get(product_id) == ("Переименован", not was_active)
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO products (id, name, sku, cost_price) VALUES (0, 'Удаляемый', 'FX-DEL', 1.0)"))
+    cached_get(0)
+    db = SessionLocal()
+    try:
+        product.remove(db, row_id=0)
+    finally:
+        db.close()
+    removed = cached_get(0) is None
+
+    # другой воркер меняет активность, в кэше этого процесса - старое значение (как PATCH /products/{id}/status)
+    active = cached_get(product_id)[1]
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE products SET is_active = :active WHERE id = :id"), {"active": not active, "id": product_id})
+    db = SessionLocal()
+    try:
+        product_obj = product.get(db, id=product_id)
+        product.update(db, db_obj=product_obj, obj_in=ProductUpdate(is_active=not product_obj.is_active))
+    finally:
+        db.close()
+    fresh = cached_get(product_id)[1] == active
+
+    ok = updated and toggled and removed and fresh
+    print(f"{'OK  ' if ok else 'FAIL'} invalidation: update={updated} toggle={toggled} remove={removed} "
+          f"write after external change={fresh}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--inventory", type=int, default=5000, help="позиций на складе")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--items-per-order", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка на SQL запрос")
+    args = parser.parse_args()
+
+    command.upgrade(bench_product_search.alembic_config(), "head")
+    print(f"filling {engine.url} with {args.products} products, {args.inventory} stock rows, {args.orders} orders ...")
+    bench_product_search.fill(args)
+    fill_stock(args)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    if args.latency_ms:
+        event.listen(engine, "before_cursor_execute", lambda *_: time.sleep(args.latency_ms / 1000))
+
+    cache_size = settings.PRODUCT_CACHE_SIZE
+    measure("joinedload", args, inventory_page_joinedload, order_joinedload, product_select)
+    settings.PRODUCT_CACHE_SIZE = 0
+    measure("cache off", args, inventory_page, order_detail, product_get)
+
+    settings.PRODUCT_CACHE_SIZE = cache_size
+    measure("cache warmup", args, inventory_page, order_detail, product_get)
+    before = product_cache.stats()
+    measure("cache on", args, inventory_page, order_detail, product_get)
+    stats = product_cache.stats()
+    print(f"cache on: hits={stats['hits'] - before['hits']} misses={stats['misses'] - before['misses']} "
+          f"evictions={stats['evictions'] - before['evictions']} entries={stats['entries']} "
+          f"(size={settings.PRODUCT_CACHE_SIZE}, ttl={settings.PRODUCT_CACHE_TTL}s)")
+
+    sys.exit(0 if check_writes() else 1)
+
+
+if __name__ == "__main__":
+    main()
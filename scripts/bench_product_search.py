@@ -0,0 +1,179 @@
+"""
+Поиск товаров до и после полнотекстового индекса (0005_product_search) на большом каталоге.
+
+Создаёт временную SQLite базу на ревизии 0004, заливает каталог (по умолчанию 1M SKU),
+замеряет product.get_multi_all(search=...) с ilike('%term%'), затем делает upgrade head
+(построение FTS5 индекса по существующим товарам) и повторяет замер с FTS5 + bm25.
+В конце проверяет синхронизацию индекса с таблицей после create / update / remove.
+
+    python scripts/bench_product_search.py
+    python scripts/bench_product_search.py --products 100000 --repeat 20
+
+Код возврата 1, если после миграции поиск читает products целиком или индекс разошёлся с таблицей.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "search.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+os.environ["TOTALS_CACHE_TTL"] = "0"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, text
+
+from app.config import settings
+from app.core.totals import TotalMode
+from app.crud.product import product
+from app.database import engine, SessionLocal
+from app.schemas.product import ProductCreate, ProductUpdate
+
+
+NOUNS = ["Болт", "Гайка", "Шайба", "Винт", "Шуруп", "Саморез", "Дюбель", "Анкер", "Заклёпка", "Хомут",
+         "Кронштейн", "Петля", "Уголок", "Скоба", "Гвоздь", "Шпилька", "Bolt", "Nut", "Washer", "Screw"]
+MATERIALS = ["оцинкованный", "нержавеющий", "латунный", "стальной", "чёрный", "zinc", "stainless", "brass"]
+STANDARDS = ["DIN 933", "DIN 934", "DIN 125", "ГОСТ 7798", "ГОСТ 5915", "ISO 4017", "ISO 7089"]
+SIZES = [f"M{d}x{length}" for d in (3, 4, 5, 6, 8, 10, 12, 16, 20, 24) for length in (10, 20, 30, 50, 80)]
+
+# (название, строка поиска)
+SEARCHES = [
+    ("exact sku", "FX-0424242"),
+    ("word in name", "шпилька"),
+    ("two words", "анкер латунный"),
+    ("prefix of word", "заклё"),
+    ("size + standard", "M8x20 DIN 933"),
+    ("word in description", "партия 4242"),
+    ("no matches", "отсутствует"),
+]
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def fill(args, chunk: int = 50000) -> None:
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(1, args.products + 1, chunk):
+            conn.execute(text(
+                "INSERT INTO products (id, name, sku, description, cost_price, is_active) "
+                "VALUES (:id, :name, :sku, :description, 1.0, :active)"
+            ), [{
+                "id": p,
+                "name": f"{rnd.choice(NOUNS)} {rnd.choice(SIZES)} {rnd.choice(MATERIALS)}",
+                "sku": f"FX-{p:07d}",
+                "description": f"{rnd.choice(STANDARDS)}, партия {rnd.randrange(10000)}",
+                "active": rnd.random() < 0.7,
+            } for p in range(start, min(start + chunk, args.products + 1))])
+
+
+@contextmanager
+def capture_selects():
+    statements: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def measure(label: str, args) -> bool:
+    """Время поиска (страница + total); False, если какой-то запрос читает products целиком"""
+    indexed = True
+    print(f"\n=== {label} ===")
+    db = SessionLocal()
+    try:
+        for name, search in SEARCHES:
+            with capture_selects() as statements:
+                page = product.get_multi_all(db, limit=50, search=search, total_mode=TotalMode.EXACT)
+            with engine.connect() as conn:
+                plan = [str(row[-1]) for statement, parameters in statements
+                        for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                product.get_multi_all(db, limit=50, search=search, total_mode=TotalMode.EXACT)
+            elapsed_ms = (time.perf_counter() - started) / args.repeat * 1000
+
+            full_scan = any(line.startswith("SCAN products") and "USING" not in line
+                            and "VIRTUAL TABLE" not in line for line in plan)
+            indexed = indexed and not full_scan
+            print(f"{name:22} {search!r:18} total={page.total:<8} {elapsed_ms:10.3f} ms"
+                  f"  {'FULL SCAN' if full_scan else 'index'}")
+    finally:
+        db.close()
+    return indexed
+
+
+def check_sync() -> bool:
+    """create / update / remove через CRUD видны в индексе, integrity-check FTS5 проходит"""
+    db = SessionLocal()
+    try:
+        created = product.create(db, obj_in=ProductCreate(
+            name="Фланец контрольный", sku="SYNC-CHECK-1", description="проверка индекса", cost_price=1.0,
+        ))
+        found_created = [p.id for p in product.get_multi_all(db, search="фланец контр").items] == [created.id]
+        product.update(db, db_obj=created, obj_in=ProductUpdate(name="Муфта контрольная"))
+        found_updated = (
+            not product.get_multi_all(db, search="фланец контр").items
+            and [p.id for p in product.get_multi_all(db, search="муфта").items] == [created.id]
+        )
+        product.remove(db, row_id=created.id)
+        found_removed = not product.get_multi_all(db, search="муфта контр").items
+        db.execute(text("INSERT INTO products_fts (products_fts) VALUES ('integrity-check')"))
+        db.commit()
+    finally:
+        db.close()
+
+    ok = found_created and found_updated and found_removed
+    print(f"\n{'OK  ' if ok else 'FAIL'} index sync: create={found_created} update={found_updated} "
+          f"remove={found_removed}, integrity-check passed")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    config = alembic_config()
+    command.upgrade(config, "0004")
+    print(f"filling {engine.url} with {args.products} products ...")
+    fill(args)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    settings.PRODUCT_SEARCH_FTS = False
+    measure("ilike (0004)", args)
+
+    started = time.perf_counter()
+    command.upgrade(config, "head")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"\nupgrade head (FTS5 rebuild): {time.perf_counter() - started:.1f} s")
+    settings.PRODUCT_SEARCH_FTS = True
+    ok = measure("full-text index (head)", args)
+
+    ok = check_sync() and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
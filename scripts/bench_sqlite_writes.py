@@ -0,0 +1,122 @@
+"""
+Пропускная способность записи на SQLite: supply.create_with_items и order.create_from_external
+из нескольких потоков (как параллельные запросы воркера).
+
+До (journal_mode=DELETE, без повторов):
+    SQLITE_PERFORMANCE_MODE=false DB_WRITE_RETRIES=0 python scripts/bench_sqlite_writes.py
+После (WAL + прагмы + повтор при "database is locked"):
+    SQLITE_PERFORMANCE_MODE=true python scripts/bench_sqlite_writes.py
+
+Каждый запуск использует новую временную базу (если SQLITE_DB_PATH не задан).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+
+from app.config import settings
+from app.database import engine, Base, SessionLocal
+from app.crud.supply import supply
+from app.crud.order import order
+from app.models import Warehouse, Product, OrderStatus
+from app.schemas.supply import SupplyCreate, SupplyItemCreate
+from app.schemas.order import OrderCreate, OrderItemCreate
+
+
+def prepare_db(products: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        warehouse_obj = Warehouse(name="bench", state="bench")
+        db.add(warehouse_obj)
+        db.add_all(
+            Product(name=f"Product {i}", sku=f"BENCH-{uuid.uuid4().hex[:12]}", cost_price=1.0)
+            for i in range(products)
+        )
+        if not db.query(OrderStatus).first():
+            db.add(OrderStatus(name="new"))
+        db.commit()
+        return warehouse_obj.id
+    finally:
+        db.close()
+
+
+def make_supply(warehouse_id: int, products: int, n: int) -> SupplyCreate:
+    return SupplyCreate(
+        warehouse_id=warehouse_id,
+        items=[SupplyItemCreate(product_id=(n + k) % products + 1, quantity=5) for k in range(3)],
+    )
+
+
+def make_order(warehouse_id: int, products: int, n: int) -> OrderCreate:
+    return OrderCreate(
+        external_order_id=f"EXT-{uuid.uuid4().hex}",
+        warehouse_id=warehouse_id,
+        customer_name="Bench Customer",
+        shipping_address="Bench street 1",
+        items=[OrderItemCreate(product_id=n % products + 1, quantity=1, price=10.0)],
+    )
+
+
+def run(name, write, threads: int, per_thread: int):
+    ok, failed, errors = [0], [0], {}
+    lock = threading.Lock()
+
+    def worker(thread_no: int):
+        for i in range(per_thread):
+            db = SessionLocal()
+            try:
+                write(db, thread_no * per_thread + i)
+                with lock:
+                    ok[0] += 1
+            except Exception as e:
+                db.rollback()
+                with lock:
+                    failed[0] += 1
+                    key = f"{type(e).__name__}: {str(e).splitlines()[0][:80]}"
+                    errors[key] = errors.get(key, 0) + 1
+            finally:
+                db.close()
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{name}: ok={ok[0]} failed={failed[0]} writes/s={ok[0] / elapsed:.1f} ({elapsed:.2f}s)")
+    for message, count in errors.items():
+        print(f"    {count} x {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--per-thread", type=int, default=100)
+    parser.add_argument("--products", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"performance mode={settings.SQLITE_PERFORMANCE_MODE} retries={settings.DB_WRITE_RETRIES} "
+          f"db={settings.SQLITE_DB_PATH}")
+    warehouse_id = prepare_db(args.products)
+
+    run("supply.create_with_items",
+        lambda db, n: supply.create_with_items(db, obj_in=make_supply(warehouse_id, args.products, n)),
+        args.threads, args.per_thread)
+    run("order.create_from_external",
+        lambda db, n: order.create_from_external(db, obj_in=make_order(warehouse_id, args.products, n)),
+        args.threads, args.per_thread)
+
+
+if __name__ == "__main__":
+    main()
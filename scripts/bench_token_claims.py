@@ -0,0 +1,207 @@
+"""
+Токены с claims (TOKEN_CLAIMS): requests/sec авторизованного запроса с чтением пользователя из БД и без него.
+
+Поднимает приложение на временной SQLite базе (create_all), создаёт админа и сотрудников склада,
+получает токены через /auth/login и гоняет N одновременных запросов прямо через ASGI к маршруту,
+которому нужен только текущий пользователь (deps.get_current_active_user), в трёх режимах:
+    db              - токен без claims, PRINCIPAL_CACHE_SIZE=0: SELECT пользователя на каждый запрос (как было);
+    principal cache - токен без claims, пользователь из кэша (app/crud/principal_cache.py);
+    claims          - токен с claims, пользователь из токена.
+Печатает rps, p50 / p99 и число SQL запросов на запрос. --db-latency-ms добавляет задержку
+на каждый SQL запрос (сетевая БД).
+В конце проверяет через эндпоинты, что деактивация, перевод на другой склад и удаление сотрудника
+сразу отзывают claims его токена.
+
+    python scripts/bench_token_claims.py
+    python scripts/bench_token_claims.py --requests 20000 --concurrency 100 --db-latency-ms 0.5
+    DB_ASYNC_MODE=true python scripts/bench_token_claims.py
+
+Код возврата 1, если изменение пользователя не отозвало claims.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "claims.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.api import deps
+from app.config import settings
+from app.core.security import get_password_hash
+from app.crud.principal_cache import principal_cache, token_revocations
+from app.database import engine, Base, SessionLocal
+from app.main import app
+from app.models.user import User
+from app.models.warehouse import Warehouse
+
+
+PASSWORD = "Claims123!"
+
+
+@app.get("/bench/principal")
+async def bench_principal(current_user: User = Depends(deps.get_current_active_user)):
+    return {"id": current_user.id, "warehouse_id": current_user.warehouse_id}
+
+
+def prepare_db(employees: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([Warehouse(id=1, name="W1", state="bench"), Warehouse(id=2, name="W2", state="bench")])
+        hashed_password = get_password_hash(PASSWORD)
+        db.add(User(username="admin", hashed_password=hashed_password, is_superuser=True))
+        db.add_all([User(username=f"employee-{i}", hashed_password=hashed_password, warehouse_id=1)
+                    for i in range(employees)])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def call(method: str, path: str, token: str = None, body: bytes = b"", content_type: str = None):
+    path, _, query = path.partition("?")
+    headers = [(b"host", b"bench")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    if content_type:
+        headers.append((b"content-type", content_type.encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    response = {"status": 0, "body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], json.loads(response["body"] or b"null")
+
+
+async def call_json(method: str, path: str, token: str, payload) -> int:
+    status_code, _ = await call(method, path, token, json.dumps(payload).encode(), "application/json")
+    return status_code
+
+
+async def login(username: str) -> str:
+    body = urlencode({"username": username, "password": PASSWORD}).encode()
+    status_code, data = await call("POST", "/api/v1/auth/login", body=body,
+                                   content_type="application/x-www-form-urlencoded")
+    assert status_code == 200, (status_code, data)
+    return data["access_token"]
+
+
+async def measure(label: str, tokens, total: int, concurrency: int) -> None:
+    queries = [0]
+    count = lambda *_: queries.__setitem__(0, queries[0] + 1)
+    event.listen(Engine, "before_cursor_execute", count)
+    remaining = [total]
+    latencies, statuses = [], {}
+
+    async def client(index: int):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            status_code, _ = await call("GET", "/bench/principal", tokens[index % len(tokens)])
+            latencies.append(time.perf_counter() - started)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    event.remove(Engine, "before_cursor_execute", count)
+
+    latencies.sort()
+    ms = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(f"{label:16} rps={total / elapsed:8.1f} p50={ms(0.5):6.2f} ms p99={ms(0.99):6.2f} ms "
+          f"queries/request={queries[0] / total:.2f} statuses={statuses}")
+
+
+async def check_revocations(admin_token: str, claims_tokens) -> bool:
+    """Деактивация / перевод на другой склад / удаление через эндпоинты сразу видны по токену с claims"""
+    principal = lambda index: call("GET", "/bench/principal", claims_tokens[index])
+
+    before = token_revocations.fallbacks
+    await principal(0)
+    from_claims = token_revocations.fallbacks == before
+
+    await call_json("PATCH", f"/api/v1/users/status?user_id={2}", admin_token, {"is_active": False})
+    deactivated = (await principal(0))[0] == 400
+
+    await call_json("PUT", "/api/v1/warehouses/2", admin_token, {"name": "W2", "user_ids": [3]})
+    status_code, data = await principal(1)
+    reassigned = status_code == 200 and data["warehouse_id"] == 2
+
+    await call("DELETE", f"/api/v1/users/{4}", admin_token)
+    deleted = (await principal(2))[0] == 401
+
+    ok = from_claims and deactivated and reassigned and deleted
+    print(f"{'OK  ' if ok else 'FAIL'} revocation: claims={from_claims} deactivate={deactivated} "
+          f"reassign={reassigned} delete={deleted}")
+    return ok
+
+
+async def run(args) -> bool:
+    admin_token = await login("admin")
+    usernames = [f"employee-{i}" for i in range(args.employees)]
+
+    settings.TOKEN_CLAIMS = False
+    plain_tokens = [await login(username) for username in usernames]
+    settings.TOKEN_CLAIMS = True
+    claims_tokens = [await login(username) for username in usernames]
+
+    settings.TOKEN_CLAIMS = False
+    cache_size = settings.PRINCIPAL_CACHE_SIZE
+    settings.PRINCIPAL_CACHE_SIZE = 0
+    await measure("db", plain_tokens, args.requests, args.concurrency)
+    settings.PRINCIPAL_CACHE_SIZE = cache_size
+    await measure("principal cache", plain_tokens, args.requests, args.concurrency)
+    settings.TOKEN_CLAIMS = True
+    await measure("claims", claims_tokens, args.requests, args.concurrency)
+    print(f"claims: trusted={token_revocations.trusted} fallbacks={token_revocations.fallbacks}")
+
+    principal_cache.clear()
+    return await check_revocations(admin_token, claims_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--employees", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="задержка на SQL запрос")
+    args = parser.parse_args()
+
+    prepare_db(args.employees)
+    # токены выпускаются после старта процесса (iat в целых секундах)
+    time.sleep(1.1)
+
+    if args.db_latency_ms:
+        # все движки: sync и async (DB_ASYNC_MODE)
+        event.listen(Engine, "before_cursor_execute", lambda *_: time.sleep(args.db_latency_ms / 1000))
+
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
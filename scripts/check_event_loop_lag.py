@@ -0,0 +1,133 @@
+"""
+Регрессионная проверка: задержка event loop при множестве авторизованных запросов.
+
+Поднимает приложение на временной SQLite базе, создаёт пользователя и гоняет
+N одновременных запросов к /auth/me (вся цепочка get_current_user) прямо через ASGI.
+Параллельно тикер спит по 1 мс и замеряет, насколько event loop опаздывает.
+--db-latency-ms добавляет задержку к каждому SQL запросу синхронного движка (как сетевая БД):
+если запрос пользователя выполняется в event loop, а не в threadpool / через AsyncSession,
+лаг растёт до сотен мс. Кэш пользователей выключен (PRINCIPAL_CACHE_SIZE=0) - в БД идёт
+каждый запрос. Сессия держит соединение до конца запроса, поэтому пул не меньше --concurrency.
+
+    python scripts/check_event_loop_lag.py
+    DB_ASYNC_MODE=true python scripts/check_event_loop_lag.py
+    python scripts/check_event_loop_lag.py --requests 2000 --concurrency 50 --db-latency-ms 5
+
+Код возврата 1, если p99 лага больше --max-lag-ms. Запускается из scripts/run_checks.py (CI) в обоих режимах.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "lag.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("PRINCIPAL_CACHE_SIZE", "0")
+os.environ.setdefault("DB_POOL_SIZE", "60")
+
+from sqlalchemy import event
+
+from app.database import engine, Base, SessionLocal
+from app.models.user import User
+from app.core.security import get_password_hash, create_access_token
+from app.main import app
+
+
+def prepare_db() -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.username == "lag-user").first():
+            db.add(User(username="lag-user", hashed_password=get_password_hash("LagUser123")))
+            db.commit()
+    finally:
+        db.close()
+    return create_access_token(subject="lag-user")
+
+
+async def asgi_get(path: str, token: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status_code = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def run(total: int, concurrency: int, token: str):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    remaining = [total]
+    statuses = {}
+
+    async def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            code = await asgi_get("/api/v1/auth/me", token)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+
+    lags.sort()
+    return statuses, elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--max-lag-ms", type=float, default=100.0, help="порог p99 лага")
+    args = parser.parse_args()
+
+    token = prepare_db()
+
+    if args.db_latency_ms:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _simulate_latency(*_):
+            time.sleep(args.db_latency_ms / 1000)
+
+    statuses, elapsed, lags = asyncio.run(run(args.requests, args.concurrency, token))
+
+    p99 = lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0
+    worst = lags[-1] * 1000 if lags else 0.0
+    print(f"statuses:        {statuses}")
+    print(f"rps:             {args.requests / elapsed:.1f}")
+    ok = p99 <= args.max_lag_ms and set(statuses) == {200}
+    print(f"loop lag ms:     p99={p99:.2f} max={worst:.2f}")
+    print(f"{'OK  ' if ok else 'FAIL'} p99 loop lag {'<=' if p99 <= args.max_lag_ms else '>'} {args.max_lag_ms:.0f} ms")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Проверка бюджетов SQL запросов эндпоинтов (@query_budget в app/api/v1/endpoints).
+
+Поднимает временную SQLite базу на миграциях (upgrade head), заводит склад с заказами,
+поставками и остатками и вызывает списки через ASGI приложение (без HTTP сервера и внешних
+зависимостей) с QUERY_BUDGET_MODE=raise: лишний запрос роняет запрос с QueryBudgetError.
+Число запросов не должно зависеть от размера страницы (N+1), поэтому каждый список
+вызывается с per_page=1 и per_page=50. Эндпоинты записи (WRITES) вызываются один раз: ответ
+собирается из объекта после commit, без refresh / повторного SELECT. Кэш каталога товаров
+(app/crud/product_cache.py) и кэш пользователей (app/crud/principal_cache.py) сбрасываются
+перед каждым вызовом - считается худший случай. С LAZY_LOAD_MODE=raise неявная lazy-загрузка relationship
+тоже роняет запрос (LazyLoadError). Другие ошибки ответа тоже валят проверку, кроме известных
+(KNOWN_ERRORS) - они печатаются с пометкой known.
+Списки с total (TOTALS) вызываются и напрямую через CRUD в каждом режиме TOTALS_PAGE_COUNT -
+total без фильтров и с фильтром должен совпасть с числом строк.
+
+    python scripts/check_query_budgets.py
+    DB_ASYNC_MODE=true python scripts/check_query_budgets.py
+
+Код возврата 1, если хоть один эндпоинт вышел из бюджета, загрузил relationship лениво
+или вернул не известную заранее ошибку, а также если total списка разошёлся с числом строк.
+Запускается из scripts/run_checks.py (CI) в обоих режимах.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "budgets.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ["LAZY_LOAD_MODE"] = "raise"
+os.environ["TOTALS_CACHE_TTL"] = "0"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.api.deps import create_access_token
+from app.config import settings, PageCountMode
+from app.crud.inventory import inventory
+from app.crud.order import order
+from app.crud.order_status_registry import order_status_registry
+from app.crud.principal_cache import principal_cache
+from app.crud.product_cache import product_cache
+from app.crud.supply import supply
+from app.database import SessionLocal
+from app.main import app
+from app.models import Warehouse, Product, Inventory, Order, OrderItem, OrderStatus, Supply, SupplyItem, User
+from app.schemas.order import OrderFilterParams
+
+
+# (путь, пользователь) - списки, которые должны укладываться в бюджет
+ENDPOINTS: List[Tuple[str, str]] = [
+    ("/api/v1/orders/admin/all", "admin"),
+    ("/api/v1/orders/warehouse/my", "employee"),
+    ("/api/v1/orders/warehouse/1", "admin"),
+    ("/api/v1/orders/new", "employee"),
+    ("/api/v1/supplies/warehouses/1/supplies", "admin"),
+    ("/api/v1/inventory/my", "employee"),
+    ("/api/v1/inventory/warehouse/1", "admin"),
+    ("/api/v1/products/", "admin"),
+    ("/api/v1/warehouses/", "admin"),
+]
+
+# путь -> ошибка, которую эндпоинт сейчас возвращает и которая не относится к бюджету.
+# Списки заказов: схема OrderResponse не совпадает с моделью Order (customer_name, shipping_address,
+# subtotal, total_amount у заказа, price у позиции) - ResponseValidationError на каждый заказ
+KNOWN_ERRORS: Dict[str, str] = {
+    "/api/v1/orders/admin/all": "ResponseValidationError",
+    "/api/v1/orders/warehouse/my": "ResponseValidationError",
+    "/api/v1/orders/warehouse/1": "ResponseValidationError",
+    "/api/v1/orders/new": "ResponseValidationError",
+}
+
+# (название, список через CRUD, число строк) - total списка в каждом режиме TOTALS_PAGE_COUNT
+TOTALS: List[Tuple[str, Any, Any]] = [
+    ("orders, all (admin)",
+     lambda db: order.get_multi_filtered(db, is_superuser=True, limit=5),
+     lambda db: db.query(Order).count()),
+    ("orders of warehouse",
+     lambda db: order.get_multi_filtered(db, warehouse_id=1, limit=5),
+     lambda db: db.query(Order).filter(Order.warehouse_id == 1).count()),
+    ("orders, number search (admin)",
+     lambda db: order.get_multi_filtered(db, is_superuser=True, limit=5, filters=OrderFilterParams(search="ORD-B-1")),
+     lambda db: db.query(Order).filter(Order.order_number.like("ORD-B-1%")).count()),
+    ("inventory of warehouse",
+     lambda db: inventory.get_multi_by_warehouse(db, warehouse_id=1, limit=5),
+     lambda db: db.query(Inventory).filter(Inventory.warehouse_id == 1).count()),
+    ("supplies of warehouse",
+     lambda db: supply.get_multi_by_warehouse(db, warehouse_id=1, limit=5),
+     lambda db: db.query(Supply).filter(Supply.warehouse_id == 1).count()),
+]
+
+# (метод, путь, пользователь, тело) - записи выполняются по порядку
+WRITES: List[Tuple[str, str, str, Any]] = [
+    ("POST", "/api/v1/products/", "admin", {"name": "New", "sku": "BUDGET-NEW", "cost_price": 2.0}),
+    ("PUT", "/api/v1/products/1", "admin", {"name": "Renamed", "sku": "BUDGET-RENAMED"}),
+    ("PATCH", "/api/v1/products/1/status", "admin", {}),
+    ("POST", "/api/v1/warehouses/", "admin", {"name": "New", "state": "budget", "user_ids": [2]}),
+    ("PUT", "/api/v1/warehouses/1", "admin", {"name": "Renamed", "user_ids": [2]}),
+    ("POST", "/api/v1/users/", "admin", {"username": "new_user", "password": "Budget123!"}),
+    ("PATCH", "/api/v1/users/status?user_id=3", "admin", {"is_active": False}),
+    ("POST", "/api/v1/products/batch", "admin",
+     [{"name": f"Batch {i}", "sku": f"BUDGET-BATCH-{i}", "cost_price": 1.0} for i in range(50)]),
+    ("DELETE", "/api/v1/products/?" + "&".join(f"ids={i}" for i in range(62, 112)), "admin", None),
+]
+
+
+def prepare_db(rows: int = 60) -> None:
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+    db = SessionLocal()
+    try:
+        warehouse_obj = Warehouse(name="budget", state="budget")
+        status_obj = OrderStatus(name="new")
+        db.add_all([warehouse_obj, status_obj])
+        db.flush()
+        db.add(User(username="admin", hashed_password="-", is_superuser=True))
+        db.add(User(username="employee", hashed_password="-", warehouse_id=warehouse_obj.id))
+
+        products = [Product(name=f"Product {i}", sku=f"BUDGET-{uuid.uuid4().hex[:12]}", cost_price=1.0)
+                    for i in range(rows)]
+        db.add_all(products)
+        db.flush()
+
+        for i, product_obj in enumerate(products):
+            db.add(Inventory(warehouse_id=warehouse_obj.id, product_id=product_obj.id, quantity=i))
+            db.add(Order(
+                order_number=f"ORD-B-{i}", external_order_id=f"EXT-{i}", warehouse_id=warehouse_obj.id,
+                status_id=status_obj.id, postal_code="0", country="RU", city="City", address="Street",
+                items=[OrderItem(product_id=products[(i + k) % rows].id, quantity=1) for k in range(3)],
+            ))
+            db.add(Supply(
+                supply_number=f"SUP-B-{i}", warehouse_id=warehouse_obj.id,
+                items=[SupplyItem(product_id=products[(i + k) % rows].id, quantity=1) for k in range(3)],
+            ))
+        db.commit()
+    finally:
+        db.close()
+    order_status_registry.load()  # как в lifespan приложения
+
+
+def check_totals() -> bool:
+    ok = True
+    page_count_mode = settings.TOTALS_PAGE_COUNT
+    db = SessionLocal()
+    try:
+        for name, run, count in TOTALS:
+            expected = count(db)
+            totals = []
+            for mode in PageCountMode:
+                settings.TOTALS_PAGE_COUNT = mode
+                totals.append(run(db).total)
+            passed = set(totals) == {expected}
+            ok = ok and passed
+            print(f"{'OK  ' if passed else 'FAIL'} total {name:39} rows={expected} "
+                  + " ".join(f"{mode.value}={total}" for mode, total in zip(PageCountMode, totals)))
+    finally:
+        settings.TOTALS_PAGE_COUNT = page_count_mode
+        db.close()
+    return ok
+
+
+async def call(
+        path: str, query: str, token: str, method: str = "GET", body: Any = None
+) -> Tuple[int, Optional[int], Optional[BaseException]]:
+    """Запрос через ASGI интерфейс приложения: (число SQL запросов, бюджет эндпоинта, исключение приложения)"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "server": ("test", 80), "client": ("127.0.0.1", 1),
+        "headers": [
+            (b"host", b"test"), (b"authorization", f"Bearer {token}".encode()),
+            (b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode()),
+        ],
+    }
+    request_sent = False
+    statements = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()  # клиент не отключается
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] >= 300:
+            statements.append(None)  # ответ не 2xx без исключения (401 / 404 / 422)
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    product_cache.clear()
+    principal_cache.clear()
+    event.listen(Engine, "before_cursor_execute", count_statement)
+    try:
+        await app(scope, receive, send)
+        error = None if None not in statements else RuntimeError("non-2xx response")
+    except Exception as e:
+        error = e
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_statement)
+    # роутер дописывает в scope найденный эндпоинт
+    budget = getattr(scope.get("endpoint"), "query_budget", None)
+    return len([statement for statement in statements if statement is not None]), budget, error
+
+
+async def main() -> int:
+    prepare_db()
+    tokens = {name: create_access_token({"sub": name}) for name in ("admin", "employee")}
+
+    # до вызовов через ASGI: они оставляют в контексте бюджет последнего эндпоинта
+    ok = check_totals()
+    for path, user in ENDPOINTS:
+        counts, errors = [], []
+        for per_page in (1, 50):
+            count, budget, error = await call(path, f"per_page={per_page}&limit={per_page}", tokens[user])
+            counts.append(count)
+            if error is not None:
+                errors.append(error)
+        known = [error for error in errors if type(error).__name__ == KNOWN_ERRORS.get(path)]
+        passed = (
+            budget is not None and len(set(counts)) == 1 and max(counts) <= budget
+            and len(known) == len(errors)
+        )
+        ok = ok and passed
+        print(f"{'OK  ' if passed else 'FAIL'} {path:45} budget={budget} queries={'/'.join(map(str, counts))}")
+        for error in errors:
+            print(f"     {'known ' if error in known else ''}{type(error).__name__}: "
+                  f"{str(error).splitlines()[0][:150]}")
+
+    for method, path, user, body in WRITES:
+        route, _, query = path.partition("?")
+        count, budget, error = await call(route, query, tokens[user], method, body)
+        passed = budget is not None and count <= budget and error is None
+        ok = ok and passed
+        print(f"{'OK  ' if passed else 'FAIL'} {(method + ' ' + path)[:45]:45} budget={budget} queries={count}")
+        if error is not None:
+            print(f"     {type(error).__name__}: {str(error).splitlines()[0][:150]}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
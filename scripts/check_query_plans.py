@@ -0,0 +1,175 @@
+"""
+Регрессионная проверка планов запросов списков.
+
+Поднимает временную SQLite базу на миграциях (upgrade head), заливает данные
+(scripts/bench_indexes.py), выполняет настоящие CRUD-методы и для каждого выполненного
+SELECT снимает EXPLAIN QUERY PLAN. Проверка падает, если таблица читается целиком
+или не используется ожидаемый индекс.
+
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --orders 50000 -v
+
+Код возврата 1, если хоть одна проверка не прошла.
+"""
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Callable, List, NamedTuple, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import bench_indexes  # noqa: E402  выставляет временную SQLite базу в окружении
+
+from alembic import command
+from sqlalchemy import event, text
+
+from app.core.pagination import encode_cursor
+from app.database import engine, SessionLocal
+from app.crud.order import order
+from app.crud.supply import supply
+from app.schemas.order import OrderFilterParams
+from app.schemas.supply import SupplyFilterParams
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    table: str  # таблица, которую нельзя читать целиком
+    index: str  # индекс, который должен быть в плане
+    run: Callable
+
+
+CHECKS: List[PlanCheck] = [
+    PlanCheck(
+        "orders of warehouse by date range", "orders", "ix_orders_warehouse_id_created_at",
+        lambda db, w: order.get_multi_filtered(
+            db, warehouse_id=w, limit=20,
+            filters=OrderFilterParams(date_from=date(2024, 6, 1), date_to=date(2024, 6, 7)),
+        ),
+    ),
+    PlanCheck(
+        "all orders by date range (admin)", "orders", "ix_orders_created_at",
+        lambda db, w: order.get_multi_filtered(
+            db, is_superuser=True, limit=20,
+            filters=OrderFilterParams(date_from=date(2024, 6, 1), date_to=date(2024, 6, 1)),
+        ),
+    ),
+    PlanCheck(
+        "supplies of warehouse by date range", "supplies", "ix_supplies_warehouse_id_created_at",
+        lambda db, w: supply.get_multi_by_warehouse(
+            db, warehouse_id=w, limit=20,
+            filters=SupplyFilterParams(date_from=date(2024, 6, 1), date_to=date(2024, 6, 30)),
+        ),
+    ),
+    PlanCheck(
+        "new orders of warehouse", "orders", "ix_orders_warehouse_id_status_id_created_at",
+        lambda db, w: order.get_multi_filtered(
+            db, warehouse_id=w, limit=20, filters=OrderFilterParams(status_code="new"),
+        ),
+    ),
+    PlanCheck(
+        "orders of warehouse after cursor (deep page)", "orders", "ix_orders_warehouse_id_created_at",
+        lambda db, w: order.get_multi_filtered(
+            db, warehouse_id=w, limit=20, after=encode_cursor([datetime(2024, 6, 1), 10 ** 9]),
+        ),
+    ),
+]
+
+
+@contextmanager
+def capture_statements():
+    statements: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(statement: str, parameters) -> List[str]:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def run_check(check: PlanCheck, warehouse_id: int, verbose: bool) -> bool:
+    db = SessionLocal()
+    try:
+        with capture_statements() as statements:
+            check.run(db, warehouse_id)
+    finally:
+        db.close()
+
+    plans = [explain(statement, parameters) for statement, parameters in statements]
+    lines = [line for plan in plans for line in plan]
+    full_scan = [line for line in lines if line.startswith(f"SCAN {check.table}") and "USING" not in line]
+    index_used = any(check.index in line for line in lines)
+    ok = index_used and not full_scan
+
+    print(f"{'OK  ' if ok else 'FAIL'} {check.name}: {len(statements)} statements")
+    if not ok or verbose:
+        for (statement, _), plan in zip(statements, plans):
+            print("     ", " ".join(statement.split())[:160])
+            for line in plan:
+                print("         ", line)
+    return ok
+
+
+def check_boundaries(warehouse_id: int) -> bool:
+    """Полуоткрытый диапазон: последняя секунда date_to входит, полночь следующего дня - нет"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO orders (order_number, warehouse_id, status_id, postal_code, country, city, address, "
+            "created_at) VALUES (:n, :w, 1, '0', 'RU', 'City', 'Street', :created)"
+        ), [{"n": f"EDGE-{i}", "w": warehouse_id, "created": created} for i, created in enumerate([
+            "2025-03-09 23:59:59", "2025-03-10 00:00:00", "2025-03-10 23:59:59", "2025-03-11 00:00:00",
+        ])])
+
+    db = SessionLocal()
+    try:
+        orders, total, _ = order.get_multi_filtered(
+            db, warehouse_id=warehouse_id,
+            filters=OrderFilterParams(date_from=date(2025, 3, 10), date_to=date(2025, 3, 10)),
+        )
+    finally:
+        db.close()
+
+    numbers = sorted(o.order_number for o in orders)
+    ok = total == 2 and numbers == ["EDGE-1", "EDGE-2"]
+    print(f"{'OK  ' if ok else 'FAIL'} date range bounds: {numbers}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--warehouses", type=int, default=20)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    command.upgrade(bench_indexes.alembic_config(), "head")
+    bench_indexes.fill(args)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO warehouses (id, name, state) VALUES (:id, 'edge', 'bench')"),
+                     {"id": args.warehouses + 1})
+        conn.execute(text("ANALYZE"))
+
+    results = [run_check(check, args.warehouses // 2, args.verbose) for check in CHECKS]
+    results.append(check_boundaries(args.warehouses + 1))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Регрессионная проверка: списки на read replica (deps.get_read_db) не открывают сессию основной БД.
+
+Основная БД и реплика - два SQLite файла (реплика - копия основной после заливки, дальше не догоняет).
+Через ASGI интерфейс приложения проверяет:
+- GET /products/ и /orders/admin/all админа: пользователь проверяется на реплике, соединений основной БД - 0;
+- пользователь, которого ещё нет на реплике (создан после копии): запрос проходит, пользователь - из основной БД;
+- read-your-writes: после своей записи админ READ_YOUR_WRITES_SECONDS читает список из основной БД.
+Кэш пользователей сбрасывается перед каждым запросом - иначе пользователь без БД вообще.
+
+    python scripts/check_read_replica.py
+    DB_ASYNC_MODE=true python scripts/check_read_replica.py
+
+Код возврата 1, если проверка не прошла. Запускается из scripts/run_checks.py (CI) в обоих режимах.
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "primary.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+REPLICA_PATH = os.path.join(os.path.dirname(os.environ["SQLITE_DB_PATH"]), "replica.db")
+os.environ["READ_REPLICA_URL"] = f"sqlite:///{REPLICA_PATH}"
+
+from sqlalchemy import event
+
+from app import database
+from app.database import engine, Base, SessionLocal
+from app.core.security import get_password_hash, create_access_token
+from app.crud.principal_cache import principal_cache
+from app.models.user import User
+from app.main import app
+
+# соединения основной БД (sync движок и async движок DB_ASYNC_MODE)
+primary_checkouts: List[int] = []
+for primary_engine in filter(None, (engine, database.async_engine and database.async_engine.sync_engine)):
+    event.listen(primary_engine.pool, "checkout", lambda *_: primary_checkouts.append(1))
+
+
+def prepare_db() -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(User(username="replica-admin", hashed_password=get_password_hash("ReplicaAdmin123"), is_superuser=True))
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+    shutil.copyfile(database.settings.SQLITE_DB_PATH, REPLICA_PATH)
+
+    db = SessionLocal()
+    try:
+        # только в основной БД: реплика его ещё не догнала
+        db.add(User(username="replica-new-admin", hashed_password=get_password_hash("ReplicaAdmin123"),
+                    is_superuser=True))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def call(method: str, path: str, username: str, body: Any = None) -> Tuple[int, Any, int]:
+    """Запрос через ASGI: (статус, тело ответа, соединений основной БД)"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "server": ("check", 80), "client": ("127.0.0.1", 1),
+        "headers": [
+            (b"host", b"check"), (b"authorization", f"Bearer {create_access_token(subject=username)}".encode()),
+            (b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode()),
+        ],
+    }
+    request_sent = False
+    status_code, chunks = 0, []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    principal_cache.clear()
+    primary_checkouts.clear()
+    await app(scope, receive, send)
+    body = b"".join(chunks)
+    return status_code, json.loads(body) if body else None, len(primary_checkouts)
+
+
+async def run() -> bool:
+    results = []
+
+    for path in ("/api/v1/products/", "/api/v1/orders/admin/all"):
+        status_code, _, checkouts = await call("GET", path, "replica-admin")
+        results.append((f"replica read {path}", status_code == 200 and checkouts == 0,
+                        f"status={status_code} primary connections={checkouts}"))
+
+    status_code, _, checkouts = await call("GET", "/api/v1/products/", "replica-new-admin")
+    results.append(("user not on replica yet", status_code == 200, f"status={status_code} primary connections={checkouts}"))
+
+    product_in = {"name": "Replica check", "sku": "REPLICA-1", "cost_price": 1.0}
+    created, _, _ = await call("POST", "/api/v1/products/", "replica-admin", product_in)
+    status_code, data, checkouts = await call("GET", "/api/v1/products/", "replica-admin")
+    own_write = status_code == 200 and any(item["sku"] == "REPLICA-1" for item in data["products"])
+    results.append(("read-your-writes", created == 200 and own_write,
+                    f"create={created} status={status_code} primary connections={checkouts}"))
+
+    for name, ok, details in results:
+        print(f"{'OK  ' if ok else 'FAIL'} {name:<36} {details}")
+    return all(ok for _, ok, _ in results)
+
+
+if __name__ == "__main__":
+    prepare_db()
+    sys.exit(0 if asyncio.run(run()) else 1)
@@ -0,0 +1,106 @@
+"""
+Регрессионная проверка: retry_on_locked (app/database.py) при занятой SQLite базе.
+
+Второе соединение держит блокировку записи (BEGIN IMMEDIATE), CRUD-методы упираются
+в "database is locked"; считаем попытки UPDATE:
+- чистая сессия - DB_WRITE_RETRIES + 1 попыток;
+- вложенный декорированный метод (CRUDProduct.update -> CRUDBase.update) - столько же, не в квадрате;
+- в сессии изменения вызывающего кода - одна попытка, ошибка без повтора, изменения не отброшены молча.
+
+    python scripts/check_write_retries.py
+
+Код возврата 1, если число попыток не совпало. Запускается из scripts/run_checks.py (CI).
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Callable, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "retries.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+# busy_timeout выставляется прагмой только в SQLITE_PERFORMANCE_MODE
+os.environ["SQLITE_PERFORMANCE_MODE"] = "true"
+os.environ["SQLITE_BUSY_TIMEOUT_MS"] = "10"
+os.environ["DB_WRITE_RETRIES"] = "2"
+os.environ["DB_WRITE_RETRY_BACKOFF"] = "0.01"
+
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import engine, Base, SessionLocal, retry_on_locked
+from app.crud.product import product
+from app.models.product import Product
+from app.schemas.product import ProductUpdate
+
+updates: List[str] = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_updates(conn, cursor, statement, parameters, context, executemany) -> None:
+    if statement.startswith("UPDATE"):
+        updates.append(statement)
+
+
+class Outer:
+    """Внешний метод записи, вызывающий другой декорированный метод"""
+
+    @retry_on_locked
+    def rename(self, db: Session, db_obj: Product, name: str) -> Product:
+        return product.update(db, db_obj=db_obj, obj_in=ProductUpdate(name=name))
+
+
+def attempts(db: Session, write: Callable[[], object]) -> int:
+    updates.clear()
+    try:
+        write()
+    except exc.OperationalError:
+        pass
+    db.rollback()
+    return len(updates)
+
+
+def main() -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([Product(name="first", sku="RETRY-1", cost_price=1.0),
+                    Product(name="second", sku="RETRY-2", cost_price=1.0)])
+        db.commit()
+        first = db.query(Product).filter(Product.sku == "RETRY-1").one()
+        second = db.query(Product).filter(Product.sku == "RETRY-2").one()
+
+        def with_caller_changes() -> None:
+            second.name = "changed by caller"
+            product.update(db, db_obj=first, obj_in=ProductUpdate(name="third"))
+
+        locker = sqlite3.connect(settings.SQLITE_DB_PATH)
+        locker.execute("BEGIN IMMEDIATE")
+        try:
+            expected = settings.DB_WRITE_RETRIES + 1
+            cases = [
+                ("clean session", expected,
+                 attempts(db, lambda: product.update(db, db_obj=first, obj_in=ProductUpdate(name="renamed")))),
+                ("nested decorated", expected, attempts(db, lambda: Outer().rename(db, first, "nested"))),
+                ("caller changes", 1, attempts(db, with_caller_changes)),
+            ]
+        finally:
+            locker.rollback()
+            locker.close()
+
+        ok = True
+        for name, expected_attempts, actual in cases:
+            passed = actual == expected_attempts
+            ok = ok and passed
+            print(f"{'ok  ' if passed else 'FAIL'} {name:<20} UPDATE attempts {actual} (expected {expected_attempts})")
+        print("OK" if ok else "FAIL")
+        return 0 if ok else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
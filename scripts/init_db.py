@@ -2,18 +2,36 @@ import sys
 import os
 import traceback
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
 
-from app.database import engine, Base, SessionLocal
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.database import engine, SessionLocal
 from app.models.user import User
 from app.models.order import OrderStatus
 from app.core.security import get_password_hash
 from app.schemas.user import UserCreate
 
 
+BASELINE_REVISION = "0001"
+
+
 def create_tables():
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created")
+    """Схема через миграции (alembic upgrade head)"""
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+
+    tables = set(inspect(engine).get_table_names())
+    if tables and "alembic_version" not in tables:
+        # База создана create_all до появления миграций: схема = baseline
+        command.stamp(config, BASELINE_REVISION)
+        print(f"Existing database stamped as {BASELINE_REVISION}")
+
+    command.upgrade(config, "head")
+    print("Database schema is up to date")
 
 
 def create_initial_admin():
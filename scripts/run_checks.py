@@ -0,0 +1,55 @@
+"""
+Все регрессионные проверки (scripts/check_*.py) одним запуском - точка входа CI (.github/workflows/checks.yml).
+
+Каждая проверка запускается отдельным процессом (настройки читаются при импорте app)
+на своей временной SQLite базе; проверки с DB_ASYNC_MODE гоняются в обоих режимах.
+
+    python scripts/run_checks.py
+    python scripts/run_checks.py query_budgets   # только проверки с этим словом в названии
+
+Код возврата 1, если хоть одна проверка не прошла.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# (название, скрипт с аргументами, переменные окружения)
+CHECKS: List[Tuple[str, List[str], Dict[str, str]]] = [
+    ("query_budgets", ["check_query_budgets.py"], {}),
+    ("query_budgets async", ["check_query_budgets.py"], {"DB_ASYNC_MODE": "true"}),
+    ("query_plans", ["check_query_plans.py"], {}),
+    ("write_retries", ["check_write_retries.py"], {}),
+    ("read_replica", ["check_read_replica.py"], {}),
+    ("read_replica async", ["check_read_replica.py"], {"DB_ASYNC_MODE": "true"}),
+    ("event_loop_lag", ["check_event_loop_lag.py"], {}),
+    ("event_loop_lag async", ["check_event_loop_lag.py"], {"DB_ASYNC_MODE": "true"}),
+]
+
+
+def run(name: str, args: List[str], env: Dict[str, str]) -> bool:
+    print(f"== {name}", flush=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "SQLITE_DB_PATH": os.path.join(tmp, "check.db"), **env}
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, os.path.join(ROOT_DIR, "scripts", args[0]), *args[1:]],
+                                cwd=ROOT_DIR, env=env)
+    print(f"== {name}: {'OK' if result.returncode == 0 else 'FAIL'} ({time.perf_counter() - started:.1f} s)\n",
+          flush=True)
+    return result.returncode == 0
+
+
+def main() -> int:
+    selected = [check for check in CHECKS if not sys.argv[1:] or any(word in check[0] for word in sys.argv[1:])]
+    failed = [name for name, args, env in selected if not run(name, args, env)]
+    print("FAIL: " + ", ".join(failed) if failed else f"OK: {len(selected)} checks")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
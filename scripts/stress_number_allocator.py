@@ -0,0 +1,151 @@
+"""
+Стресс-тест выдачи номеров документов (app/crud/number_sequence.py) несколькими воркерами.
+
+1. allocate: P процессов x T потоков берут номера напрямую из number_allocator.
+2. supplies: P процессов x T потоков создают поставки через supply.create_with_items.
+
+Проверяется, что номера не повторяются и ни одна поставка не упала на unique(supply_number).
+База: временная SQLite (по умолчанию) или любая из окружения (DB_TYPE=postgresql ...).
+
+    python scripts/stress_number_allocator.py --processes 4 --threads 8
+    SQLITE_PERFORMANCE_MODE=true NUMBER_BLOCK_SIZE=1 python scripts/stress_number_allocator.py
+
+Код возврата 1 при дубликатах или ошибках.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "numbers.db"))
+os.environ.setdefault("ENVIRONMENT", "production")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+
+
+def prepare_db(products: int) -> int:
+    from alembic import command
+    from alembic.config import Config
+
+    from app.database import SessionLocal
+    from app.models import Warehouse, Product
+
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+    db = SessionLocal()
+    try:
+        warehouse_obj = Warehouse(name="stress", state="stress")
+        db.add(warehouse_obj)
+        db.add_all(
+            Product(name=f"Product {i}", sku=f"STRESS-{uuid.uuid4().hex[:12]}", cost_price=1.0)
+            for i in range(products)
+        )
+        db.commit()
+        return warehouse_obj.id
+    finally:
+        db.close()
+
+
+def worker(mode: str, threads: int, per_thread: int, warehouse_id: int, product_ids, results) -> None:
+    from app.database import SessionLocal
+    from app.crud.number_sequence import number_allocator
+    from app.crud.supply import supply
+    from app.schemas.supply import SupplyCreate, SupplyItemCreate
+
+    numbers, errors = [], Counter()
+    lock = threading.Lock()
+
+    def run(thread_no: int):
+        for i in range(per_thread):
+            db = SessionLocal()
+            try:
+                if mode == "allocate":
+                    value = number_allocator.next_number(db, "STR")
+                else:
+                    product_id = product_ids[(thread_no + i) % len(product_ids)]
+                    value = supply.create_with_items(db, obj_in=SupplyCreate(
+                        warehouse_id=warehouse_id,
+                        items=[SupplyItemCreate(product_id=product_id, quantity=1)],
+                    )).supply_number
+                with lock:
+                    numbers.append(value)
+            except Exception as e:
+                db.rollback()
+                with lock:
+                    errors[f"{type(e).__name__}: {str(e).splitlines()[0][:100]}"] += 1
+            finally:
+                db.close()
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put((numbers, dict(errors)))
+
+
+def stress(mode: str, args, warehouse_id: int, product_ids) -> bool:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, args.threads, args.per_thread, warehouse_id, product_ids, results))
+        for _ in range(args.processes)
+    ]
+
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    numbers = [number for chunk, _ in collected for number in chunk]
+    errors = Counter()
+    for _, chunk_errors in collected:
+        errors.update(chunk_errors)
+    duplicates = [number for number, count in Counter(numbers).items() if count > 1]
+
+    ok = not duplicates and not errors
+    print(f"{'OK  ' if ok else 'FAIL'} {mode}: {len(numbers)} numbers in {elapsed:.2f}s "
+          f"({len(numbers) / elapsed:.0f}/s), duplicates={len(duplicates)}, errors={sum(errors.values())}")
+    for number in duplicates[:10]:
+        print(f"     duplicate {number}")
+    for message, count in errors.items():
+        print(f"     {count} x {message}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--per-thread", type=int, default=50)
+    parser.add_argument("--products", type=int, default=50)
+    args = parser.parse_args()
+
+    from app.config import settings
+    print(f"db={settings.DATABASE_URL} block={settings.NUMBER_BLOCK_SIZE} "
+          f"workers={args.processes}x{args.threads}")
+
+    warehouse_id = prepare_db(args.products)
+    product_ids = list(range(1, args.products + 1))
+
+    results = [
+        stress("allocate", args, warehouse_id, product_ids),
+        stress("supplies", args, warehouse_id, product_ids),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()